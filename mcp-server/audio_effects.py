@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/audio_effects.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview In-process effects chain (reverb, gain, ducked background music) on PCM buffers
+@context play-tts.sh runs sox for effects and again for the music mix on every utterance,
+         spawning processes and round-tripping temp files
+@architecture audio-effects.cfg entries are parsed into an EffectsChain; the chain reads the
+              synthesized WAV into a float array, applies Freeverb-style reverb (comb and
+              allpass filters processed one delay-length block at a time), gain, and mixes a
+              looped background track whose volume dips while the voice is speaking, then
+              writes the WAV back with the same channels, rate and sample width.
+              Entries using effects the chain cannot reproduce return None (hooks take over).
+@dependencies numpy (optional, imported on first use); music_cache.py for background tracks
+@entrypoints AgentVibesServer._effects_chain, EffectsChain.apply_file
+@patterns Vectorized NumPy, atomic in-place rewrite
+@related mcp-server/server.py, mcp-server/settings_store.py, mcp-server/music_cache.py
+"""
+
+import importlib.util
+import math
+import os
+import threading
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from music_cache import MusicCache
+
+# numpy is optional and adds ~100ms to startup, so it is imported on first use
+np = None
+
+# Freeverb tunings at 44.1kHz, scaled to the audio rate
+COMB_DELAYS = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)
+ALLPASS_DELAYS = (556, 441, 341, 225)
+ALLPASS_FEEDBACK = 0.5
+
+# How far the music dips under speech (0 = no ducking, 1 = silent)
+DEFAULT_DUCK = 0.5
+DEFAULT_BACKGROUND_VOLUME = 0.30
+
+
+def effects_available() -> bool:
+    """Check whether numpy is installed without importing it"""
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def _numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+@dataclass(frozen=True)
+class Reverb:
+    """SoX reverb parameters, all in percent"""
+
+    reverberance: float = 50.0
+    hf_damping: float = 50.0
+    room_scale: float = 100.0
+
+
+def parse_effects(effects: str) -> Optional[tuple[Optional[Reverb], float]]:
+    """
+    Parse the SoX effects field of an audio-effects.cfg entry.
+
+    Only reverb, gain and vol are reproduced in-process.
+
+    Returns:
+        (reverb or None, gain in dB), or None when another effect is used
+    """
+    tokens = effects.split()
+    reverb, gain_db = None, 0.0
+    index = 0
+    try:
+        while index < len(tokens):
+            name = tokens[index]
+            index += 1
+            params = []
+            while index < len(tokens) and _is_number(tokens[index]):
+                params.append(float(tokens[index]))
+                index += 1
+            if name == "reverb":
+                if len(params) > 3:
+                    return None  # pre-delay, wet gain and stereo depth are left to sox
+                reverb = Reverb(*params)
+            elif name == "gain" and len(params) == 1:
+                gain_db += params[0]
+            elif name == "vol" and len(params) == 1:
+                if index < len(tokens) and tokens[index].lower() == "db":
+                    gain_db += params[0]
+                    index += 1
+                elif params[0] > 0:
+                    gain_db += 20 * math.log10(params[0])
+                else:
+                    return None
+            else:
+                return None
+    except (TypeError, ValueError):
+        return None
+    return reverb, gain_db
+
+
+def _is_number(token: str) -> bool:
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+def read_wav(path: Path) -> tuple["np.ndarray", "wave._wave_params"]:
+    """
+    Read a PCM WAV file.
+
+    Returns:
+        (float32 samples shaped (frames, channels) in [-1, 1], WAV parameters)
+    """
+    numpy = _numpy()
+    with wave.open(str(path), "rb") as wav:
+        params = wav.getparams()
+        frames = wav.readframes(params.nframes)
+    if params.sampwidth == 1:
+        samples = (numpy.frombuffer(frames, numpy.uint8).astype(numpy.float32) - 128) / 128
+    elif params.sampwidth == 2:
+        samples = numpy.frombuffer(frames, "<i2").astype(numpy.float32) / 32768
+    elif params.sampwidth == 4:
+        samples = numpy.frombuffer(frames, "<i4").astype(numpy.float32) / 2147483648
+    else:
+        raise ValueError(f"unsupported sample width: {params.sampwidth}")
+    return samples.reshape(-1, params.nchannels), params
+
+
+def write_wav(path: Path, samples: "np.ndarray", params: "wave._wave_params") -> None:
+    """Write float samples back as PCM with the given parameters (atomically)"""
+    numpy = _numpy()
+    clipped = numpy.clip(samples, -1.0, 1.0).reshape(-1)
+    if params.sampwidth == 1:
+        data = (numpy.round(clipped * 127) + 128).astype(numpy.uint8).tobytes()
+    elif params.sampwidth == 2:
+        data = numpy.round(clipped * 32767).astype("<i2").tobytes()
+    else:
+        data = numpy.round(clipped.astype(numpy.float64) * 2147483647).astype("<i4").tobytes()
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with wave.open(str(tmp), "wb") as wav:
+            wav.setnchannels(params.nchannels)
+            wav.setsampwidth(params.sampwidth)
+            wav.setframerate(params.framerate)
+            wav.writeframes(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _feedback_comb(x: "np.ndarray", delay: int, feedback: float, damp: float = 0.0) -> "np.ndarray":
+    """
+    y[n] = x[n] + feedback * lowpass(y)[n - delay], one delay-length block per step.
+
+    Every sample in a block only depends on the previous block, so each step is
+    a single vectorized operation. The damping lowpass is a two-tap FIR.
+    """
+    numpy = _numpy()
+    y = x.copy()
+    total = len(x)
+    for start in range(delay, total, delay):
+        end = min(start + delay, total)
+        previous = y[start - delay:end - delay]
+        if damp:
+            if start - delay >= 1:
+                earlier = y[start - delay - 1:end - delay - 1]
+            else:
+                earlier = numpy.concatenate((numpy.zeros_like(y[:1]), y[:end - delay - 1]))
+            previous = (1 - damp) * previous + damp * earlier
+        y[start:end] += feedback * previous
+    return y
+
+
+def apply_reverb(samples: "np.ndarray", rate: int, reverb: Reverb) -> "np.ndarray":
+    """
+    Freeverb-style reverb: parallel damped combs into series allpasses, mixed with the dry signal.
+
+    Args:
+        samples: Float samples shaped (frames, channels)
+        rate: Sample rate in Hz
+        reverb: SoX reverb parameters
+
+    Returns:
+        Dry plus reverberated signal, extended by a decay tail
+    """
+    numpy = _numpy()
+    amount = min(max(reverb.reverberance, 0.0), 100.0) / 100
+    damp = min(max(reverb.hf_damping, 0.0), 100.0) / 100 * 0.4
+    room = 0.1 + 0.9 * min(max(reverb.room_scale, 0.0), 100.0) / 100
+    feedback = 0.7 + 0.28 * amount
+    scale = rate / 44100
+
+    tail = int(rate * (0.2 + 1.3 * amount * room))
+    dry = numpy.concatenate((samples, numpy.zeros((tail, samples.shape[1]), samples.dtype)))
+    wet = numpy.zeros_like(dry)
+    for delay in COMB_DELAYS:
+        length = max(1, int(delay * scale * room))
+        wet += _feedback_comb(dry, length, feedback, damp) - dry
+    wet *= (1 - feedback) / len(COMB_DELAYS)
+    for delay in ALLPASS_DELAYS:
+        length = max(1, int(delay * scale))
+        buffered = _feedback_comb(wet, length, ALLPASS_FEEDBACK)
+        delayed = numpy.zeros_like(buffered)
+        delayed[length:] = buffered[:-length]
+        wet = delayed - wet
+    return dry + wet * (0.3 + 0.9 * amount)
+
+
+def _envelope(samples: "np.ndarray", rate: int, window: float = 0.02) -> "np.ndarray":
+    """Moving RMS of the mono mix, one value per frame"""
+    numpy = _numpy()
+    power = numpy.square(samples).mean(axis=1, dtype=numpy.float64)
+    width = max(1, int(rate * window))
+    cumulative = numpy.concatenate(([0.0], numpy.cumsum(power)))
+    head = width // 2
+    upper = numpy.minimum(numpy.arange(len(power)) + width - head, len(power))
+    lower = numpy.maximum(numpy.arange(len(power)) - head, 0)
+    return numpy.sqrt((cumulative[upper] - cumulative[lower]) / (upper - lower))
+
+
+def mix_background(
+    voice: "np.ndarray",
+    music: "np.ndarray",
+    rate: int,
+    volume: float,
+    duck: float = DEFAULT_DUCK,
+    offset: int = 0,
+) -> "np.ndarray":
+    """
+    Mix a looped background track under the voice, ducked while the voice speaks.
+
+    Args:
+        voice: Float samples shaped (frames, channels)
+        music: Track at the same rate and channel count
+        rate: Sample rate in Hz
+        volume: Music level (0.0-1.0)
+        duck: Fraction the music drops under speech (0.0-1.0)
+        offset: Track frame to start from (wraps around)
+
+    Returns:
+        Mixed samples, same shape as voice
+    """
+    numpy = _numpy()
+    frames = len(voice)
+    if frames == 0 or len(music) == 0 or volume <= 0:
+        return voice
+    bed = music[(numpy.arange(frames) + offset) % len(music)]
+
+    gain = numpy.full(frames, volume, dtype=numpy.float32)
+    if duck > 0:
+        envelope = _envelope(voice, rate)
+        speaking = (envelope > max(envelope.max() * 0.05, 1e-4)).astype(numpy.float32)
+        # Soften the on/off edges (~80ms) so the music glides instead of pumping
+        width = max(1, int(rate * 0.08))
+        kernel = numpy.ones(width, dtype=numpy.float32) / width
+        speaking = numpy.convolve(speaking, kernel, mode="same")
+        gain *= 1 - min(max(duck, 0.0), 1.0) * speaking
+
+    fade = min(frames // 2, int(rate * 0.05))
+    if fade:
+        ramp = numpy.linspace(0, 1, fade, dtype=numpy.float32)
+        gain[:fade] *= ramp
+        gain[-fade:] *= ramp[::-1]
+    return voice + bed * gain[:, None]
+
+
+def resample(samples: "np.ndarray", source_rate: int, target_rate: int) -> "np.ndarray":
+    """Linear-interpolation resampling (background music only, quality is not critical)"""
+    numpy = _numpy()
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    frames = int(len(samples) * target_rate / source_rate)
+    positions = numpy.arange(frames) * (source_rate / target_rate)
+    index = numpy.arange(len(samples))
+    return numpy.stack(
+        [numpy.interp(positions, index, samples[:, c]) for c in range(samples.shape[1])], axis=1
+    ).astype(numpy.float32)
+
+
+def match_channels(samples: "np.ndarray", channels: int) -> "np.ndarray":
+    if samples.shape[1] == channels:
+        return samples
+    mono = samples.mean(axis=1, keepdims=True)
+    return mono if channels == 1 else _numpy().repeat(mono, channels, axis=1)
+
+
+class EffectsChain:
+    """Effects for one audio-effects.cfg entry, applied to synthesized WAV files"""
+
+    def __init__(
+        self,
+        reverb: Optional[Reverb] = None,
+        gain_db: float = 0.0,
+        background: Optional[Path] = None,
+        background_volume: float = DEFAULT_BACKGROUND_VOLUME,
+        duck: float = DEFAULT_DUCK,
+        music: Optional["MusicCache"] = None,
+    ):
+        """
+        Args:
+            reverb: Reverb to apply, None for a dry voice
+            gain_db: Gain applied after the reverb
+            background: Track mixed under the voice, None for no music
+            background_volume: Music level (0.0-1.0)
+            duck: Fraction the music drops under speech (0.0-1.0)
+            music: Decoded track cache the background is read from (required with background)
+        """
+        self.reverb = reverb
+        self.gain_db = gain_db
+        self.background = background
+        self.background_volume = background_volume
+        self.duck = duck
+        self.music = music
+
+    @classmethod
+    def build(
+        cls,
+        effects: str,
+        background: Optional[Path] = None,
+        background_volume: float = DEFAULT_BACKGROUND_VOLUME,
+        duck: float = DEFAULT_DUCK,
+        music: Optional["MusicCache"] = None,
+    ) -> Optional["EffectsChain"]:
+        """
+        Build a chain from an audio-effects.cfg entry.
+
+        Returns:
+            The chain, or None when the entry needs sox (unsupported effect or track format)
+        """
+        parsed = parse_effects(effects)
+        if parsed is None:
+            return None
+        if background is not None and (music is None or not music.can_decode(background)):
+            return None
+        reverb, gain_db = parsed
+        return cls(reverb, gain_db, background, background_volume, duck, music)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.reverb is None and not self.gain_db and self.background is None
+
+    def describe(self) -> str:
+        parts = []
+        if self.reverb is not None:
+            parts.append(
+                f"reverb {self.reverb.reverberance:g} {self.reverb.hf_damping:g} {self.reverb.room_scale:g}"
+            )
+        if self.gain_db:
+            parts.append(f"gain {self.gain_db:+g}dB")
+        if self.background is not None:
+            parts.append(f"music {self.background.name} @ {self.background_volume:.0%}")
+        return ", ".join(parts) or "none"
+
+    def process(self, samples: "np.ndarray", rate: int) -> "np.ndarray":
+        """Apply the chain to float samples shaped (frames, channels)"""
+        if self.reverb is not None:
+            samples = apply_reverb(samples, rate, self.reverb)
+        if self.gain_db:
+            samples = samples * (10 ** (self.gain_db / 20))
+        if self.background is not None:
+            # Each utterance continues the track where the previous one stopped
+            bed = self.music.next_window(self.background, rate, samples.shape[1], len(samples))
+            samples = mix_background(samples, bed, rate, self.background_volume, self.duck)
+        return samples
+
+    def apply_file(self, path: Path) -> None:
+        """
+        Apply the chain to a WAV file in place, keeping its channels, rate and sample width.
+
+        Raises:
+            OSError: The file or background track could not be read or written
+        """
+        if self.is_empty:
+            return
+        try:
+            samples, params = read_wav(path)
+        except (wave.Error, ValueError, EOFError) as e:
+            raise OSError(f"cannot read {path.name}: {e}") from e
+        write_wav(path, self.process(samples, params.framerate), params)
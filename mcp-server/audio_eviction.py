@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/audio_eviction.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview Background eviction of generated TTS audio by size budget, age and recency
+@context clean_audio_cache is all-or-nothing, so between manual runs the audio directory
+         (wav/mp3/aiff clips) grew without limit
+@architecture A periodic pass scans the top level of the audio directory (background music in
+              tracks/ is never touched), orders clips by last use - the later of their mtime
+              and their last replay - and deletes clips past the maximum age, then the least
+              recently used ones until the directory fits the byte budget. Deletions run in
+              worker threads in small batches, with a pause between batches and no progress
+              while speech is in flight, so a pass never stalls a speech request.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.audio_evictor, AgentVibesServer.start_audio_eviction,
+             clean_audio_cache (stats_only reports reclaimed files and bytes)
+@patterns Policy-driven LRU, incremental batches, busy back-off
+@related mcp-server/server.py, mcp-server/audio_history.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+# Generated clips (compressed history clips included); anything else is left alone
+AUDIO_SUFFIXES = frozenset({".wav", ".mp3", ".aiff", ".flac", ".opus"})
+
+# Clips modified this recently are never evicted (they may still be playing)
+DEFAULT_GRACE_SECONDS = 120.0
+
+# Seconds to wait before re-checking when speech is in flight
+BUSY_BACKOFF_SECONDS = 0.25
+
+
+class AudioEvictor:
+    """Keeps the generated-audio directory within a byte budget and a maximum age"""
+
+    def __init__(
+        self,
+        max_bytes: int = 500 * 1024 * 1024,
+        max_age: float = 7 * 86400,
+        batch_size: int = 25,
+        interval: float = 300.0,
+        grace: float = DEFAULT_GRACE_SECONDS,
+        pause: float = 0.05,
+    ):
+        """
+        Args:
+            max_bytes: Evict least recently used clips above this total size (0 = no budget)
+            max_age: Evict clips not used for this many seconds (0 = no age limit)
+            batch_size: Files deleted per worker-thread hop
+            interval: Seconds between background passes
+            grace: Never evict clips used within this many seconds
+            pause: Seconds to yield between batches
+        """
+        self.max_bytes = max(0, max_bytes)
+        self.max_age = max(0.0, max_age)
+        self.batch_size = max(1, batch_size)
+        self.interval = max(1.0, interval)
+        self.grace = max(0.0, grace)
+        self.pause = max(0.0, pause)
+        self.runs = 0
+        self.files_evicted = 0
+        self.bytes_evicted = 0
+        self.last_run: Optional[float] = None
+        self.last_result = (0, 0)  # (files, bytes) reclaimed by the last pass
+        self.audio_files = 0  # clips and bytes left after the last pass
+        self.audio_bytes = 0
+        self._replayed: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["AudioEvictor"]:
+        """
+        Build an evictor from AGENTVIBES_AUDIO_MAX_MB (default 500), AGENTVIBES_AUDIO_MAX_AGE_DAYS
+        (default 7), AGENTVIBES_AUDIO_EVICT_INTERVAL (default 300) and AGENTVIBES_AUDIO_EVICT_BATCH
+        (default 25).
+
+        Returns:
+            None when AGENTVIBES_AUDIO_EVICT=0
+        """
+        if os.environ.get("AGENTVIBES_AUDIO_EVICT", "1").strip().lower() in ("0", "false", "no", "off"):
+            return None
+
+        def number(variable: str, default: float) -> float:
+            try:
+                return float(os.environ.get(variable, str(default)))
+            except ValueError:
+                return default
+
+        return cls(
+            max_bytes=int(number("AGENTVIBES_AUDIO_MAX_MB", 500) * 1024 * 1024),
+            max_age=number("AGENTVIBES_AUDIO_MAX_AGE_DAYS", 7) * 86400,
+            batch_size=int(number("AGENTVIBES_AUDIO_EVICT_BATCH", 25)),
+            interval=number("AGENTVIBES_AUDIO_EVICT_INTERVAL", 300),
+        )
+
+    def touch(self, audio_file: Path) -> None:
+        """Mark a clip as just used (replayed), moving it to the back of the eviction order"""
+        with self._lock:
+            self._replayed[os.path.abspath(audio_file)] = time.time()
+
+    def plan(self, directory: Path, now: Optional[float] = None) -> list[tuple[Path, int]]:
+        """
+        Choose the clips to evict from a directory, oldest use first.
+
+        Blocking (scans the directory); call from a worker thread.
+
+        Returns:
+            (path, size) of each clip to delete
+        """
+        now = time.time() if now is None else now
+        clips = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or os.path.splitext(entry.name)[1].lower() not in AUDIO_SUFFIXES:
+                        continue
+                    try:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    clips.append((stat.st_mtime, stat.st_size, os.path.abspath(entry.path)))
+        except OSError:
+            return []
+
+        with self._lock:
+            replayed = dict(self._replayed)
+        clips = sorted((max(mtime, replayed.get(path, 0.0)), size, path) for mtime, size, path in clips)
+        total = sum(size for _, size, _ in clips)
+        self.audio_files, self.audio_bytes = len(clips), total
+
+        victims = []
+        for last_used, size, path in clips:
+            age = now - last_used
+            if age < self.grace:
+                break  # everything after this was used even more recently
+            expired = self.max_age and age > self.max_age
+            if not expired and not (self.max_bytes and total > self.max_bytes):
+                break
+            victims.append((Path(path), size))
+            total -= size
+        return victims
+
+    def _delete(self, batch: list[tuple[Path, int]]) -> tuple[int, int]:
+        files = freed = 0
+        for path, size in batch:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Warning: Could not evict {path}: {e}", file=sys.stderr)
+                continue
+            files += 1
+            freed += size
+        with self._lock:
+            for path, _ in batch:
+                self._replayed.pop(os.path.abspath(path), None)
+        return files, freed
+
+    async def run_once(self, directories: Iterable[Path], busy: Optional[Callable[[], bool]] = None) -> tuple[int, int]:
+        """
+        Run one eviction pass in small batches.
+
+        Args:
+            directories: Audio directories to keep within the policy
+            busy: Returns True while speech is in flight; batches wait until it returns False
+
+        Returns:
+            (files, bytes) reclaimed
+        """
+        files = freed = 0
+        remaining_files = remaining_bytes = 0
+        for directory in directories:
+            victims = await asyncio.to_thread(self.plan, directory)
+            remaining_files += self.audio_files
+            remaining_bytes += self.audio_bytes
+            for start in range(0, len(victims), self.batch_size):
+                while busy is not None and busy():
+                    await asyncio.sleep(BUSY_BACKOFF_SECONDS)
+                count, size = await asyncio.to_thread(self._delete, victims[start:start + self.batch_size])
+                files += count
+                freed += size
+                await asyncio.sleep(self.pause)
+
+        self._forget_stale_replays()
+        self.runs += 1
+        self.files_evicted += files
+        self.bytes_evicted += freed
+        self.last_run = time.time()
+        self.last_result = (files, freed)
+        self.audio_files, self.audio_bytes = remaining_files - files, remaining_bytes - freed
+        return files, freed
+
+    def _forget_stale_replays(self) -> None:
+        # A replay older than the age limit no longer protects anything
+        if not self.max_age:
+            return
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            self._replayed = {path: used for path, used in self._replayed.items() if used >= cutoff}
+
+    def stats(self) -> dict:
+        """Reclaimed totals, the last pass and the current policy"""
+        return {
+            "runs": self.runs,
+            "files_evicted": self.files_evicted,
+            "bytes_evicted": self.bytes_evicted,
+            "last_run": self.last_run,
+            "last_files": self.last_result[0],
+            "last_bytes": self.last_result[1],
+            "audio_files": self.audio_files,
+            "audio_bytes": self.audio_bytes,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+        }
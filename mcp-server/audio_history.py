@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/audio_history.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Append-only history of spoken utterances for replay_audio
+@context voice-manager.sh replay found the Nth most recent file by listing the audio directory,
+         and knew nothing about the text, voice or agent behind a file
+@architecture One JSON line per event in ~/.cache/agentvibes/history.jsonl: an utterance record,
+              an update (file compressed) or a drop (retention). Loaded lazily into a list with
+              a moving start, plus per-agent, exact-text and word indexes of list positions, so
+              "Nth most recent" (overall or per agent) and exact-text lookups are O(1) and word
+              searches walk the rarest word's postings newest first, binary-searching the
+              others. The file is rewritten when dead lines outnumber live ones.
+@dependencies None (stdlib only); ffmpeg to compress older clips (optional)
+@entrypoints AgentVibesServer.history (text_to_speech records, replay_audio reads)
+@patterns Lazy load, bounded retention by count and bytes, atomic compaction
+@related mcp-server/server.py, mcp-server/synthesis_cache.py
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import wave
+from bisect import bisect_left
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from synthesis_cache import default_cache_dir, normalize_text
+
+# Formats older clips can be compressed to (ffmpeg codec arguments)
+COMPRESSION_CODECS = {
+    "flac": ["-c:a", "flac"],
+    "opus": ["-c:a", "libopus", "-b:a", "32k"],
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> set[str]:
+    return {word.lower() for word in _WORD.findall(text)}
+
+
+def _key(text: str) -> str:
+    return normalize_text(text).lower()
+
+
+def _contains(postings: list[int], position: int) -> bool:
+    """Binary search an ascending posting list"""
+    i = bisect_left(postings, position)
+    return i < len(postings) and postings[i] == position
+
+
+@dataclass
+class HistoryEntry:
+    """One spoken utterance (streamed text has one file per chunk)"""
+
+    id: int
+    time: float
+    text: str
+    files: list[str]
+    voice: Optional[str] = None
+    agent: Optional[str] = None
+    duration: float = 0.0
+    size: int = 0
+    format: str = "wav"
+    # Owned files live in the audio directory and are deleted with the entry;
+    # others (synthesis cache copies) are left alone
+    owned: list[bool] = field(default_factory=list)
+
+
+class AudioHistory:
+    """Bounded, indexed history of utterances backed by an append-only JSONL file"""
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 500,
+        max_bytes: int = 200 * 1024 * 1024,
+        compress: Optional[str] = None,
+        keep_uncompressed: int = 20,
+    ):
+        """
+        Args:
+            path: JSONL file holding the history
+            max_entries: Oldest entries are dropped (and their files deleted) above this count
+            max_bytes: ... or above this many bytes of audio
+            compress: "flac" or "opus" to compress older clips, None to keep WAV
+            keep_uncompressed: Newest entries left as WAV when compressing
+        """
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.compress = compress if compress in COMPRESSION_CODECS else None
+        self.keep_uncompressed = max(0, keep_uncompressed)
+        self._entries: list[HistoryEntry] = []
+        self._start = 0  # entries before this position were dropped
+        self._by_id: dict[int, int] = {}
+        self._by_agent: dict[str, list[int]] = {}
+        self._by_text: dict[str, list[int]] = {}
+        self._by_word: dict[str, list[int]] = {}
+        self._bytes = 0
+        self._next_id = 1
+        self._lines = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_env(cls) -> Optional["AudioHistory"]:
+        """
+        Build a history from AGENTVIBES_HISTORY* environment variables.
+
+        Returns:
+            An AudioHistory, or None when AGENTVIBES_HISTORY=0
+        """
+        if os.environ.get("AGENTVIBES_HISTORY", "1").strip().lower() in ("0", "false", "off", "no"):
+            return None
+        try:
+            max_entries = int(os.environ.get("AGENTVIBES_HISTORY_MAX_ENTRIES", "500"))
+            max_mb = float(os.environ.get("AGENTVIBES_HISTORY_MAX_MB", "200"))
+            keep = int(os.environ.get("AGENTVIBES_HISTORY_KEEP_WAV", "20"))
+        except ValueError:
+            max_entries, max_mb, keep = 500, 200.0, 20
+        compress = os.environ.get("AGENTVIBES_HISTORY_COMPRESS", "").strip().lower() or None
+        return cls(
+            default_cache_dir().parent / "history.jsonl",
+            max_entries,
+            int(max_mb * 1024 * 1024),
+            compress,
+            keep,
+        )
+
+    # Loading and persistence --------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Warning: Could not read audio history {self.path}: {e}", file=sys.stderr)
+            return
+        for line in lines:
+            try:
+                event = json.loads(line)
+                self._apply(event)
+            except (ValueError, TypeError, KeyError):
+                continue  # a torn last line from a crash
+            self._lines += 1
+        # The budgets may have been lowered since the last run
+        self._enforce_retention()
+
+    def _apply(self, event: dict) -> None:
+        """Replay one journal event into memory"""
+        op = event.get("op", "add")
+        if op == "add":
+            entry = HistoryEntry(**{k: v for k, v in event.items() if k != "op"})
+            self._index(entry)
+            self._next_id = max(self._next_id, entry.id + 1)
+        elif op == "update":
+            position = self._by_id.get(event["id"])
+            if position is not None:
+                entry = self._entries[position]
+                self._bytes += event["size"] - entry.size
+                entry.files, entry.size, entry.format = event["files"], event["size"], event["format"]
+        elif op == "drop":
+            position = self._by_id.get(event["id"])
+            if position is not None and position == self._start:
+                self._drop_first()
+        elif op == "clear":
+            self._reset()
+
+    def _append(self, event: dict) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._lines += 1
+        except OSError as e:
+            print(f"Warning: Could not write audio history {self.path}: {e}", file=sys.stderr)
+
+    def _compact_if_needed(self) -> None:
+        """Rewrite the journal with live entries once dead lines outnumber them"""
+        live = len(self._entries) - self._start
+        if self._lines <= 2 * live + 16:
+            return
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as journal:
+                for entry in self._entries[self._start:]:
+                    journal.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self._lines = live
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            print(f"Warning: Could not compact audio history: {e}", file=sys.stderr)
+        # Positions shift once the dead prefix is dropped from memory too
+        self._reindex()
+
+    # Indexes ----------------------------------------------------------------------
+
+    def _index(self, entry: HistoryEntry) -> None:
+        position = len(self._entries)
+        self._entries.append(entry)
+        self._by_id[entry.id] = position
+        self._bytes += entry.size
+        if entry.agent:
+            self._by_agent.setdefault(entry.agent, []).append(position)
+        self._by_text.setdefault(_key(entry.text), []).append(position)
+        for word in _words(entry.text):
+            self._by_word.setdefault(word, []).append(position)
+
+    def _reindex(self) -> None:
+        entries = self._entries[self._start:]
+        self._reset()
+        for entry in entries:
+            self._index(entry)
+
+    def _reset(self) -> None:
+        self._entries, self._start, self._bytes = [], 0, 0
+        self._by_id, self._by_agent, self._by_text, self._by_word = {}, {}, {}, {}
+
+    def _drop_first(self) -> HistoryEntry:
+        entry = self._entries[self._start]
+        self._start += 1
+        self._bytes -= entry.size
+        del self._by_id[entry.id]
+        # Postings are in position order, so dropped positions sit at their front
+        # and are skipped by the position >= _start checks in the lookups
+        return entry
+
+    # Recording ----------------------------------------------------------------------
+
+    def record(
+        self,
+        files: list[Path],
+        text: str,
+        voice: Optional[str] = None,
+        agent: Optional[str] = None,
+        owned_dir: Optional[Path] = None,
+    ) -> Optional[HistoryEntry]:
+        """
+        Add an utterance, then drop the oldest entries over the count or byte budget.
+
+        Args:
+            files: Audio files that were played, in order
+            text: The spoken text
+            voice: Voice used
+            agent: Speaking agent
+            owned_dir: Files inside this directory are deleted when the entry is dropped
+
+        Returns:
+            The new entry, or None when no file exists
+        """
+        existing = [f for f in files if f.is_file()]
+        if not existing:
+            return None
+        size = duration = 0
+        for audio_file in existing:
+            size += audio_file.stat().st_size
+            duration += _wav_duration(audio_file)
+        owned = [_inside(f, owned_dir) for f in existing]
+        with self._lock:
+            self._ensure_loaded()
+            entry = HistoryEntry(
+                id=self._next_id,
+                time=time.time(),
+                text=text,
+                files=[str(f) for f in existing],
+                voice=voice,
+                agent=agent,
+                duration=round(duration, 3),
+                size=size,
+                format=existing[0].suffix.lstrip(".").lower() or "wav",
+                owned=owned,
+            )
+            self._next_id += 1
+            self._index(entry)
+            self._append({"op": "add", **asdict(entry)})
+            self._enforce_retention()
+        return entry
+
+    def _enforce_retention(self) -> None:
+        while self._start < len(self._entries) - 1 and (
+            len(self._entries) - self._start > self.max_entries or self._bytes > self.max_bytes
+        ):
+            entry = self._drop_first()
+            self._append({"op": "drop", "id": entry.id})
+            _delete_owned(entry)
+        self._compact_if_needed()
+
+    def clear(self) -> int:
+        """Forget every entry (the audio files are deleted by clean_audio_cache); returns the count"""
+        with self._lock:
+            self._ensure_loaded()
+            count = len(self._entries) - self._start
+            self._reset()
+            self._append({"op": "clear"})
+            self._compact_if_needed()
+            return count
+
+    # Lookups ------------------------------------------------------------------------
+
+    def _nth(self, positions: list[int], n: int) -> Optional[HistoryEntry]:
+        if n < 1 or n > len(positions):
+            return None
+        position = positions[-n]
+        return self._entries[position] if position >= self._start else None
+
+    def get(self, n: int = 1, agent: Optional[str] = None) -> Optional[HistoryEntry]:
+        """
+        Get the Nth most recent utterance, overall or by one agent (O(1)).
+
+        Args:
+            n: 1 = most recent
+            agent: Only count this agent's utterances
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if agent is not None:
+                return self._nth(self._by_agent.get(agent, []), n)
+            if n < 1 or n > len(self._entries) - self._start:
+                return None
+            return self._entries[-n]
+
+    def search(self, query: str, n: int = 1, agent: Optional[str] = None) -> Optional[HistoryEntry]:
+        """
+        Find the Nth most recent utterance matching text.
+
+        An exact (case and whitespace insensitive) match wins; otherwise every word
+        of the query must appear in the text.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            candidates = self._by_text.get(_key(query))
+            if not candidates:
+                words = _words(query)
+                if not words:
+                    return None
+                postings = sorted((self._by_word.get(word, []) for word in words), key=len)
+                candidates, others = postings[0], postings[1:]
+            else:
+                others = []
+            matches = 0
+            for position in reversed(candidates):
+                if position < self._start:
+                    break
+                if not all(_contains(other, position) for other in others):
+                    continue
+                entry = self._entries[position]
+                if agent is not None and entry.agent != agent:
+                    continue
+                matches += 1
+                if matches == n:
+                    return entry
+            return None
+
+    def recent(self, limit: int = 10) -> list[HistoryEntry]:
+        """Most recent entries first"""
+        with self._lock:
+            self._ensure_loaded()
+            return list(reversed(self._entries[max(self._start, len(self._entries) - limit):]))
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "entries": len(self._entries) - self._start,
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "compress": self.compress,
+            }
+
+    # Compression ----------------------------------------------------------------------
+
+    def compress_older(self) -> int:
+        """
+        Compress owned WAV clips older than the newest keep_uncompressed entries.
+
+        Blocking (runs ffmpeg); call from a worker thread.
+
+        Returns:
+            Number of entries compressed
+        """
+        if self.compress is None or not shutil.which("ffmpeg"):
+            return 0
+        with self._lock:
+            self._ensure_loaded()
+            cutoff = len(self._entries) - self.keep_uncompressed
+            pending = [
+                entry for entry in self._entries[self._start:max(self._start, cutoff)]
+                if entry.format == "wav" and all(entry.owned)
+            ]
+        compressed = 0
+        for entry in pending:
+            sources = [Path(f) for f in entry.files]
+            files, size = [], 0
+            for source in sources:
+                target = source.with_suffix(f".{self.compress}")
+                result = subprocess.run(
+                    ["ffmpeg", "-v", "error", "-y", "-i", str(source), *COMPRESSION_CODECS[self.compress], str(target)],
+                    capture_output=True,
+                    timeout=120,
+                )
+                if result.returncode != 0 or not target.is_file():
+                    target.unlink(missing_ok=True)
+                    break
+                files.append(str(target))
+                size += target.stat().st_size
+            else:
+                with self._lock:
+                    if entry.id not in self._by_id:
+                        continue  # dropped meanwhile
+                    update = {"op": "update", "id": entry.id, "files": files, "size": size, "format": self.compress}
+                    self._apply(update)
+                    self._append(update)
+                for source in sources:
+                    source.unlink(missing_ok=True)
+                compressed += 1
+        return compressed
+
+
+def decode_to_wav(source: Path, target: Path) -> bool:
+    """Decode a compressed clip for players that only take WAV (aplay)"""
+    if not shutil.which("ffmpeg"):
+        return False
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-i", str(source), str(target)], capture_output=True, timeout=120
+    )
+    return result.returncode == 0 and target.is_file()
+
+
+def _wav_duration(path: Path) -> float:
+    try:
+        with wave.open(str(path), "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate() or 1)
+    except (wave.Error, EOFError, OSError):
+        return 0.0
+
+
+def _inside(path: Path, directory: Optional[Path]) -> bool:
+    if directory is None:
+        return False
+    try:
+        return path.resolve().is_relative_to(directory.resolve())
+    except OSError:
+        return False
+
+
+def _delete_owned(entry: HistoryEntry) -> None:
+    for audio_file, owned in zip(entry.files, entry.owned):
+        if owned:
+            try:
+                Path(audio_file).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Warning: Could not delete {audio_file}: {e}", file=sys.stderr)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/audio_playback.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Plays audio files produced in-process by the MCP server
+@context In-process synthesis skips play-tts.sh, so the server needs its own way to play WAV files
+@architecture Player discovery (first available binary wins) + async subprocess playback
+@dependencies One of paplay, aplay, afplay, ffplay, play (sox) on PATH
+@entrypoints Called by AgentVibesServer when speaking audio that was not produced by play-tts.sh
+@patterns Mirrors the player fallback order used by the bash hooks, fail-soft (returns False)
+@related mcp-server/server.py, mcp-server/piper_engine.py, .claude/hooks/play-tts-piper.sh
+"""
+
+import asyncio
+import platform
+import shutil
+from pathlib import Path
+from typing import Optional
+
+# Player candidates in order of preference, with the arguments needed for
+# non-interactive playback of a single file.
+_PLAYER_CANDIDATES = [
+    ("afplay", []),
+    ("paplay", []),
+    ("aplay", ["-q"]),
+    ("ffplay", ["-nodisp", "-autoexit", "-loglevel", "quiet"]),
+    ("play", ["-q"]),
+]
+
+_player_cache: Optional[list] = None
+
+
+def find_player() -> Optional[list]:
+    """Return the command prefix of the first available audio player, or None"""
+    global _player_cache
+    if _player_cache is not None:
+        return _player_cache or None
+
+    candidates = _PLAYER_CANDIDATES
+    if platform.system() != "Darwin":
+        candidates = [c for c in candidates if c[0] != "afplay"]
+
+    for binary, args in candidates:
+        path = shutil.which(binary)
+        if path:
+            _player_cache = [path] + args
+            return _player_cache
+
+    _player_cache = []
+    return None
+
+
+async def play_file(path: Path) -> bool:
+    """
+    Play an audio file and wait for playback to finish.
+
+    Args:
+        path: Audio file to play
+
+    Returns:
+        True if playback succeeded, False if no player is available or it failed
+    """
+    player = find_player()
+    if not player:
+        return False
+
+    proc = await asyncio.create_subprocess_exec(
+        *player,
+        str(path),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        await proc.wait()
+        return proc.returncode == 0
+    finally:
+        # Ensure the player is stopped if playback was cancelled
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
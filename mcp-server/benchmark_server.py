@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/benchmark_server.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Reproducible latency/throughput benchmark for the MCP server hot paths
+@context Nothing measured performance, so regressions in text_to_speech, get_config or list_voices went unnoticed
+@architecture Builds a throwaway sandbox (HOME, project .claude/, stub hooks, fake piper and audio player),
+              imports server.py inside it and drives the MCP CallToolRequest handler end to end
+              (schema validation -> registry -> handler -> hook scripts). Single and concurrent runs,
+              plus cold starts: server.py spawned over stdio until initialize and tools/list answer,
+              and the in-process effects chain against the sox commands play-tts.sh runs.
+@dependencies mcp (same as server.py); bash for the stub hooks. No network, no real TTS.
+@entrypoints python benchmark_server.py [--save FILE] [--compare FILE]
+@patterns Sandbox env set before importing server (module-level AgentVibesServer), JSON baseline files
+@related mcp-server/server.py, mcp-server/test_server.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from datetime import datetime, timezone
+from pathlib import Path
+
+VOICES = ["en_US-lessac-medium", "en_GB-alba-medium"]
+
+# Stub play-tts.sh: same shape as the real hook (synthesize with piper, play, report the file)
+PLAY_TTS_STUB = """#!/usr/bin/env bash
+text="$1"
+voice="${2:-$(cat "$CLAUDE_PROJECT_DIR/.claude/tts-voice.txt" 2>/dev/null)}"
+audio_dir="$CLAUDE_PROJECT_DIR/.claude/audio"
+mkdir -p "$audio_dir"
+out="$audio_dir/tts-$$-$RANDOM.wav"
+echo "$text" | piper --model "$BENCH_VOICES_DIR/$voice.onnx" --output_file "$out" || exit 1
+aplay -q "$out" || exit 1
+echo "Saved to: $out"
+"""
+
+# Stub voice-manager.sh: list-simple and switch, like the real manager
+VOICE_MANAGER_STUB = """#!/usr/bin/env bash
+case "$1" in
+  list-simple) ls "$BENCH_VOICES_DIR" | sed 's/\\.onnx$//' ;;
+  switch) echo "$2" > "$CLAUDE_PROJECT_DIR/.claude/tts-voice.txt"; echo "✅ Voice switched to: $2" ;;
+  get) cat "$CLAUDE_PROJECT_DIR/.claude/tts-voice.txt" ;;
+  *) echo "unknown command: $1" >&2; exit 1 ;;
+esac
+"""
+
+# Fake piper binary: consumes the text and copies a prebuilt WAV after an optional delay
+FAKE_PIPER = """#!/usr/bin/env bash
+while [ $# -gt 0 ]; do
+  case "$1" in --output_file|-f) out="$2"; shift ;; esac
+  shift
+done
+cat > /dev/null
+[ "${BENCH_SYNTH_DELAY:-0}" != "0" ] && sleep "$BENCH_SYNTH_DELAY"
+cp "$BENCH_TEMPLATE_WAV" "$out"
+"""
+
+# Fake audio player (installed as aplay and paplay)
+FAKE_PLAYER = """#!/usr/bin/env bash
+[ "${BENCH_PLAY_DELAY:-0}" != "0" ] && sleep "$BENCH_PLAY_DELAY"
+exit 0
+"""
+
+# (name, tool, arguments for iteration i)
+SCENARIOS = [
+    ("get_config", "get_config", lambda i: {}),
+    ("list_voices", "list_voices", lambda i: {}),
+    ("set_voice", "set_voice", lambda i: {"voice_name": VOICES[i % len(VOICES)]}),
+    ("text_to_speech", "text_to_speech", lambda i: {"text": f"Benchmark utterance number {i}.", "wait": True}),
+    ("text_to_speech_cached", "text_to_speech", lambda i: {"text": "Benchmark cached utterance.", "wait": True}),
+]
+
+
+def build_sandbox(root: Path, synth_delay: float, play_delay: float) -> Path:
+    """
+    Create the benchmark sandbox and point the process environment at it.
+
+    Must run before server.py is imported (paths are resolved at import time).
+
+    Returns:
+        The project directory (contains .claude/) to run from
+    """
+    home = root / "home"
+    project = root / "project"
+    claude = project / ".claude"
+    hooks = root / "hooks"
+    bin_dir = root / "bin"
+    voices = root / "voices"
+    for directory in (home, claude / "audio", hooks, bin_dir, voices):
+        directory.mkdir(parents=True, exist_ok=True)
+
+    template = root / "template.wav"
+    with wave.open(str(template), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(22050)
+        wav.writeframes(b"\0\0" * 5512)  # 0.25s of silence
+
+    for voice in VOICES:
+        (voices / f"{voice}.onnx").write_bytes(b"fake model")
+        (voices / f"{voice}.onnx.json").write_text("{}")
+    (claude / "tts-provider.txt").write_text("piper\n")
+    (claude / "tts-voice.txt").write_text(f"{VOICES[0]}\n")
+    (claude / "tts-personality.txt").write_text("normal\n")
+    (claude / "piper-voices-dir.txt").write_text(f"{voices}\n")
+
+    for path, content in (
+        (hooks / "play-tts.sh", PLAY_TTS_STUB),
+        (hooks / "voice-manager.sh", VOICE_MANAGER_STUB),
+        (bin_dir / "piper", FAKE_PIPER),
+        (bin_dir / "aplay", FAKE_PLAYER),
+        (bin_dir / "paplay", FAKE_PLAYER),
+    ):
+        path.write_text(content)
+        path.chmod(0o755)
+
+    os.environ.update({
+        "HOME": str(home),
+        "XDG_CACHE_HOME": str(home / ".cache"),
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "BENCH_VOICES_DIR": str(voices),
+        "BENCH_TEMPLATE_WAV": str(template),
+        "BENCH_SYNTH_DELAY": f"{synth_delay:g}",
+        "BENCH_PLAY_DELAY": f"{play_delay:g}",
+        # Measure the hook path, and let repeated text reach the synthesis cache
+        "AGENTVIBES_PIPER_ENGINE": "0",
+        "AGENTVIBES_COALESCE_MS": "0",
+    })
+    for name in ("CLAUDE_PROJECT_DIR", "AGENTVIBES_METRICS_FILE"):
+        os.environ.pop(name, None)
+    os.chdir(project)
+    return project
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(q * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], wall: float, errors: int) -> dict:
+    """Turn raw latencies (seconds) into the stored result (milliseconds)"""
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "throughput_per_s": len(latencies) / wall if wall > 0 else 0.0,
+    }
+
+
+async def run_benchmarks(iterations: int, concurrency: int, warmup: int, only: list[str]) -> dict:
+    """
+    Drive every scenario through the MCP CallToolRequest handler.
+
+    Returns:
+        {"<scenario>/single" | "<scenario>/concurrent": summary}
+    """
+    # Imported here: the sandbox environment must be in place first
+    import server
+    from mcp import types
+
+    server.agent_vibes.hooks_dir = Path(os.environ["BENCH_VOICES_DIR"]).parent / "hooks"
+    server.agent_vibes.start_config_watcher()
+    handler = server.app.request_handlers[types.CallToolRequest]
+
+    async def call(tool: str, arguments: dict) -> tuple[float, bool]:
+        request = types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name=tool, arguments=arguments),
+        )
+        started = time.perf_counter()
+        response = await handler(request)
+        elapsed = time.perf_counter() - started
+        result = response.root
+        text = result.content[0].text if result.content else ""
+        failed = bool(result.isError) or text.startswith(("❌", "Error:", "Script not found"))
+        return elapsed, failed
+
+    results = {}
+    try:
+        for name, tool, make_args in SCENARIOS:
+            if only and name not in only:
+                continue
+            for i in range(warmup):
+                await call(tool, make_args(i))
+
+            latencies, errors = [], 0
+            wall_start = time.perf_counter()
+            for i in range(iterations):
+                elapsed, failed = await call(tool, make_args(warmup + i))
+                latencies.append(elapsed)
+                errors += failed
+            results[f"{name}/single"] = summarize(latencies, time.perf_counter() - wall_start, errors)
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def limited(i: int) -> tuple[float, bool]:
+                async with semaphore:
+                    return await call(tool, make_args(warmup + iterations + i))
+
+            wall_start = time.perf_counter()
+            outcomes = await asyncio.gather(*(limited(i) for i in range(iterations)))
+            results[f"{name}/concurrent"] = summarize(
+                [elapsed for elapsed, _ in outcomes],
+                time.perf_counter() - wall_start,
+                sum(failed for _, failed in outcomes),
+            )
+    finally:
+        server.agent_vibes.stop_config_watcher()
+        if server.agent_vibes.speech_queue is not None:
+            await server.agent_vibes.speech_queue.close()
+    return results
+
+
+def measure_effects(root: Path, iterations: int) -> dict:
+    """
+    Time reverb plus background music on a 3s utterance: in-process chain vs sox.
+
+    The sox run mirrors play-tts.sh (one sox for the effects, one for the mix) and
+    is skipped when sox is not installed.
+
+    Returns:
+        {"effects/in_process": summary, "effects/sox": summary}
+    """
+    from audio_effects import EffectsChain, Reverb, effects_available
+    from music_cache import MusicCache
+    if not effects_available():
+        print("⚠️  numpy not installed, skipping the effects scenario", file=sys.stderr)
+        return {}
+    import numpy as np
+
+    rate = 22050
+    voice_wav, music_wav = root / "effects-voice.wav", root / "effects-music.wav"
+    t = np.arange(rate * 3) / rate
+    voice = 0.3 * np.sin(2 * np.pi * 180 * t) * (np.sin(2 * np.pi * 3 * t) > 0)
+    music = 0.5 * np.sin(2 * np.pi * 330 * t[:rate * 2])
+    for path, samples in ((voice_wav, voice), (music_wav, music)):
+        with wave.open(str(path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes((samples * 32767).astype("<i2").tobytes())
+
+    work = root / "effects-work.wav"
+    chain = EffectsChain(
+        Reverb(40, 50, 70), background=music_wav, background_volume=0.3, music=MusicCache(root / "music")
+    )
+    runs = {"in_process": lambda: chain.apply_file(work)}
+    if shutil.which("sox"):
+        def sox_path():
+            reverbed = root / "effects-reverb.wav"
+            subprocess.run(["sox", str(work), str(reverbed), "reverb", "40", "50", "70"], check=True)
+            subprocess.run(
+                ["sox", "-m", str(reverbed), "-v", "0.3", str(music_wav), str(work), "trim", "0", "3"],
+                check=True,
+            )
+        runs["sox"] = sox_path
+
+    results = {}
+    for name, run in runs.items():
+        latencies, errors = [], 0
+        wall_start = time.perf_counter()
+        for _ in range(iterations):
+            shutil.copyfile(voice_wav, work)
+            started = time.perf_counter()
+            try:
+                run()
+            except (OSError, subprocess.CalledProcessError):
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+        results[f"effects/{name}"] = summarize(latencies, time.perf_counter() - wall_start, errors)
+    return results
+
+
+async def measure_cold_start(runs: int) -> dict:
+    """
+    Spawn server.py over stdio and time initialize and the first tools/list.
+
+    Returns:
+        {"cold_start/initialize": summary, "cold_start/list_tools": summary}
+    """
+    script = Path(__file__).resolve().parent / "server.py"
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+            "protocolVersion": "2024-11-05",
+            "capabilities": {},
+            "clientInfo": {"name": "agentvibes-benchmark", "version": "1.0"},
+        }},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    ]
+    timings: dict[str, list[float]] = {"initialize": [], "list_tools": []}
+    errors = 0
+    wall_start = time.perf_counter()
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(script),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            process.stdin.write("".join(json.dumps(m) + "\n" for m in messages).encode())
+            await process.stdin.drain()
+            for name, request_id in (("initialize", 1), ("list_tools", 2)):
+                while True:
+                    line = await asyncio.wait_for(process.stdout.readline(), 30)
+                    if not line:
+                        raise RuntimeError("server exited before answering")
+                    response = json.loads(line)
+                    if response.get("id") == request_id:
+                        break
+                timings[name].append(time.perf_counter() - started)
+                errors += "error" in response
+        except (RuntimeError, asyncio.TimeoutError, ValueError) as e:
+            print(f"⚠️  Cold start failed: {e}", file=sys.stderr)
+            errors += 1
+        finally:
+            process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), 5)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+    wall = time.perf_counter() - wall_start
+    return {
+        f"cold_start/{name}": summarize(samples, wall, errors)
+        for name, samples in timings.items() if samples
+    }
+
+
+def print_results(results: dict) -> None:
+    print(f"{'scenario':<36}{'p50':>9}{'p95':>9}{'p99':>9}{'ops/s':>10}{'errors':>8}")
+    print("━" * 81)
+    for key, summary in results.items():
+        print(
+            f"{key:<36}{summary['p50_ms']:>7.2f}ms{summary['p95_ms']:>7.2f}ms"
+            f"{summary['p99_ms']:>7.2f}ms{summary['throughput_per_s']:>10.1f}{summary['errors']:>8}"
+        )
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare a run with a saved baseline.
+
+    A scenario regresses when its p50 or p95 grows by more than `threshold`
+    (fraction) and by at least 1ms, so sub-millisecond jitter is ignored.
+
+    Returns:
+        Regressed scenario descriptions (empty when everything is within bounds)
+    """
+    regressions = []
+    print(f"\n{'scenario':<36}{'p50 Δ':>10}{'p95 Δ':>10}")
+    print("━" * 56)
+    for key, summary in results.items():
+        before = baseline.get("results", {}).get(key)
+        if before is None:
+            print(f"{key:<36}{'(new)':>10}")
+            continue
+        deltas = []
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = before[metric], summary[metric]
+            change = (new - old) / old if old else 0.0
+            deltas.append(f"{change:+.0%}")
+            if change > threshold and new - old >= 1.0:
+                regressions.append(f"{key} {metric[:3]}: {old:.2f}ms -> {new:.2f}ms ({change:+.0%})")
+        print(f"{key:<36}{deltas[0]:>10}{deltas[1]:>10}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the AgentVibes MCP server offline")
+    parser.add_argument("--iterations", type=int, default=50, help="calls per scenario and mode (default: 50)")
+    parser.add_argument("--concurrency", type=int, default=8, help="calls in flight for concurrent runs (default: 8)")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed calls per scenario (default: 3)")
+    parser.add_argument("--synth-delay", type=float, default=0.0, help="fake piper synthesis time in seconds")
+    parser.add_argument("--play-delay", type=float, default=0.0, help="fake player playback time in seconds")
+    parser.add_argument("--cold-starts", type=int, default=5, help="server launches to time (default: 5, 0 = skip)")
+    parser.add_argument("--scenario", action="append", default=[], help="only run this scenario (repeatable)")
+    parser.add_argument("--save", type=Path, help="write results to a JSON baseline file")
+    parser.add_argument("--compare", type=Path, help="compare with a JSON baseline; exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (default: 0.25)")
+    args = parser.parse_args()
+
+    extra = {"cold_start", "effects"}
+    unknown = set(args.scenario) - {name for name, _, _ in SCENARIOS} - extra
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    save = args.save.resolve() if args.save else None
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    original_cwd = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix="agentvibes-bench-") as tmp:
+        build_sandbox(Path(tmp), args.synth_delay, args.play_delay)
+        try:
+            results = {}
+            if args.cold_starts > 0 and (not args.scenario or "cold_start" in args.scenario):
+                results.update(asyncio.run(measure_cold_start(args.cold_starts)))
+            if not args.scenario or "effects" in args.scenario:
+                results.update(measure_effects(Path(tmp), args.iterations))
+            if not args.scenario or set(args.scenario) - extra:
+                results.update(asyncio.run(
+                    run_benchmarks(args.iterations, args.concurrency, args.warmup, args.scenario)
+                ))
+        finally:
+            os.chdir(original_cwd)
+
+    print_results(results)
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "cold_starts": args.cold_starts,
+            "synth_delay": args.synth_delay,
+            "play_delay": args.play_delay,
+        },
+        "results": results,
+    }
+    if save is not None:
+        save.write_text(json.dumps(report, indent=2))
+        print(f"\n📁 Saved baseline: {save}")
+
+    failed = sum(summary["errors"] for summary in results.values())
+    if failed:
+        print(f"\n❌ {failed} call(s) returned errors")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n❌ Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
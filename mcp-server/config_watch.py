@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/config_watch.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Watches AgentVibes settings files and mute flags for changes
+@context Lets the in-memory settings snapshot stay valid until something actually changes on disk
+@architecture Background thread: Linux inotify via ctypes, stat-polling fallback elsewhere.
+              Calls on_change(changed_paths) from the watcher thread.
+@dependencies libc inotify (Linux, optional), otherwise none
+@entrypoints AgentVibesServer.start_config_watcher
+@patterns Backend auto-selection with fallback, daemon thread, name filtering per directory
+@related mcp-server/settings_store.py, mcp-server/server.py
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+# inotify event masks (see <sys/inotify.h>)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+    | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class ConfigWatcher:
+    """Reports changes to a fixed set of files"""
+
+    def __init__(
+        self,
+        files: list[Path],
+        on_change: Callable[[list[Path]], None],
+        poll_interval: float = 2.0,
+        force_polling: bool = False,
+    ):
+        """
+        Args:
+            files: Files to watch (they do not need to exist yet)
+            on_change: Called from the watcher thread with the changed paths
+            poll_interval: Seconds between scans when polling
+            force_polling: Skip inotify even where it is available
+        """
+        self.files = sorted(set(files))
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.backend = "polling"
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify_fd: Optional[int] = None
+        self._libc = None if force_polling else self._load_inotify()
+
+    @staticmethod
+    def _load_inotify():
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1  # noqa: B018 - probe the symbol
+            return libc
+        except (OSError, AttributeError):
+            return None
+
+    def start(self) -> None:
+        """Start watching in a daemon thread (changes made after this call are reported)"""
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(os.O_CLOEXEC)
+            if fd >= 0:
+                self._inotify_fd = fd
+                self.backend = "inotify"
+        # Arm/scan before returning so no change slips in before the thread runs
+        if self._inotify_fd is not None:
+            target, initial = self._run_inotify, self._arm()
+        else:
+            target, initial = self._run_polling, self._signature()
+        self._thread = threading.Thread(
+            target=target, args=(initial,), name="agentvibes-config-watch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the watcher thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    # Polling backend ---------------------------------------------------------
+
+    def _signature(self) -> dict:
+        signature = {}
+        for path in self.files:
+            try:
+                st = path.stat()
+                signature[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+            except OSError:
+                signature[path] = None
+        return signature
+
+    def _run_polling(self, previous: dict) -> None:
+        while not self._stop.wait(self.poll_interval):
+            current = self._signature()
+            changed = [path for path in self.files if current[path] != previous[path]]
+            previous = current
+            if changed:
+                self._emit(changed)
+
+    # inotify backend ---------------------------------------------------------
+
+    def _arm(self) -> dict:
+        """Watch the nearest existing directory of every file; returns wd -> directory"""
+        watches = {}
+        for directory in sorted({path.parent for path in self.files}):
+            # Watch the closest existing ancestor so creation of .claude/ or
+            # config/ is noticed, then re-arm to watch the new directory itself
+            target = directory
+            while not target.is_dir() and target != target.parent:
+                target = target.parent
+            wd = self._libc.inotify_add_watch(
+                self._inotify_fd, os.fsencode(str(target)), _WATCH_MASK
+            )
+            if wd >= 0:
+                watches[wd] = target
+        return watches
+
+    def _run_inotify(self, watches: dict) -> None:
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._inotify_fd], [], [], 1.0)
+                if not ready:
+                    continue
+                data = os.read(self._inotify_fd, 64 * 1024)
+            except (OSError, ValueError, TypeError):
+                return
+
+            changed, rearm = set(), False
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                raw_name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_len]
+                offset += _EVENT_HEADER.size + name_len
+                directory = watches.get(wd)
+                if directory is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF | _IN_IGNORED):
+                    rearm = True
+                    continue
+                path = directory / os.fsdecode(raw_name.rstrip(b"\0"))
+                if path in self.files:
+                    changed.add(path)
+                elif any(path == f.parent or path in f.parents for f in self.files):
+                    # A directory on the way to a watched file appeared/vanished
+                    rearm = True
+                    changed.update(f for f in self.files if path in f.parents)
+
+            if rearm:
+                for wd in list(watches):
+                    self._libc.inotify_rm_watch(self._inotify_fd, wd)
+                watches = self._arm()
+            if changed:
+                self._emit(sorted(changed))
+
+    def _emit(self, changed: list[Path]) -> None:
+        try:
+            self.on_change(changed)
+        except Exception as e:
+            print(f"Warning: config change handler failed: {e}", file=sys.stderr)
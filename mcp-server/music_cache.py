@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/music_cache.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Background music tracks decoded once to raw PCM and memory-mapped
+@context Mixing music under speech decoded the MP3 track again for every utterance
+@architecture Each (track, mtime, size, rate, channels) is decoded to a raw s16le file in
+              ~/.cache/agentvibes/music/ and opened with numpy.memmap. The mixer asks for a
+              window at the track's playback position, which wraps at the end of the track
+              and advances per utterance, so only the pages under that window are read.
+              Decoded files are evicted oldest-first above a byte budget.
+@dependencies numpy (via audio_effects); ffmpeg or sox to decode non-WAV tracks
+@entrypoints AgentVibesServer.music_cache, EffectsChain.process
+@patterns Decode-once disk cache, bounded set of open maps, per-track playback cursor
+@related mcp-server/audio_effects.py, mcp-server/synthesis_cache.py
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from audio_effects import match_channels, read_wav, resample
+from synthesis_cache import default_cache_dir
+
+# Memory maps kept open at once (each costs a file descriptor, not memory)
+MAX_OPEN_TRACKS = 4
+
+# Frames copied per block when a WAV track is already in the target format
+COPY_BLOCK_FRAMES = 1 << 16
+
+
+def _decode_command(source: Path, target: Path, rate: int, channels: int) -> Optional[list[str]]:
+    """Command that decodes a track to a raw s16le file, None without a decoder"""
+    if shutil.which("ffmpeg"):
+        return [
+            "ffmpeg", "-v", "error", "-y", "-i", str(source),
+            "-f", "s16le", "-acodec", "pcm_s16le", "-ac", str(channels), "-ar", str(rate), str(target),
+        ]
+    if shutil.which("sox"):
+        return [
+            "sox", str(source), "-t", "raw", "-e", "signed-integer", "-b", "16", "-L",
+            "-c", str(channels), "-r", str(rate), str(target),
+        ]
+    return None
+
+
+class Track:
+    """A decoded track, memory-mapped as (frames, channels) int16"""
+
+    def __init__(self, path: Path, channels: int):
+        self.path = path
+        self.channels = channels
+        self.frames = path.stat().st_size // (2 * channels)
+        self._data = None
+
+    def data(self):
+        if self._data is None and self.frames:
+            import numpy
+            self._data = numpy.memmap(self.path, dtype="<i2", mode="r", shape=(self.frames, self.channels))
+        return self._data
+
+    def window(self, offset: int, frames: int):
+        """
+        Read frames starting at offset, wrapping around the end of the track.
+
+        Returns:
+            float32 samples shaped (frames, channels) in [-1, 1]
+        """
+        import numpy
+        out = numpy.zeros((frames, self.channels), dtype=numpy.float32)
+        if not self.frames:
+            return out
+        data = self.data()
+        start = offset % self.frames
+        filled = 0
+        while filled < frames:
+            take = min(frames - filled, self.frames - start)
+            out[filled:filled + take] = data[start:start + take]
+            filled += take
+            start = 0
+        out /= 32768
+        return out
+
+
+class MusicCache:
+    """Decode-once cache of background music tracks with a playback cursor per track"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            cache_dir: Directory holding decoded .pcm files
+            max_bytes: Evict the least recently used decoded files above this total size
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.decodes = 0
+        self._open: "OrderedDict[Path, Track]" = OrderedDict()
+        self._positions: dict[Path, int] = {}
+        self._lock = threading.Lock()
+        self._decode_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "MusicCache":
+        """Build a cache from AGENTVIBES_MUSIC_CACHE_MAX_MB (default 512)"""
+        try:
+            max_mb = float(os.environ.get("AGENTVIBES_MUSIC_CACHE_MAX_MB", "512"))
+        except ValueError:
+            max_mb = 512.0
+        return cls(default_cache_dir().parent / "music", int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def can_decode(source: Path) -> bool:
+        """Check whether a track can be decoded in-process (WAV) or with ffmpeg/sox"""
+        if source.suffix.lower() == ".wav":
+            return True
+        return _decode_command(source, source, 22050, 1) is not None
+
+    def _decoded_path(self, source: Path, rate: int, channels: int) -> Path:
+        stat = source.stat()
+        identity = f"{source.resolve()}|{stat.st_mtime_ns}|{stat.st_size}"
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+        return self.cache_dir / f"{digest}.{rate}x{channels}.pcm"
+
+    def track(self, source: Path, rate: int, channels: int) -> Track:
+        """
+        Get a track decoded to the given rate and channel count, decoding it on first use.
+
+        Raises:
+            OSError: The track could not be read or decoded
+        """
+        decoded = self._decoded_path(source, rate, channels)
+        with self._lock:
+            track = self._open.get(decoded)
+            if track is not None:
+                self._open.move_to_end(decoded)
+                return track
+
+        if not decoded.is_file():
+            with self._decode_lock:
+                if not decoded.is_file():
+                    self._decode(source, decoded, rate, channels)
+                    self._evict(keep=decoded)
+        else:
+            os.utime(decoded)  # eviction order follows use
+
+        track = Track(decoded, channels)
+        with self._lock:
+            track = self._open.setdefault(decoded, track)
+            self._open.move_to_end(decoded)
+            while len(self._open) > MAX_OPEN_TRACKS:
+                self._open.popitem(last=False)
+        return track
+
+    def next_window(self, source: Path, rate: int, channels: int, frames: int):
+        """
+        Read the next frames of a track and advance its playback position.
+
+        Consecutive utterances continue the music where the last one stopped.
+
+        Returns:
+            float32 samples shaped (frames, channels)
+        """
+        track = self.track(source, rate, channels)
+        with self._lock:
+            offset = self._positions.get(track.path, 0)
+            self._positions[track.path] = (offset + frames) % max(track.frames, 1)
+        return track.window(offset, frames)
+
+    def _decode(self, source: Path, target: Path, rate: int, channels: int) -> None:
+        """Decode a track to raw s16le (written to a temp file, then renamed)"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            if source.suffix.lower() == ".wav":
+                self._decode_wav(source, tmp, rate, channels)
+            else:
+                command = _decode_command(source, tmp, rate, channels)
+                if command is None:
+                    raise OSError(f"no decoder (ffmpeg or sox) for {source.name}")
+                result = subprocess.run(command, capture_output=True, timeout=300)
+                if result.returncode != 0:
+                    raise OSError(
+                        f"cannot decode {source.name}: {result.stderr.decode(errors='replace').strip()}"
+                    )
+            os.replace(tmp, target)
+            self.decodes += 1
+        except subprocess.TimeoutExpired as e:
+            raise OSError(f"decoding {source.name} timed out") from e
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @staticmethod
+    def _decode_wav(source: Path, target: Path, rate: int, channels: int) -> None:
+        import numpy
+        try:
+            with wave.open(str(source), "rb") as wav:
+                params = wav.getparams()
+                if (params.sampwidth, params.framerate, params.nchannels) == (2, rate, channels):
+                    # Already in the target format: copy block by block
+                    with open(target, "wb") as out:
+                        while True:
+                            block = wav.readframes(COPY_BLOCK_FRAMES)
+                            if not block:
+                                return
+                            out.write(block)
+            samples, params = read_wav(source)
+        except (wave.Error, ValueError, EOFError) as e:
+            raise OSError(f"cannot read {source.name}: {e}") from e
+        samples = resample(match_channels(samples, channels), params.framerate, rate)
+        pcm = numpy.round(numpy.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        target.write_bytes(pcm.tobytes())
+
+    def _evict(self, keep: Path) -> None:
+        """Delete the least recently used decoded files until under max_bytes"""
+        try:
+            files = [
+                (f.stat().st_mtime, f.stat().st_size, f)
+                for f in self.cache_dir.glob("*.pcm") if f.is_file()
+            ]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with self._lock:
+                self._open.pop(path, None)
+                self._positions.pop(path, None)
+            try:
+                path.unlink()
+                total -= size
+            except OSError as e:
+                print(f"Warning: Could not evict {path}: {e}", file=sys.stderr)
+
+    def stats(self) -> dict:
+        """Decoded tracks and bytes on disk, decodes done by this process"""
+        try:
+            sizes = [f.stat().st_size for f in self.cache_dir.glob("*.pcm") if f.is_file()]
+        except OSError:
+            sizes = []
+        with self._lock:
+            open_tracks = len(self._open)
+        return {
+            "tracks": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "decodes": self.decodes,
+            "open": open_tracks,
+        }
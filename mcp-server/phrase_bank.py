@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/phrase_bank.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Background pre-synthesis of common acknowledgment/completion phrases
+@context Every task speaks an acknowledgment and a completion, mostly from a small set of phrases
+@architecture Phrases are synthesized into the SynthesisCache under the same keys text_to_speech
+              uses, so they replay with no synthesis latency. The bank remembers the settings
+              fingerprint it was built for and drops its entries when voice, speed or effects change.
+@dependencies synthesis_cache.py
+@entrypoints AgentVibesServer.refresh_phrase_bank (startup, set_voice/personality/speed, config watcher)
+@patterns Latest-wins background task with a short debounce, bounded phrase count
+@related mcp-server/server.py, mcp-server/synthesis_cache.py
+"""
+
+import asyncio
+import os
+import sys
+from typing import Awaitable, Callable, Optional
+
+from synthesis_cache import SynthesisCache, normalize_text
+
+# Used when no phrase-bank files are configured
+DEFAULT_PHRASES = (
+    "On it!",
+    "Got it, starting now.",
+    "Let me take a look.",
+    "Working on it.",
+    "All done!",
+    "Task complete.",
+    "Finished!",
+    "Done. Everything is in place.",
+)
+
+
+def parse_phrases(content: Optional[str]) -> list[str]:
+    """One phrase per line; blank lines and # comments are skipped"""
+    if not content:
+        return []
+    return [
+        line.strip() for line in content.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def select_phrases(sources: list[list[str]], limit: int) -> list[str]:
+    """Merge phrase lists in order, dropping duplicates, up to limit"""
+    phrases, seen = [], set()
+    for source in sources:
+        for phrase in source:
+            normalized = normalize_text(phrase).lower()
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            phrases.append(phrase)
+            if len(phrases) >= limit:
+                return phrases
+    return phrases
+
+
+class PhraseBank:
+    """Keeps a bounded set of phrases synthesized for the current voice settings"""
+
+    def __init__(self, cache: SynthesisCache, max_phrases: int = 16, debounce: float = 0.5):
+        """
+        Args:
+            cache: Synthesis cache the phrases are stored in
+            max_phrases: Maximum phrases kept ready
+            debounce: Seconds to wait for further settings changes before warming
+        """
+        self.cache = cache
+        self.max_phrases = max(1, max_phrases)
+        self.debounce = debounce
+        self.fingerprint: Optional[str] = None
+        self.keys: dict[str, str] = {}  # phrase -> cache key
+        self.state = "idle"  # idle, warming, ready, unavailable
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, cache: Optional[SynthesisCache]) -> Optional["PhraseBank"]:
+        """
+        Build a bank from AGENTVIBES_PHRASE_BANK* environment variables.
+
+        Returns:
+            A PhraseBank, or None when disabled or there is no synthesis cache
+        """
+        if cache is None:
+            return None
+        if os.environ.get("AGENTVIBES_PHRASE_BANK", "1").strip().lower() in ("0", "false", "off", "no"):
+            return None
+        try:
+            size = int(os.environ.get("AGENTVIBES_PHRASE_BANK_SIZE", "16"))
+        except ValueError:
+            size = 16
+        return cls(cache, size)
+
+    def ready(self) -> int:
+        """Number of phrases currently held in the cache"""
+        return sum(1 for key in self.keys.values() if self.cache.contains(key))
+
+    def schedule(self, warm: Callable[[], Awaitable[None]]) -> asyncio.Task:
+        """
+        Run warm() in the background, replacing any warm-up still in progress.
+
+        Args:
+            warm: Coroutine function doing the work (usually AgentVibesServer._warm_phrase_bank)
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+        async def run():
+            await asyncio.sleep(self.debounce)
+            try:
+                await warm()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.state = "idle"
+                print(f"Warning: phrase bank warm-up failed: {e}", file=sys.stderr)
+
+        self._task = asyncio.get_running_loop().create_task(run())
+        return self._task
+
+    def invalidate(self) -> None:
+        """Drop every phrase built for the previous settings"""
+        for key in self.keys.values():
+            self.cache.discard(key)
+        self.keys = {}
+        self.fingerprint = None
+
+    async def warm(
+        self,
+        fingerprint: str,
+        phrases: list[str],
+        key_for: Callable[[str], str],
+        synthesize: Callable[[str, str], Awaitable[bool]],
+    ) -> int:
+        """
+        Make sure every phrase is cached for the given settings.
+
+        Args:
+            fingerprint: Identifies the settings the audio depends on
+            phrases: Phrases to keep ready (truncated to max_phrases)
+            key_for: Cache key of a phrase under the current settings
+            synthesize: Coroutine (phrase, key) that synthesizes and stores one phrase
+
+        Returns:
+            Number of phrases synthesized in this pass
+        """
+        if fingerprint != self.fingerprint:
+            self.invalidate()
+            self.fingerprint = fingerprint
+        wanted = phrases[:self.max_phrases]
+        # Phrases dropped from the configuration leave the bank too
+        for phrase in [p for p in self.keys if p not in wanted]:
+            self.cache.discard(self.keys.pop(phrase))
+
+        self.state = "warming"
+        synthesized = 0
+        for phrase in wanted:
+            key = key_for(phrase)
+            self.keys[phrase] = key
+            if self.cache.contains(key):
+                continue
+            if await synthesize(phrase, key):
+                synthesized += 1
+        self.state = "ready"
+        return synthesized
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
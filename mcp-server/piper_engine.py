@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/piper_engine.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Persistent in-process Piper synthesis engine for the MCP server
+@context play-tts-piper.sh starts a fresh piper process per utterance and reloads the .onnx model each time
+@architecture Optional engine: loaded PiperVoice objects stay resident in an LRU bounded by count and model bytes
+@dependencies piper-tts Python package (optional), ~/.local/share/piper/voices/*.onnx
+@entrypoints AgentVibesServer.text_to_speech when AGENTVIBES_PIPER_ENGINE=1
+@patterns Lazy loading, fail-soft (returns None so callers fall back to play-tts.sh), thread offload for CPU work
+@related mcp-server/server.py, .claude/hooks/play-tts-piper.sh, docs/providers.md
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+# piper-tts (and onnxruntime under it) is optional and slow to import, so it is
+# only imported when the first voice is loaded, not when the server starts
+PiperVoice = None
+
+
+def piper_available() -> bool:
+    """Check whether piper-tts is installed without importing it"""
+    return PiperVoice is not None or importlib.util.find_spec("piper") is not None
+
+
+def _voice_class():
+    global PiperVoice
+    if PiperVoice is None:
+        from piper import PiperVoice as voice_class
+        PiperVoice = voice_class
+    return PiperVoice
+
+
+def _env_flag(name: str) -> bool:
+    """Return True when an environment variable is set to a truthy value"""
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class PiperEngine:
+    """Keeps Piper voice models resident and synthesizes WAV files in-process"""
+
+    def __init__(self, voices_dir: Path, max_voices: int = 2, max_bytes: int = 0):
+        """
+        Args:
+            voices_dir: Directory containing <voice>.onnx and <voice>.onnx.json files
+            max_voices: Maximum number of voices kept loaded at once
+            max_bytes: Maximum total model size kept loaded (0 = no byte limit)
+        """
+        self.voices_dir = voices_dir
+        self.max_voices = max(1, max_voices)
+        self.max_bytes = max(0, max_bytes)
+        self._voices: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, voices_dir: Path) -> Optional["PiperEngine"]:
+        """
+        Build an engine from AGENTVIBES_PIPER_ENGINE* environment variables.
+
+        Args:
+            voices_dir: Directory containing the Piper voice models
+
+        Returns:
+            A PiperEngine, or None when the engine is disabled or piper-tts is missing
+        """
+        if not _env_flag("AGENTVIBES_PIPER_ENGINE"):
+            return None
+        if not piper_available():
+            print(
+                "Warning: AGENTVIBES_PIPER_ENGINE is set but piper-tts is not installed "
+                "(pip install piper-tts); using play-tts.sh",
+                file=sys.stderr,
+            )
+            return None
+
+        try:
+            max_voices = int(os.environ.get("AGENTVIBES_PIPER_ENGINE_MAX_VOICES", "2"))
+            max_mb = int(os.environ.get("AGENTVIBES_PIPER_ENGINE_MAX_MB", "0"))
+        except ValueError:
+            max_voices, max_mb = 2, 0
+        return cls(voices_dir, max_voices, max_mb * 1024 * 1024)
+
+    def model_path(self, voice: str) -> Optional[Path]:
+        """Return the .onnx model path for a voice, or None if it is not installed"""
+        # Voice names are file stems; reject anything that could escape voices_dir
+        if not voice or "/" in voice or "\\" in voice or voice.startswith("."):
+            return None
+        model = self.voices_dir / f"{voice}.onnx"
+        return model if model.is_file() else None
+
+    def has_voice(self, voice: str) -> bool:
+        """Check whether a voice model is installed"""
+        return self.model_path(voice) is not None
+
+    def loaded_voices(self) -> list[str]:
+        """Names of currently resident voices, least recently used first"""
+        with self._lock:
+            return list(self._voices.keys())
+
+    def _loaded_bytes(self) -> int:
+        return sum(size for _, size in self._voices.values())
+
+    def _get_voice(self, voice: str):
+        """Return a loaded PiperVoice, loading it lazily and evicting LRU voices"""
+        with self._lock:
+            if voice in self._voices:
+                self._voices.move_to_end(voice)
+                return self._voices[voice][0]
+
+        model = self.model_path(voice)
+        if model is None:
+            return None
+
+        # Load outside the lock - model loading is the slow part
+        loaded = _voice_class().load(str(model))
+        size = model.stat().st_size
+
+        with self._lock:
+            if voice not in self._voices:
+                self._voices[voice] = (loaded, size)
+            self._voices.move_to_end(voice)
+            while len(self._voices) > 1 and (
+                len(self._voices) > self.max_voices
+                or (self.max_bytes and self._loaded_bytes() > self.max_bytes)
+            ):
+                self._voices.popitem(last=False)
+            return self._voices[voice][0]
+
+    def _synthesize_sync(
+        self,
+        text: str,
+        voice: str,
+        output_path: Path,
+        length_scale: Optional[float],
+        speaker_id: Optional[int],
+    ) -> bool:
+        piper_voice = self._get_voice(voice)
+        if piper_voice is None:
+            return False
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with wave.open(str(output_path), "wb") as wav_file:
+            if hasattr(piper_voice, "synthesize_wav"):
+                # piper-tts >= 1.3
+                from piper import SynthesisConfig
+
+                config = SynthesisConfig(speaker_id=speaker_id, length_scale=length_scale)
+                piper_voice.synthesize_wav(text, wav_file, syn_config=config)
+            else:
+                piper_voice.synthesize(
+                    text, wav_file, speaker_id=speaker_id, length_scale=length_scale
+                )
+        return True
+
+    async def synthesize(
+        self,
+        text: str,
+        voice: str,
+        output_path: Path,
+        length_scale: Optional[float] = None,
+        speaker_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Synthesize text to a WAV file without spawning a subprocess.
+
+        Args:
+            text: Text to speak
+            voice: Piper voice name (model file stem)
+            output_path: Where to write the WAV file
+            length_scale: Piper length scale (>1 slower, <1 faster)
+            speaker_id: Speaker index for multi-speaker models
+
+        Returns:
+            True on success, False if the voice is not installed
+        """
+        return await asyncio.to_thread(
+            self._synthesize_sync, text, voice, output_path, length_scale, speaker_id
+        )
+
+    async def preload(self, voice: str) -> bool:
+        """Load a voice ahead of time so the first utterance does not pay for it"""
+        return await asyncio.to_thread(lambda: self._get_voice(voice) is not None)
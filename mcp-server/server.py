@@ -41,16 +41,52 @@ use or other dealings in the software.
 """
 
 import asyncio
+import contextlib
+import contextvars
+import json
 import os
 import platform
+import shutil
 import subprocess
+import sys
+import tempfile
+import time
 from pathlib import Path
 from typing import Optional
 
+# Cold-start reference point (the mcp imports below dominate import time)
+_MODULE_STARTED = time.perf_counter()
+
 from mcp.server import Server
 from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
 import mcp.server.stdio
 
+from audio_history import AudioHistory, decode_to_wav
+from audio_eviction import AUDIO_SUFFIXES, AudioEvictor
+from audio_effects import DEFAULT_BACKGROUND_VOLUME, DEFAULT_DUCK, EffectsChain, effects_available
+from audio_playback import find_player, play_file
+from config_watch import ConfigWatcher
+from metrics import Metrics
+from music_cache import MusicCache
+from phrase_bank import DEFAULT_PHRASES, PhraseBank, parse_phrases, select_phrases
+from piper_engine import PiperEngine
+from settings_store import SettingsStore
+from shell_pool import ShellWorkerPool
+from speech_queue import SpeechQueue, SpeechQueueFull
+from speech_stream import StreamError, split_sentences, stream_chunks
+from synthesis_cache import SynthesisCache, make_key
+from tool_registry import Busy, CategoryLimiter, ToolRegistry
+from track_index import TrackIndex
+from translation import Translator
+from voice_catalog import VoiceCatalog
+from voice_downloads import EXTRA_VOICES, DownloadManager, voice_specs
+from voice_map import VOICE_MAP_PATHS, VoiceMapCache
+
+# Audio files played for the utterance being spoken (collected for the history)
+_utterance_files: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    "agentvibes_utterance_files", default=None
+)
+
 
 class AgentVibesServer:
     """MCP Server for AgentVibes TTS functionality"""
@@ -66,6 +102,8 @@ class AgentVibesServer:
     CLAUDE_DIR_NAME = ".claude"
     MUTE_FILE_NAME = ".agentvibes-muted"
     SEPARATOR = "━" * 39
+    MAX_BATCH_ITEMS = 50
+    VOICE_SEARCH_LIMIT = 25
 
     def __init__(self):
         """Initialize the AgentVibes MCP server"""
@@ -86,6 +124,126 @@ class AgentVibesServer:
         # Store AgentVibes root directory for environment variable
         self.agentvibes_root = self.claude_dir.parent
 
+        # Native reader for .claude/ settings files (same precedence as the hooks)
+        self.settings = SettingsStore(self.claude_dir, self.agentvibes_root)
+
+        # Optional in-process Piper engine (AGENTVIBES_PIPER_ENGINE=1)
+        self.piper_engine = None
+        if not self.is_windows:
+            self.piper_engine = PiperEngine.from_env(self.settings.piper_voices_dir())
+
+        # Reverb, gain and background music applied in-process to engine speech
+        # (AGENTVIBES_INPROCESS_EFFECTS=0 leaves them to the hooks; needs numpy)
+        self.inprocess_effects = (
+            os.environ.get("AGENTVIBES_INPROCESS_EFFECTS", "1").strip().lower() not in ("0", "false", "off", "no")
+            and effects_available()
+        )
+        try:
+            self.music_duck = float(os.environ.get("AGENTVIBES_MUSIC_DUCK", str(DEFAULT_DUCK)))
+        except ValueError:
+            self.music_duck = DEFAULT_DUCK
+        # Background tracks decoded once to raw PCM and memory-mapped (AGENTVIBES_MUSIC_CACHE_MAX_MB)
+        self.music_cache = MusicCache.from_env()
+        # Track names indexed for set_background_music, re-scanned when the tracks directory changes
+        self.track_index = TrackIndex(self.claude_dir / "audio" / "tracks")
+        # Learning mode translations, cached by (text, target language) across restarts
+        self.translator = Translator.from_env(self.hooks_dir)
+
+        # Script environment is built once; per-call differences are layered on top
+        self._script_env_base = None
+
+        # Persistent bash workers for hook scripts (AGENTVIBES_SHELL_POOL=1, Unix only)
+        self.shell_pool = None
+        if not self.is_windows:
+            self.shell_pool = ShellWorkerPool.from_env(self._base_script_env())
+
+        # Serializes global set/restore of personality/language (Windows only)
+        self._override_lock = asyncio.Lock()
+
+        # Content-addressed cache of synthesized audio (AGENTVIBES_SYNTH_CACHE=0 disables)
+        # Replay needs a local player, so it is not used on Windows
+        self.synthesis_cache = None if self.is_windows else SynthesisCache.from_env()
+
+        # Acknowledgment/completion phrases kept synthesized for the current voice.
+        # Needs the in-process engine: play-tts.sh cannot synthesize without playing
+        self.phrase_bank = None
+        if self.piper_engine:
+            self.phrase_bank = PhraseBank.from_env(self.synthesis_cache)
+
+        # Settings/mute file watcher (started by start_config_watcher)
+        self.config_watcher = None
+        # MCP session and loop used to push config change notifications
+        self.notify_session = None
+        self._loop = None
+        # Changes seen before this time are our own writes (no notification)
+        self._quiet_until = 0.0
+
+        # Utterance queue so text_to_speech returns before playback (AGENTVIBES_SPEECH_QUEUE=0 disables)
+        self.speech_queue = None
+        if os.environ.get("AGENTVIBES_SPEECH_QUEUE", "1").strip().lower() not in ("0", "false", "off", "no"):
+            try:
+                depth = int(os.environ.get("AGENTVIBES_SPEECH_QUEUE_DEPTH", "20"))
+                coalesce_ms = float(os.environ.get("AGENTVIBES_COALESCE_MS", "1000"))
+            except ValueError:
+                depth, coalesce_ms = 20, 1000.0
+            self.speech_queue = SpeechQueue(
+                self.text_to_speech, max_depth=depth, coalesce_window=coalesce_ms / 1000
+            )
+
+        # Text at least this long is spoken sentence by sentence (0 = only when asked)
+        try:
+            self.stream_min_chars = int(os.environ.get("AGENTVIBES_STREAM_MIN_CHARS", "200"))
+        except ValueError:
+            self.stream_min_chars = 200
+
+        # Indexed Piper voice metadata per voices directory (list_voices, set_voice)
+        self._voice_catalogs: dict[Path, VoiceCatalog] = {}
+
+        # BMAD agent -> voice map, compiled once and rebuilt when the CSV changes
+        self.voice_map = VoiceMapCache.for_project(lambda: self.settings.project_dir() or Path.cwd())
+
+        # Voice groups text_to_speech_batch synthesizes at once
+        try:
+            self.batch_workers = max(1, int(os.environ.get("AGENTVIBES_BATCH_WORKERS", "2")))
+        except ValueError:
+            self.batch_workers = 2
+        # Batch synthesis and watcher tasks (the loop only keeps weak references)
+        self._batch_tasks: set[asyncio.Task] = set()
+
+        # Caps on simultaneous synthesis and config writes (AGENTVIBES_*_CONCURRENCY)
+        self.limiter = CategoryLimiter.from_env()
+
+        # Parallel, resumable voice model downloads (download_extra_voices, get_download_status)
+        self.downloads = DownloadManager.from_env()
+
+        # Latency histograms and counters (get_metrics tool, AGENTVIBES_METRICS_FILE dump)
+        self.metrics = Metrics()
+        metrics_file = os.environ.get("AGENTVIBES_METRICS_FILE", "").strip()
+        self.metrics_file = Path(metrics_file).expanduser() if metrics_file else None
+        try:
+            self.metrics_interval = float(os.environ.get("AGENTVIBES_METRICS_INTERVAL", "60"))
+        except ValueError:
+            self.metrics_interval = 60.0
+        self._metrics_task = None
+
+        # Spoken utterances for replay_audio (AGENTVIBES_HISTORY=0 disables)
+        self.history = AudioHistory.from_env()
+        self._compress_task = None
+
+        # Background size/age eviction of generated clips (AGENTVIBES_AUDIO_EVICT=0 disables)
+        self.audio_evictor = AudioEvictor.from_env()
+        self._eviction_task = None
+        # text_to_speech calls in flight; eviction batches wait while any are running
+        self._speaking = 0
+
+        # Startup phase durations in seconds (import, init, warm-up, ...)
+        self.startup_timings: dict[str, float] = {}
+        self._warmup_task = None
+        # Provider binaries and player found during warm-up
+        self.provider_probe: dict[str, Optional[str]] = {}
+        # (provider, voices) from voice-manager.sh list-simple, reset when settings change
+        self._script_voices: Optional[tuple[str, list[str]]] = None
+
     def _find_claude_dir(self) -> Path:
         """Find the .claude directory relative to this script"""
         # Get the AgentVibes root directory (parent of mcp-server)
@@ -107,6 +265,8 @@ class AgentVibesServer:
         voice: Optional[str] = None,
         personality: Optional[str] = None,
         language: Optional[str] = None,
+        stream: Optional[bool] = None,
+        agent: Optional[str] = None,
     ) -> str:
         """
         Convert text to speech using AgentVibes.
@@ -116,87 +276,250 @@ class AgentVibesServer:
             voice: Optional voice name (e.g., "Aria", "Northern Terry")
             personality: Optional personality style (e.g., "flirty", "sarcastic")
             language: Optional language (e.g., "spanish", "french")
+            stream: Speak sentence by sentence (None = automatically for long text)
+            agent: Speaking agent, recorded in the replay history; its voice map entry
+                supplies voice and personality when they are not given
 
         Returns:
             Success message with audio file path
         """
-        # Store original settings to restore later
-        original_personality = None
-        original_language = None
+        voice, personality = self._agent_voice(agent, voice, personality)
+        return await self._tracked_speech(
+            text, voice, agent, self._text_to_speech(text, voice, personality, language, stream)
+        )
+
+    def _agent_voice(
+        self, agent: Optional[str], voice: Optional[str], personality: Optional[str]
+    ) -> tuple[Optional[str], Optional[str]]:
+        """
+        Fill in an agent's voice and personality from the BMAD voice map.
+
+        Explicit arguments win; agents missing from the map keep the defaults.
+
+        Returns:
+            (voice, personality)
+        """
+        if voice or not agent:
+            return voice, personality
+        entry = self.voice_map.lookup(agent)
+        if entry is None:
+            return voice, personality
+        return entry.voice_for(self.settings.provider()), personality or entry.personality
+
+    async def _tracked_speech(self, text: str, voice: Optional[str], agent: Optional[str], speech) -> str:
+        """
+        Run one utterance with metrics, the busy count and replay history around it.
 
+        Args:
+            text: The text being spoken
+            voice: Voice override (recorded in the history)
+            agent: Speaking agent (recorded in the history)
+            speech: Coroutine that speaks the text and returns the result message
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        played: list[Path] = []
+        token = _utterance_files.set(played)
+        self._speaking += 1
         try:
-            # Temporarily set personality if specified
-            if personality:
-                original_personality = await self._get_personality()
-                await self._run_script(
-                    self.PERSONALITY_MANAGER_SCRIPT, ["set", personality]
-                )
+            try:
+                result = await speech
+            except Busy as e:
+                result = e.response("speech")
+            if result.startswith("⏳"):
+                outcome = "busy"
+            elif result.startswith("🔇"):
+                outcome = "muted"
+            elif not result.startswith("❌"):
+                outcome = "ok"
+            if played:
+                self._record_history(played, text, voice, agent)
+            return result
+        finally:
+            self._speaking -= 1
+            _utterance_files.reset(token)
+            self.metrics.observe("tts_seconds", time.perf_counter() - started, outcome=outcome)
+            self.metrics.inc("tts_requests_total", outcome=outcome)
+
+    def _collect_played(self, audio_file: Path) -> None:
+        """Remember a file played for the current utterance (no-op outside text_to_speech)"""
+        played = _utterance_files.get()
+        if played is not None:
+            played.append(audio_file)
+
+    def _record_history(self, files: list[Path], text: str, voice: Optional[str], agent: Optional[str]) -> None:
+        """Add a spoken utterance to the replay history, compressing older clips in the background"""
+        if self.history is None:
+            return
+        try:
+            self.history.record(
+                files, text, voice or self.settings.voice(), agent, owned_dir=self.settings.write_dir() / "audio"
+            )
+        except OSError as e:
+            print(f"Warning: Could not record audio history: {e}", file=sys.stderr)
+            return
+        if self.history.compress and (self._compress_task is None or self._compress_task.done()):
+            self._compress_task = asyncio.get_running_loop().create_task(
+                asyncio.to_thread(self.history.compress_older)
+            )
 
-            # Temporarily set language if specified
-            if language:
-                original_language = await self._get_language()
-                await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["set", language])
+    async def _text_to_speech(
+        self,
+        text: str,
+        voice: Optional[str],
+        personality: Optional[str],
+        language: Optional[str],
+        stream: Optional[bool],
+    ) -> str:
+        """Pick the fastest way to speak an utterance (see text_to_speech)"""
+        # Replay identical earlier utterances without synthesizing again
+        cache_key = self._synthesis_cache_key(text, voice, personality, language)
+        if cache_key:
+            cached = await self._play_cached(cache_key, text)
+            if cached:
+                return cached
+
+        # Long text: start speaking after the first sentence instead of the whole message
+        chunks = self._stream_chunks(text, stream, voice, personality, language)
+        if chunks:
+            return await self._speak_streaming(text, chunks, voice, personality, language)
+
+        # Learning mode: translate and render the target clip while the main clip plays
+        if self.piper_engine and not personality and not language and self.settings.learn_mode_enabled():
+            spoken = await self._speak_learn_mode(text, voice)
+            if spoken is not None:
+                return spoken
+
+        # Fast path: synthesize in-process with resident Piper voices
+        if self.piper_engine and not personality and not language:
+            spoken = await self._speak_in_process(text, voice, cache_key)
+            if spoken is not None:
+                return spoken
+
+        # Per-request overrides never touch the saved settings files
+        overrides = {}
+        if personality:
+            overrides["tts-personality.txt"] = personality
+        if language:
+            overrides["tts-language.txt"] = language.lower()
+
+        if overrides and self.is_windows:
+            # PowerShell hooks always read $USERPROFILE\.claude, so temporarily
+            # switch the global settings, one overriding request at a time
+            async with self._override_lock:
+                original_personality = None
+                original_language = None
+                try:
+                    if personality:
+                        original_personality = await self._get_personality()
+                        await self._run_script(
+                            self.PERSONALITY_MANAGER_SCRIPT, ["set", personality], mutates=True
+                        )
+                    if language:
+                        original_language = await self._get_language()
+                        await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["set", language], mutates=True)
+                    return await self._speak_with_script(text, voice, cache_key)
+                finally:
+                    if original_personality:
+                        await self._run_script(
+                            self.PERSONALITY_MANAGER_SCRIPT, ["set", original_personality], mutates=True
+                        )
+                    if original_language:
+                        await self._run_script(
+                            self.LANGUAGE_MANAGER_SCRIPT, ["set", original_language], mutates=True
+                        )
+
+        if overrides:
+            with self._settings_overlay(overrides) as project_dir:
+                return await self._speak_with_script(text, voice, cache_key, project_dir)
+        return await self._speak_with_script(text, voice, cache_key)
+
+    async def _speak_with_script(
+        self,
+        text: str,
+        voice: Optional[str],
+        cache_key: Optional[str],
+        project_dir: Optional[Path] = None,
+    ) -> str:
+        """
+        Speak text through play-tts.sh (or play-tts.ps1 on Windows).
 
-            # Call the TTS script via appropriate shell
-            tts_script = "play-tts.ps1" if self.is_windows else "play-tts.sh"
-            play_tts = self.hooks_dir / tts_script
-            if self.is_windows:
-                args = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", str(play_tts), text]
-                if voice:
-                    args.extend(["-VoiceOverride", voice])
-            else:
-                args = ["bash", str(play_tts), text]
-                if voice:
-                    args.append(voice)
+        Args:
+            text: The text to speak
+            voice: Optional voice override
+            cache_key: Synthesis cache key to store the produced audio under
+            project_dir: Forced CLAUDE_PROJECT_DIR (per-request settings overlay)
 
-            env = self._build_script_env()
+        Returns:
+            Success message with audio file path, or error message
+        """
+        returncode, output, error = await self._run_play_tts(text, voice, project_dir)
+        if returncode != 0:
+            full_error = f"{error}\nStdout: {output}" if output else error
+            return f"❌ TTS failed: {full_error}"
+
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        files = self._saved_files(output)
+        if not files:
+            return f"✅ Spoke: {truncated}"
+        for file_path in files:
+            self._record_audio(file_path, "play-tts")
+            self._collect_played(file_path)
+        # A cache entry replays one file; a second clip (learning mode) would be lost
+        if cache_key and len(files) == 1:
+            self.synthesis_cache.put(cache_key, files[0])
+        return f"✅ Spoke: {truncated}\n" + "\n".join(f"📁 Audio saved: {file_path}" for file_path in files)
+
+    async def _run_play_tts(
+        self, text: str, voice: Optional[str], project_dir: Optional[Path] = None
+    ) -> tuple[int, str, str]:
+        """
+        Run play-tts.sh (or play-tts.ps1 on Windows), which synthesizes and plays.
 
-            result = await asyncio.create_subprocess_exec(
-                *args,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-            )
+        Returns:
+            (exit code, stripped stdout, stripped stderr)
+        """
+        # Call the TTS script via appropriate shell
+        tts_script = "play-tts.ps1" if self.is_windows else "play-tts.sh"
+        play_tts = self.hooks_dir / tts_script
+        if self.is_windows:
+            args = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-File", str(play_tts), text]
+            if voice:
+                args.extend(["-VoiceOverride", voice])
+        else:
+            args = ["bash", str(play_tts), text]
+            if voice:
+                args.append(voice)
+
+        # Each play-tts run may start a piper process with a large model loaded
+        async with self.limiter.slot("synthesis"):
+            started = time.perf_counter()
+            returncode = None
             try:
-                stdout, stderr = await result.communicate()
-
-                if result.returncode == 0:
-                    output = stdout.decode().strip()
-                    # Extract file path from output
-                    for line in output.split("\n"):
-                        if "Saved to:" in line:
-                            file_path = line.split("Saved to:")[1].strip()
-                            truncated = (
-                                f"{text[:50]}..." if len(text) > 50 else text
-                            )
-                            return f"✅ Spoke: {truncated}\n📁 Audio saved: {file_path}"
-
-                    return f"✅ Spoke: {text[:50]}..." if len(text) > 50 else f"✅ Spoke: {text}"
-                else:
-                    error = stderr.decode().strip()
-                    stdout_output = stdout.decode().strip()
-                    full_error = f"{error}\nStdout: {stdout_output}" if stdout_output else error
-                    return f"❌ TTS failed: {full_error}"
-            finally:
-                # Ensure process cleanup
-                if result.returncode is None:
-                    result.kill()
-                    await result.wait()
-
-        finally:
-            # Restore original settings
-            if original_personality:
-                await self._run_script(
-                    self.PERSONALITY_MANAGER_SCRIPT, ["set", original_personality]
-                )
-            if original_language:
-                await self._run_script(
-                    self.LANGUAGE_MANAGER_SCRIPT, ["set", original_language]
+                returncode, stdout, stderr = await self._exec(
+                    tts_script, args, self._build_script_env(project_dir)
                 )
+                return returncode, stdout.decode().strip(), stderr.decode().strip()
+            finally:
+                # play-tts synthesizes and plays, so this is the whole utterance
+                self._record_script(tts_script, started, returncode)
+
+    @staticmethod
+    def _saved_files(output: str) -> list[Path]:
+        """Extract every audio file path from play-tts output ("Saved to: ..."; learning mode saves two)"""
+        return [
+            Path(line.split("Saved to:")[1].strip())
+            for line in output.split("\n")
+            if "Saved to:" in line and line.split("Saved to:")[1].strip()
+        ]
 
-    async def list_voices(self) -> str:
+    async def list_voices(self, query: Optional[str] = None, language: Optional[str] = None) -> str:
         """
-        List all available TTS voices for the active provider.
+        List available TTS voices for the active provider.
+
+        Args:
+            query: Only voices matching this name (prefix, part or close spelling)
+            language: Only voices in this language (e.g. "en_GB", "de", "french"; Piper only)
 
         Returns:
             Formatted list of available voices
@@ -205,47 +528,98 @@ class AgentVibesServer:
         provider = await self._get_provider()
         current_voice = await self._get_current_voice()
 
-        # voice-manager.sh list-simple is now provider-aware
-        result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["list-simple"])
-        if result:
-            voices = result.strip().split("\n")
-            voices = [v for v in voices if v]  # Filter empty strings
-
-            if not voices:
-                return (
-                    f"📦 No voices available\n"
-                    f"{self.SEPARATOR}\n"
-                    f"For Piper: Download voices using /agent-vibes:provider download <voice-name>\n"
-                    f"Example: en_US-lessac-medium, en_GB-alba-medium"
-                )
-
-            # Determine provider label and alternative provider
-            if "Piper" in provider:
-                provider_label = "Piper TTS"
-                alternative_provider = "macOS"
-            elif "macOS" in provider:
-                provider_label = "macOS TTS"
-                alternative_provider = "Piper"
-            elif "Termux" in provider or "Android" in provider:
-                provider_label = "Termux SSH (Android)"
-                alternative_provider = "Piper"
+        details: dict[str, str] = {}
+        if self._uses_voice_catalog():
+            # Piper voices are the installed .onnx models, indexed with their metadata
+            catalog = await asyncio.to_thread(self.voice_catalog)
+            if query or language:
+                found = catalog.search(query or "", language, limit=self.VOICE_SEARCH_LIMIT)
             else:
-                provider_label = "TTS"
-                alternative_provider = None
+                found = [catalog.voices[name] for name in catalog.names()]
+            voices = [info.name for info in found]
+            details = {info.name: info.describe() for info in found}
+        else:
+            voices = await self._list_script_voices()
+            if voices is None:
+                return "❌ Failed to list voices"
+            if query:
+                voices = [voice for voice in voices if query.lower() in voice.lower()]
+
+        if not voices and (query or language):
+            wanted = " and ".join(part for part in (query and f"'{query}'", language and f"language {language}") if part)
+            return f"❌ No voices match {wanted}"
+        if not voices:
+            return (
+                f"📦 No voices available\n"
+                f"{self.SEPARATOR}\n"
+                f"For Piper: Download voices using /agent-vibes:provider download <voice-name>\n"
+                f"Example: en_US-lessac-medium, en_GB-alba-medium"
+            )
+
+        # Determine provider label and alternative provider
+        if "Piper" in provider:
+            provider_label = "Piper TTS"
+            alternative_provider = "macOS"
+        elif "macOS" in provider:
+            provider_label = "macOS TTS"
+            alternative_provider = "Piper"
+        elif "Termux" in provider or "Android" in provider:
+            provider_label = "Termux SSH (Android)"
+            alternative_provider = "Piper"
+        else:
+            provider_label = "TTS"
+            alternative_provider = None
 
+        if query or language:
+            output = f"🔎 {provider_label} Voices matching {' in '.join(filter(None, (query and repr(query), language)))}:\n"
+        else:
             output = f"🎤 Available {provider_label} Voices:\n"
-            output += f"{self.SEPARATOR}\n"
-            for voice in voices:
-                marker = " ✓ (current)" if voice == current_voice else ""
-                output += f"  • {voice}{marker}\n"
-            output += f"{self.SEPARATOR}\n"
+        output += f"{self.SEPARATOR}\n"
+        for voice in voices:
+            marker = " ✓ (current)" if voice == current_voice else ""
+            detail = f"  ({details[voice]})" if details.get(voice) else ""
+            output += f"  • {voice}{marker}{detail}\n"
+        output += f"{self.SEPARATOR}\n"
 
-            # Add provider switch hint
-            if alternative_provider:
-                output += f"\n💡 Switch to {alternative_provider}? Use: set_provider(provider=\"{alternative_provider.lower()}\")\n"
+        # Add provider switch hint
+        if alternative_provider:
+            output += f"\n💡 Switch to {alternative_provider}? Use: set_provider(provider=\"{alternative_provider.lower()}\")\n"
 
-            return output
-        return "❌ Failed to list voices"
+        return output
+
+    def _uses_voice_catalog(self) -> bool:
+        """Piper on Unix: voices are the .onnx models in the voices directory"""
+        return not self.is_windows and self.settings.provider() == "piper"
+
+    def voice_catalog(self) -> VoiceCatalog:
+        """
+        Get the catalog of the current Piper voices directory, picking up new models.
+
+        Blocking on the first call per directory (reads every .onnx.json); afterwards a
+        single directory stat unless models were added or removed.
+        """
+        voices_dir = self.settings.piper_voices_dir()
+        catalog = self._voice_catalogs.get(voices_dir)
+        if catalog is None:
+            catalog = self._voice_catalogs[voices_dir] = VoiceCatalog(voices_dir)
+        return catalog.refresh()
+
+    async def _list_script_voices(self) -> Optional[list[str]]:
+        """
+        List voices through voice-manager.sh (provider-aware), reusing the last answer.
+
+        Returns:
+            Voice names, or None when the script failed
+        """
+        provider = self.settings.provider()
+        if self._script_voices is not None and self._script_voices[0] == provider:
+            return list(self._script_voices[1])
+        result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["list-simple"])
+        if not result or result.startswith(("Script not found", "Error running script")):
+            return None
+        voices = [v for v in result.strip().split("\n") if v]  # Filter empty strings
+        self._script_voices = (provider, voices)
+        return list(voices)
 
     async def set_voice(self, voice_name: str) -> str:
         """
@@ -257,11 +631,24 @@ class AgentVibesServer:
         Returns:
             Success or error message
         """
+        requested = voice_name
+        if self._uses_voice_catalog():
+            catalog = await asyncio.to_thread(self.voice_catalog)
+            # Speakers of multi-speaker models are resolved by voice-manager.sh
+            if catalog.voices and catalog.speaker_model(voice_name) is None:
+                resolved, suggestions = catalog.resolve(voice_name)
+                if resolved is None:
+                    hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else " Use list_voices to see options."
+                    return f"❌ Unknown voice '{voice_name}'.{hint}"
+                voice_name = resolved
+
         result = await self._run_script(
-            self.VOICE_MANAGER_SCRIPT, ["switch", voice_name, "--silent"]
+            self.VOICE_MANAGER_SCRIPT, ["switch", voice_name, "--silent"], mutates=True
         )
         if result and "✅" in result:
-            return f"✅ Voice switched to: {voice_name}"
+            self.refresh_phrase_bank()
+            matched = f" (matched '{requested}')" if voice_name != requested else ""
+            return f"✅ Voice switched to: {voice_name}{matched}"
         return f"❌ Failed to switch voice: {result}"
 
     async def list_personalities(self) -> str:
@@ -285,9 +672,10 @@ class AgentVibesServer:
             Success or error message
         """
         result = await self._run_script(
-            self.PERSONALITY_MANAGER_SCRIPT, ["set", personality]
+            self.PERSONALITY_MANAGER_SCRIPT, ["set", personality], mutates=True
         )
         if result and "🎭" in result:
+            self.refresh_phrase_bank()
             return result
         return f"❌ Failed to set personality: {result}"
 
@@ -322,25 +710,107 @@ class AgentVibesServer:
         Returns:
             Success or error message
         """
-        result = await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["set", language])
+        result = await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["set", language], mutates=True)
         if result and "✓" in result:
             return result
         return f"❌ Failed to set language: {result}"
 
-    async def replay_audio(self, n: int = 1) -> str:
+    async def replay_audio(self, n: int = 1, agent: Optional[str] = None, text: Optional[str] = None) -> str:
         """
         Replay recently generated TTS audio.
 
         Args:
-            n: Which audio to replay (1 = most recent, 2 = second most recent, etc.)
+            n: Which audio to replay (1 = most recent, 2 = second most recent, etc.);
+               unfiltered, this counts hook-spoken clips in the audio directory too
+            agent: Only consider this agent's utterances
+            text: Only consider utterances containing these words (exact text preferred)
 
         Returns:
             Success or error message
         """
-        result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["replay", str(n)])
-        if result and "🔊" in result:
-            return result
-        return f"❌ Failed to replay audio: {result}"
+        if self.history is None and not (text or agent):
+            # History disabled: the script lists the audio directory
+            result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["replay", str(n)])
+            if result and "🔊" in result:
+                return result
+            return f"❌ Failed to replay audio: {result}"
+
+        if text or agent:
+            entry = None
+            if self.history is not None:
+                entry = self.history.search(text, n, agent) if text else self.history.get(n, agent)
+            if entry is None:
+                what = " and ".join(
+                    part for part in (f'text "{text}"' if text else "", f"agent {agent}" if agent else "") if part
+                )
+                return f"❌ No recorded audio matches {what}"
+        else:
+            timeline = await asyncio.to_thread(self._replay_timeline)
+            if n < 1 or n > len(timeline):
+                return f"❌ No audio #{n} to replay ({len(timeline)} clip(s) available)"
+            entry = timeline[n - 1]
+            if isinstance(entry, Path):
+                if not await self._play_any(entry):
+                    return f"❌ Failed to replay audio: could not play {entry}"
+                if self.audio_evictor is not None:
+                    self.audio_evictor.touch(entry)
+                return f"🔊 Replayed audio #{n}\n📁 {entry}"
+
+        truncated = f"{entry.text[:50]}..." if len(entry.text) > 50 else entry.text
+        files = [Path(f) for f in entry.files if Path(f).is_file()]
+        if not files:
+            return f"❌ Audio for #{entry.id} no longer exists: {truncated}"
+        for audio_file in files:
+            if not await self._play_any(audio_file):
+                return f"❌ Failed to replay audio: could not play {audio_file}"
+            if self.audio_evictor is not None:
+                self.audio_evictor.touch(audio_file)
+        output = f"🔊 Replayed #{entry.id}: {truncated}\n"
+        details = [part for part in (entry.voice, entry.agent and f"agent {entry.agent}") if part]
+        if entry.duration:
+            details.append(f"{entry.duration:.1f}s")
+        if details:
+            output += f"🎤 {', '.join(details)}\n"
+        output += f"📁 {files[-1]}"
+        return output
+
+    def _replay_timeline(self) -> list:
+        """
+        Everything unfiltered replay_audio(n) counts, newest first: history entries
+        merged with audio-directory clips no entry owns (hooks call play-tts.sh directly).
+
+        Returns:
+            HistoryEntry objects and Paths of untracked clips
+        """
+        entries = self.history.recent(self.history.max_entries)
+        known = {os.path.realpath(f) for entry in entries for f in entry.files}
+        timeline = [(entry.time, entry) for entry in entries]
+        try:
+            with os.scandir(self.settings.write_dir() / "audio") as it:
+                for dirent in it:
+                    if dirent.name.startswith(".") or os.path.splitext(dirent.name)[1].lower() not in AUDIO_SUFFIXES:
+                        continue
+                    if not dirent.is_file() or os.path.realpath(dirent.path) in known:
+                        continue
+                    timeline.append((dirent.stat().st_mtime, Path(dirent.path)))
+        except OSError:
+            pass  # no audio directory yet
+        timeline.sort(key=lambda item: item[0], reverse=True)
+        return [item for _, item in timeline]
+
+    async def _play_any(self, audio_file: Path) -> bool:
+        """Play a WAV, or a compressed history clip decoded to a temporary WAV"""
+        if audio_file.suffix.lower() == ".wav":
+            return await self._play(audio_file)
+        fd, tmp = tempfile.mkstemp(prefix="agentvibes-replay-", suffix=".wav")
+        os.close(fd)
+        decoded = Path(tmp)
+        try:
+            if not await asyncio.to_thread(decode_to_wav, audio_file, decoded):
+                return await self._play(audio_file)  # paplay/ffplay handle FLAC and Opus
+            return await self._play(decoded)
+        finally:
+            decoded.unlink(missing_ok=True)
 
     async def set_provider(self, provider: str) -> str:
         """
@@ -360,7 +830,7 @@ class AgentVibesServer:
         if provider not in valid_providers:
             return f"❌ Invalid provider: {provider}. Choose from: {', '.join(valid_providers)}"
 
-        result = await self._run_script("provider-manager.sh", ["switch", provider])
+        result = await self._run_script("provider-manager.sh", ["switch", provider], mutates=True)
         if result and ("✓" in result or "[OK]" in result):
             # Automatically speak confirmation in the new provider's voice
             provider_names = {
@@ -396,6 +866,8 @@ class AgentVibesServer:
         Enable or disable language learning mode.
 
         When enabled, TTS speaks in both your main language and target language.
+        With the in-process Piper engine, the translation and the target clip are
+        rendered while the main clip plays, and translations are cached.
 
         Args:
             enabled: True to enable, False to disable
@@ -404,7 +876,7 @@ class AgentVibesServer:
             Success or error message
         """
         action = "enable" if enabled else "disable"
-        result = await self._run_script("learn-manager.sh", [action])
+        result = await self._run_script("learn-manager.sh", [action], mutates=True)
         if result and "✓" in result:
             return result
         return f"❌ Failed to set learn mode: {result}"
@@ -427,8 +899,14 @@ class AgentVibesServer:
         import secrets
 
         args = ["target", speed] if target else [speed]
-        result = await self._run_script("speed-manager.sh", args)
+        # Only the write takes a config slot; the demo below must not hold it while it plays
+        try:
+            async with self.limiter.slot("config_write"):
+                result = await self._run_script("speed-manager.sh", args, mutates=True)
+        except Busy as e:
+            return e.response("set_speed")
         if result and "✓" in result:
+            self.refresh_phrase_bank()
             # Simple test messages to demonstrate the new speed
             test_messages = [
                 "Testing speed change",
@@ -458,26 +936,118 @@ class AgentVibesServer:
         Returns:
             Current speed settings for main and target voices
         """
-        result = await self._run_script("speed-manager.sh", ["get"])
-        return result if result else "❌ Failed to get speed settings"
+        if self.is_windows:
+            result = await self._run_script("speed-manager.sh", ["get"])
+            return result if result else "❌ Failed to get speed settings"
+
+        def describe(speed: Optional[float]) -> str:
+            return f"{speed:.1f}x" if speed else "1.0x (default)"
+
+        output = "⚡ Current Speech Speed Settings\n"
+        output += f"{self.SEPARATOR}\n"
+        output += f"Main voice: {describe(self.settings.speed())}\n"
+        output += f"Target language: {describe(self.settings.speed(target=True))}\n"
+        output += f"{self.SEPARATOR}\n"
+        return output
 
-    async def download_extra_voices(self, auto_yes: bool = False) -> str:
+    async def download_extra_voices(
+        self, auto_yes: bool = False, voices: Optional[list[str]] = None, wait: bool = False
+    ) -> str:
         """
-        Download extra high-quality Piper voices from HuggingFace.
+        Download extra high-quality Piper voices.
 
-        Downloads custom voices: Kristin, Jenny, and Tracy/16Speakers.
+        Downloads custom voices: Kristin, Jenny, and Tracy/16Speakers. Models and configs
+        are fetched in parallel into the Piper voices directory; interrupted files resume
+        where they stopped. Files whose source publishes a SHA-256 (HuggingFace models)
+        are verified before they are used; the report marks the others unverified.
 
         Args:
-            auto_yes: If True, skips confirmation prompt and downloads automatically
+            auto_yes: Kept for compatibility (downloads never prompt)
+            voices: Voices to download (default: all extra voices)
+            wait: Wait for the downloads to finish instead of returning right away
 
         Returns:
-            Success message with download summary
+            Batch id to follow with get_download_status, or the download summary when waiting
         """
-        args = ["--yes"] if auto_yes else []
-        result = await self._run_script("download-extra-voices.sh", args)
-        if result and ("✅" in result or "Successfully downloaded" in result or "already downloaded" in result):
-            return result
-        return f"❌ Failed to download extra voices: {result}"
+        try:
+            specs = voice_specs(self.settings.piper_voices_dir(), voices)
+        except ValueError as e:
+            return f"❌ {e}"
+        targets = {spec.target for spec in specs}
+        active = self.downloads.active()
+        for batch in active:
+            if targets & {job.spec.target for job in batch.jobs}:
+                return f"⏳ Already downloading these voices (batch #{batch.id}); check get_download_status"
+
+        batch = self.downloads.start(specs)
+        batch.task.add_done_callback(lambda _: self._voices_downloaded(batch))
+        if not wait:
+            count = len(specs) // 2
+            limit = self.downloads.concurrent_batches
+            queued = f", queued behind batch #{active[-1].id}" if limit and len(active) >= limit else ""
+            return (
+                f"📥 Downloading {count} voice(s) as batch #{batch.id} "
+                f"({len(specs)} files, {self.downloads.workers} at a time{queued})\n"
+                f"Check progress with get_download_status"
+            )
+        # A tool timeout stops waiting, not the download
+        await asyncio.shield(batch.task)
+        return self._download_report(batch)
+
+    def _voices_downloaded(self, batch) -> None:
+        """Refresh voice lists and record metrics once a download batch finishes"""
+        self._script_voices = None
+        for job in batch.jobs:
+            self.metrics.inc("download_files_total", status=job.status)
+            if job.status == "done":
+                self.metrics.inc("download_bytes_total", job.received - job.resumed_from)
+
+    async def get_download_status(self, batch_id: Optional[int] = None) -> str:
+        """
+        Report progress of voice downloads.
+
+        Args:
+            batch_id: Batch to report (None = the most recent)
+
+        Returns:
+            Formatted per-file progress
+        """
+        batch = self.downloads.batches.get(batch_id) if batch_id is not None else self.downloads.latest()
+        if batch is None:
+            return f"❌ Unknown download batch #{batch_id}" if batch_id is not None else "📥 No downloads yet"
+        return self._download_report(batch)
+
+    def _download_report(self, batch) -> str:
+        """Format one download batch"""
+        icons = {"queued": "⏸️ ", "downloading": "⬇️ ", "done": "✅", "skipped": "✅", "failed": "❌"}
+        received, total = batch.bytes()
+        if not batch.done:
+            state = "in progress"
+        elif batch.failed:
+            state = f"{len(batch.failed)} failed"
+        else:
+            state = "complete"
+        output = f"📥 Download batch #{batch.id}: {state}\n"
+        output += f"{self.SEPARATOR}\n"
+        for job in batch.jobs:
+            line = f"{icons[job.status]} {job.name}: {job.status}"
+            if job.status == "downloading" and job.progress is not None:
+                line += f" {job.progress:.0%} ({job.received / 1024 / 1024:.1f} of {job.total / 1024 / 1024:.1f} MB)"
+            elif job.status == "downloading":
+                line += f" {job.received / 1024 / 1024:.1f} MB"
+            elif job.status == "done":
+                line += f" ({job.total / 1024 / 1024:.1f} MB"
+                line += f", resumed at {job.resumed_from / 1024 / 1024:.1f} MB" if job.resumed_from else ""
+                line += ", checksum verified)" if job.verified else ", unverified: no published checksum)"
+            elif job.status == "skipped":
+                line += " (already installed)"
+            elif job.error:
+                line += f": {job.error}"
+            output += line + "\n"
+        output += f"{self.SEPARATOR}\n"
+        output += f"Received: {received / 1024 / 1024:.1f} MB"
+        output += f" of {total / 1024 / 1024:.1f} MB\n" if total else "\n"
+        return output
 
     async def get_verbosity(self) -> str:
         """
@@ -486,7 +1056,10 @@ class AgentVibesServer:
         Returns:
             Current verbosity level with description
         """
-        result = await self._run_script("verbosity-manager.sh", ["get"])
+        if self.is_windows:
+            result = await self._run_script("verbosity-manager.sh", ["get"])
+        else:
+            result = self.settings.verbosity()
         if result:
             level = result.strip()
             descriptions = {
@@ -508,11 +1081,80 @@ class AgentVibesServer:
         Returns:
             Success or error message
         """
-        result = await self._run_script("verbosity-manager.sh", ["set", level])
+        result = await self._run_script("verbosity-manager.sh", ["set", level], mutates=True)
         if result and "✅" in result:
             return f"{result}\n\n⚠️  Restart Claude Code for changes to take effect"
         return f"❌ Failed to set verbosity: {result}"
 
+    def start_config_watcher(self) -> Optional[str]:
+        """
+        Watch settings files and mute flags so reads can be served from memory.
+
+        Disabled with AGENTVIBES_CONFIG_WATCH=0. Uses inotify on Linux and
+        polls every AGENTVIBES_CONFIG_POLL_INTERVAL seconds (default 2) elsewhere.
+
+        Returns:
+            The watcher backend ("inotify" or "polling"), or None when disabled
+        """
+        if os.environ.get("AGENTVIBES_CONFIG_WATCH", "1").strip().lower() in ("0", "false", "off", "no"):
+            return None
+        try:
+            interval = float(os.environ.get("AGENTVIBES_CONFIG_POLL_INTERVAL", "2"))
+        except ValueError:
+            interval = 2.0
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self.config_watcher = ConfigWatcher(
+            self.settings.watched_files() + self._get_mute_files(),
+            self._on_config_change,
+            poll_interval=max(0.1, interval),
+        )
+        self.config_watcher.start()
+        # Only trust the snapshot once something keeps it fresh
+        self.settings.invalidate()
+        self.settings.enable_snapshot()
+        return self.config_watcher.backend
+
+    def stop_config_watcher(self) -> None:
+        """Stop watching and go back to reading files on every call"""
+        if self.config_watcher is not None:
+            self.config_watcher.stop()
+            self.config_watcher = None
+        self.settings.disable_snapshot()
+
+    def _settings_changed(self) -> None:
+        """Invalidate the snapshot after this server (or a hook it ran) wrote settings"""
+        self.settings.invalidate()
+        self._script_voices = None
+        if self.config_watcher is not None:
+            # The watcher will report the same write; don't echo it to the client
+            self._quiet_until = time.monotonic() + self.config_watcher.poll_interval + 1.0
+
+    def _on_config_change(self, changed: list[Path]) -> None:
+        """Watcher callback (runs on the watcher thread)"""
+        self.settings.invalidate()
+        self._script_voices = None
+        if self.phrase_bank is not None and self._loop is not None and not self._loop.is_closed():
+            # Voice, speed or effects may have changed under the bank
+            self._loop.call_soon_threadsafe(self.refresh_phrase_bank)
+        if time.monotonic() < self._quiet_until:
+            return
+        if self._loop is not None and self.notify_session is not None and not self._loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self._notify_config_change(changed), self._loop)
+
+    async def _notify_config_change(self, changed: list[Path]) -> None:
+        """Tell the MCP client that another process edited the settings"""
+        try:
+            await self.notify_session.send_log_message(
+                level="info",
+                data={"event": "config_changed", "files": [str(path) for path in changed]},
+                logger="agentvibes",
+            )
+        except Exception as e:
+            print(f"Warning: Could not send config change notification: {e}", file=sys.stderr)
+
     def _get_mute_files(self) -> list:
         """Get all mute file paths for current platform"""
         files = [
@@ -539,6 +1181,7 @@ class AgentVibesServer:
                 win_mute = Path.home() / self.CLAUDE_DIR_NAME / "tts-muted.txt"
                 win_mute.parent.mkdir(parents=True, exist_ok=True)
                 win_mute.write_text("true")
+            self._settings_changed()
             return "🔇 AgentVibes TTS muted. All voice output is now silenced.\n\n💡 To unmute, use: unmute()"
         except Exception as e:
             return f"❌ Failed to mute: {e}"
@@ -565,6 +1208,7 @@ class AgentVibesServer:
                         removed.append(str(mute_file.name))
 
             if removed:
+                self._settings_changed()
                 return f"🔊 AgentVibes TTS unmuted. Voice output is now restored.\n   (Removed: {', '.join(removed)} mute flag)"
             else:
                 return "🔊 AgentVibes TTS was not muted. Voice output is active."
@@ -578,15 +1222,8 @@ class AgentVibesServer:
         Returns:
             Current mute status
         """
-        for mute_file in self._get_mute_files():
-            if mute_file.exists():
-                # tts-muted.txt uses content "true"/"false"
-                if mute_file.name == "tts-muted.txt":
-                    content = mute_file.read_text().strip()
-                    if content == "true":
-                        return "🔇 TTS is currently MUTED\n\n💡 To unmute, use: unmute()"
-                else:
-                    return "🔇 TTS is currently MUTED\n\n💡 To unmute, use: unmute()"
+        if self._is_muted_sync():
+            return "🔇 TTS is currently MUTED\n\n💡 To unmute, use: unmute()"
         return "🔊 TTS is currently ACTIVE\n\n💡 To mute, use: mute()"
 
     async def list_background_music(self) -> str:
@@ -604,62 +1241,53 @@ class AgentVibesServer:
         Set background music track for a specific agent, all agents, or as default.
 
         Args:
-            track_name: Track filename or partial name for fuzzy matching
+            track_name: Track filename, partial name or misspelling, ranked by TrackIndex
             agent_name: Agent name ('all' for all agents, None for default)
 
         Returns:
             Success or error message
         """
-        import re
-
-        # Get list of available tracks for fuzzy matching
-        list_result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["list"])
-        if not list_result or "❌" in list_result:
-            return "❌ Failed to list background music tracks"
-
-        # Parse track names
-        tracks = []
-        for line in list_result.split("\n"):
-            match = re.match(r'\s*\d+\.\s+(.+)', line)
-            if match:
-                tracks.append(match.group(1))
-
-        # Try to find a matching track (case-insensitive partial match)
-        track_lower = track_name.lower()
-        matched_track = None
-
-        # First try exact match
-        for track in tracks:
-            if track.lower() == track_lower:
-                matched_track = track
-                break
-
-        # If no exact match, try partial match
-        if not matched_track:
-            for track in tracks:
-                if track_lower in track.lower():
-                    matched_track = track
-                    break
-
-        if not matched_track:
+        tracks = await asyncio.to_thread(self.track_index.refresh)
+        if not tracks:
+            # No tracks directory next to the hooks: fall back to the manager's listing
+            import re
+
+            list_result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["list"])
+            if not list_result or "❌" in list_result:
+                return "❌ Failed to list background music tracks"
+            tracks = []
+            for line in list_result.split("\n"):
+                match = re.match(r'\s*\d+\.\s+(.+)', line)
+                if match:
+                    tracks.append(match.group(1).strip())
+            self.track_index.load_names(tracks)
+
+        best, alternatives = self.track_index.best(track_name)
+        if best is None:
+            if alternatives:
+                suggestions = ", ".join(match.track for match in alternatives)
+                return f"❌ No track matching '{track_name}' found. Did you mean: {suggestions}?"
             # Show available tracks to help user
-            available = "\n".join([f"  • {t}" for t in tracks])
+            available = "\n".join([f"  • {t}" for t in self.track_index.tracks])
             return f"❌ No track matching '{track_name}' found.\n\nAvailable tracks:\n{available}\n\n💡 Try a partial match like 'celtic' or 'chillwave'"
+        matched_track = best.track
 
         # Determine which command to use based on agent_name
         if agent_name and agent_name.lower() == "all":
             # Set for all agents
-            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-all", matched_track])
+            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-all", matched_track], mutates=True)
         elif agent_name:
             # Set for specific agent
-            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-agent", agent_name, matched_track])
+            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-agent", agent_name, matched_track], mutates=True)
         else:
             # Set as default
-            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-default", matched_track])
+            result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["set-default", matched_track], mutates=True)
 
         if result and "✅" in result:
             if matched_track.lower() != track_name.lower():
-                return f"{result}\n\n🔍 Matched '{track_name}' to '{matched_track}'"
+                result = f"{result}\n\n🔍 Matched '{track_name}' to '{matched_track}' (score {best.score:.2f})"
+            if alternatives:
+                result += "\n💡 Did you mean: " + ", ".join(match.track for match in alternatives) + "?"
             return result
         return f"❌ Failed to set background music: {result}"
 
@@ -674,7 +1302,7 @@ class AgentVibesServer:
             Success or error message
         """
         command = "on" if enabled else "off"
-        result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, [command])
+        result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, [command], mutates=True)
         return result if result else f"❌ Failed to {'enable' if enabled else 'disable'} background music"
 
     async def set_background_music_volume(self, volume: float) -> str:
@@ -687,7 +1315,7 @@ class AgentVibesServer:
         Returns:
             Success or error message
         """
-        result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["volume", str(volume)])
+        result = await self._run_script(self.BACKGROUND_MUSIC_MANAGER_SCRIPT, ["volume", str(volume)], mutates=True)
         return result if result else "❌ Failed to set background music volume"
 
     async def get_background_music_status(self) -> str:
@@ -715,7 +1343,7 @@ class AgentVibesServer:
         args = ["set-reverb", level, agent]
         if apply_all:
             args.append("--all")
-        result = await self._run_script(self.EFFECTS_MANAGER_SCRIPT, args)
+        result = await self._run_script(self.EFFECTS_MANAGER_SCRIPT, args, mutates=True)
         return result if result else f"✅ Set reverb to {level}"
 
     async def get_reverb(self, agent: str = "default") -> str:
@@ -728,7 +1356,10 @@ class AgentVibesServer:
         Returns:
             Current reverb level
         """
-        result = await self._run_script(self.EFFECTS_MANAGER_SCRIPT, ["get-reverb", agent])
+        if self.is_windows:
+            result = await self._run_script(self.EFFECTS_MANAGER_SCRIPT, ["get-reverb", agent])
+        else:
+            result = self.settings.reverb_level(agent)
         if result:
             return f"Current reverb level for {agent}: {result.strip()}"
         return f"❌ Failed to get reverb for {agent}"
@@ -743,353 +1374,1836 @@ class AgentVibesServer:
         result = await self._run_script(self.EFFECTS_MANAGER_SCRIPT, ["list"])
         return result if result else "❌ Failed to list audio effects"
 
-    async def clean_audio_cache(self) -> str:
+    async def clean_audio_cache(self, stats_only: bool = False) -> str:
         """
         Clean all TTS audio cache files and report space freed.
 
         Non-interactive cleanup suitable for MCP tool usage. Deletes all
         TTS-generated audio files (wav, mp3, aiff) while preserving
-        background music tracks.
+        background music tracks. Also empties the synthesis cache.
+
+        Args:
+            stats_only: If True, only report cache statistics and what auto-eviction reclaimed
 
         Returns:
             Cleanup results with file count and space freed
         """
-        result = await self._run_script("clean-audio-cache.sh", [])
-        return result if result else "❌ Failed to clean audio cache"
-
-    # Helper methods
-    def _build_script_env(self) -> dict:
-        """Build environment dict for script execution (shared by all script runners)"""
-        env = os.environ.copy()
-
-        # Determine where to save settings based on context:
-        # 1. If cwd has .claude/ → Use cwd (real Claude Code project)
-        # 2. Otherwise → Use global ~/.claude/ (Claude Desktop, Warp, etc.)
-        # Note: Hooks are ALWAYS from package .claude/ (self.claude_dir)
-        cwd = Path.cwd()
-        if (cwd / ".claude").is_dir() and cwd != self.agentvibes_root:
-            env["CLAUDE_PROJECT_DIR"] = str(cwd)
+        if stats_only:
+            return self._synthesis_cache_report() + self._eviction_report()
 
-        # Add common locations for piper to PATH (Unix only)
-        if not self.is_windows:
-            home_dir = Path.home()
-            local_bin = str(home_dir / ".local" / "bin")
-            if "PATH" in env:
-                if local_bin not in env["PATH"]:
-                    env["PATH"] = f"{local_bin}:{env['PATH']}"
-            else:
-                env["PATH"] = local_bin
+        result = await self._run_script("clean-audio-cache.sh", [])
+        if not result:
+            return "❌ Failed to clean audio cache"
+        if self.synthesis_cache:
+            count, freed = self.synthesis_cache.clear()
+            result += f"\n🗑️  Synthesis cache: removed {count} file(s), freed {freed / 1024 / 1024:.1f} MB"
+        if self.history is not None:
+            result += f"\n🗑️  Replay history: forgot {self.history.clear()} utterance(s)"
+        return result
+
+    def _synthesis_cache_report(self) -> str:
+        """Format synthesis cache statistics"""
+        if not self.synthesis_cache:
+            return "📦 Synthesis cache is disabled (AGENTVIBES_SYNTH_CACHE=0)"
+        stats = self.synthesis_cache.stats()
+        output = "📦 Synthesis Cache\n"
+        output += f"{self.SEPARATOR}\n"
+        output += f"Hit rate: {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)\n"
+        output += f"Entries: {stats['entries']}\n"
+        output += f"Bytes held: {stats['bytes'] / 1024 / 1024:.1f} MB of {stats['max_bytes'] / 1024 / 1024:.0f} MB\n"
+        if self.phrase_bank is not None:
+            bank = self.phrase_bank
+            output += f"Phrase bank: {bank.ready()}/{len(bank.keys) or bank.max_phrases} ready ({bank.state})\n"
+        if self.history is not None:
+            history = self.history.stats()
+            output += (
+                f"Replay history: {history['entries']} utterance(s), {history['bytes'] / 1024 / 1024:.1f} MB "
+                f"of {history['max_bytes'] / 1024 / 1024:.0f} MB"
+                + (f" (older clips as {history['compress']})" if history["compress"] else "")
+                + "\n"
+            )
+        translations = self.translator.cache.stats()
+        if translations["entries"] or translations["hits"] or translations["misses"]:
+            output += (
+                f"Translations: {translations['entries']} cached "
+                f"({translations['hits']} hits, {translations['misses']} misses)\n"
+            )
+        music = self.music_cache.stats()
+        if music["tracks"]:
+            output += (
+                f"Decoded music: {music['tracks']} track(s), {music['bytes'] / 1024 / 1024:.1f} MB "
+                f"of {music['max_bytes'] / 1024 / 1024:.0f} MB\n"
+            )
+        output += f"{self.SEPARATOR}\n"
+        return output
 
-        return env
+    def _eviction_report(self) -> str:
+        """Format audio eviction totals and policy"""
+        if self.audio_evictor is None:
+            return "\n🧹 Audio auto-eviction is disabled (AGENTVIBES_AUDIO_EVICT=0)"
+        stats = self.audio_evictor.stats()
+        policy = []
+        if stats["max_bytes"]:
+            policy.append(f"budget {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        if stats["max_age"]:
+            policy.append(f"max age {stats['max_age'] / 86400:g} day(s)")
+        output = f"\n🧹 Audio auto-eviction ({', '.join(policy) or 'no limits'})\n"
+        if not stats["runs"]:
+            return output + "No pass has run yet\n"
+        output += (
+            f"Reclaimed: {stats['files_evicted']} file(s), {stats['bytes_evicted'] / 1024 / 1024:.1f} MB "
+            f"in {stats['runs']} pass(es)\n"
+        )
+        output += (
+            f"Last pass: {stats['last_files']} file(s), {stats['last_bytes'] / 1024 / 1024:.1f} MB, "
+            f"{time.time() - stats['last_run']:.0f}s ago\n"
+        )
+        output += f"Audio files: {stats['audio_files']} ({stats['audio_bytes'] / 1024 / 1024:.1f} MB)\n"
+        return output
 
-    async def _run_script(self, script_name: str, args: list[str]) -> str:
-        """Run a script and return output (bash on Unix, PowerShell on Windows)"""
-        # Auto-resolve .sh → .ps1 on Windows (class constants handle special cases)
-        if self.is_windows and script_name.endswith('.sh'):
-            script_name = script_name[:-3] + '.ps1'
-        script_path = self.hooks_dir / script_name
-        if not script_path.exists():
-            return f"Script not found: {script_path}"
+    async def text_to_speech_batch(
+        self, items: list[dict], priority: str = "normal", wait: bool = False
+    ) -> str:
+        """
+        Speak several agents' lines (BMAD party mode) with one tool call.
 
-        # Build command — PowerShell on Windows, bash on Unix
-        if self.is_windows:
-            cmd = [
-                "powershell", "-NoProfile", "-ExecutionPolicy", "Bypass",
-                "-File", str(script_path)
-            ] + args
-        else:
-            cmd = ["bash", str(script_path)] + args
+        Lines that share a voice are synthesized together by the resident Piper
+        engine, one voice group per worker, while earlier lines already play.
+        Playback follows the order of items. Lines the engine cannot render
+        (personality or language overrides, other providers) are spoken the
+        usual way when their turn comes.
 
-        env = self._build_script_env()
+        Args:
+            items: Lines to speak, each {"text", "agent"?, "voice"?, "personality"?, "language"?}
+            priority: Queue priority of the whole batch ("high", "normal" or "low")
+            wait: Wait until every line has played and return the per-line results
 
-        try:
-            result = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env,
-            )
+        Returns:
+            Job id of the queued batch, or the per-line results when waiting
+        """
+        lines = []
+        for index, item in enumerate(items or []):
+            text = item.get("text") if isinstance(item, dict) else None
+            if not isinstance(text, str) or not text.strip():
+                return f"❌ Item {index + 1} needs a non-empty text"
+            line = {key: item.get(key) for key in ("agent", "voice", "personality", "language")}
+            # Resolve mapped voices now so lines are grouped by the voice they will use
+            line["voice"], line["personality"] = self._agent_voice(line["agent"], line["voice"], line["personality"])
+            line["text"] = text
+            lines.append(line)
+        if not lines:
+            return "❌ No items to speak"
+        if len(lines) > self.MAX_BATCH_ITEMS:
+            return f"❌ Too many items ({len(lines)}, max {self.MAX_BATCH_ITEMS})"
+
+        prepared, groups = self._prepare_batch(lines)
+
+        def cancel_preparation(_=None) -> None:
+            for future in prepared:
+                future.cancel()
+
+        summary = f"{len(lines)} line(s), {len(groups)} voice group(s)"
+        if self.speech_queue is None:
             try:
-                stdout, stderr = await result.communicate()
-                if result.returncode == 0:
-                    return stdout.decode().strip()
-                else:
-                    error_msg = stderr.decode().strip()
-                    if not error_msg:  # If stderr is empty, include stdout for debugging
-                        error_msg = f"Return code {result.returncode}. Stdout: {stdout.decode().strip()}"
-                    return error_msg
+                return await self._speak_batch(lines, prepared, summary)
             finally:
-                # Ensure process cleanup
-                if result.returncode is None:
-                    result.kill()
-                    await result.wait()
-        except Exception as e:
-            return f"Error running script: {e}"
+                cancel_preparation()
+        try:
+            job = self.speech_queue.submit_call(
+                f"Batch of {summary}: {lines[0]['text'][:40]}",
+                lambda: self._speak_batch(lines, prepared, summary),
+                priority,
+            )
+        except (SpeechQueueFull, ValueError) as e:
+            cancel_preparation()
+            return f"❌ {e}"
+        # Cancelled, dropped or finished: stop synthesizing lines nobody will hear
+        watcher = self._keep_batch_task(job.done.wait())
+        watcher.add_done_callback(cancel_preparation)
+        if wait:
+            return await self.speech_queue.wait(job)
+        position = self.speech_queue.position(job)
+        where = f"position {position}" if position else "speaking now"
+        return (
+            f"🎭 Queued speech job #{job.id} ({job.priority} priority, {where}): {summary}\n"
+            f"💡 Check with get_speech_status(job_id={job.id})"
+        )
 
-    async def _get_current_voice(self) -> str:
-        """Get the currently active voice"""
-        result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["get"])
-        return result.strip() if result else "Unknown"
+    def _prepare_batch(self, lines: list[dict]) -> tuple[list[asyncio.Future], dict[str, list[int]]]:
+        """
+        Start synthesizing batch lines ahead of playback.
 
-    async def _get_personality(self) -> str:
-        """Get the current personality setting"""
-        personality_file = self.claude_dir / "tts-personality.txt"
-        if not personality_file.exists():
-            # Try global
-            personality_file = Path.home() / self.CLAUDE_DIR_NAME / "tts-personality.txt"
+        Returns:
+            (one future per line resolving to a ready audio file, or None to speak the
+            line the usual way; line indexes per voice group synthesized in-process)
+        """
+        loop = asyncio.get_running_loop()
+        prepared = [loop.create_future() for _ in lines]
+        groups: dict[str, list[int]] = {}
+        engine_ready = self.piper_engine is not None and self._engine_applicable()
+        for index, line in enumerate(lines):
+            cache_key = self._synthesis_cache_key(line["text"], line["voice"], line["personality"], line["language"])
+            cached = self.synthesis_cache.get(cache_key) if cache_key else None
+            voice_name = line["voice"] or self.settings.voice()
+            if cached is not None:
+                prepared[index].set_result(cached)
+            elif (
+                engine_ready
+                and not line["personality"]
+                and not line["language"]
+                and voice_name
+                and self.piper_engine.has_voice(voice_name)
+            ):
+                line["cache_key"] = cache_key
+                groups.setdefault(voice_name, []).append(index)
+            else:
+                prepared[index].set_result(None)
+        if not groups:
+            return prepared, groups
+
+        workers = asyncio.Semaphore(self.batch_workers)
+        length_scale = self._speech_length_scale()
+        speaker_id = self._piper_speaker_id()
+
+        async def synthesize_group(voice_name: str, indexes: list[int]) -> None:
+            async with workers:
+                # One voice per worker: its model is loaded once and reused for every line
+                for index in indexes:
+                    future = prepared[index]
+                    if future.done():
+                        continue  # batch cancelled
+                    audio_file = self.settings.write_dir() / "audio" / f"tts-{time.time_ns()}.wav"
+                    try:
+                        synthesized = await self._engine_synthesize(
+                            lines[index]["text"], voice_name, audio_file,
+                            length_scale=length_scale, speaker_id=speaker_id,
+                        )
+                    except Exception as e:
+                        if not isinstance(e, Busy):
+                            print(f"Warning: batch synthesis failed: {e}", file=sys.stderr)
+                        synthesized = False
+                    if synthesized:
+                        self._record_audio(audio_file, "piper")
+                        if lines[index].get("cache_key"):
+                            self.synthesis_cache.put(lines[index]["cache_key"], audio_file)
+                    if not future.done():
+                        future.set_result(audio_file if synthesized else None)
+
+        for voice_name, indexes in groups.items():
+            self._keep_batch_task(synthesize_group(voice_name, indexes))
+        return prepared, groups
+
+    def _keep_batch_task(self, coro) -> asyncio.Task:
+        """Start a batch task and hold a reference until it finishes"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+        return task
+
+    async def _speak_batch(self, lines: list[dict], prepared: list[asyncio.Future], summary: str) -> str:
+        """Play batch lines in order as their audio becomes ready"""
+        results = []
+        for line, future in zip(lines, prepared):
+            try:
+                # Shielded: stopping the batch must not look like a cancelled line
+                audio_file = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                audio_file = None
+            if audio_file is not None:
+                speech = self._play_prepared(line["text"], audio_file)
+                result = await self._tracked_speech(line["text"], line["voice"], line["agent"], speech)
+            else:
+                result = await self.text_to_speech(
+                    line["text"], line["voice"], line["personality"], line["language"], False, line["agent"]
+                )
+            results.append((line, result))
+            if result.startswith("🔇"):
+                break  # muted mid-batch: skip the rest
+
+        spoken = sum(1 for _, result in results if result.startswith("✅"))
+        output = f"🎭 Spoke {spoken}/{len(lines)} line(s) ({summary})\n"
+        for number, (line, result) in enumerate(results, 1):
+            who = f"[{line['agent']}] " if line["agent"] else ""
+            output += f"{number}. {who}{result.splitlines()[0]}\n"
+        if len(results) < len(lines):
+            output += f"🔇 Muted: skipped {len(lines) - len(results)} line(s)\n"
+        return output
 
-        try:
-            if personality_file.exists():
-                return personality_file.read_text().strip()
-        except (PermissionError, UnicodeDecodeError, OSError) as e:
-            # Log error but don't crash - return default
-            import sys
-            print(f"Warning: Could not read personality file: {e}", file=sys.stderr)
-        return "normal"
+    async def _play_prepared(self, text: str, audio_file: Path) -> str:
+        """Play audio synthesized ahead of time for one line"""
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if self._is_muted_sync():
+            return f"🔇 TTS muted, skipped: {truncated}"
+        if not await self._play(audio_file):
+            return f"❌ TTS failed: no working audio player found\n📁 Audio saved: {audio_file}"
+        return f"✅ Spoke: {truncated}\n📁 Audio saved: {audio_file}"
 
-    async def _get_language(self) -> str:
-        """Get the current language setting"""
-        result = await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["code"])
-        return result.strip() if result else "english"
+    async def get_voice_map(self, agent: Optional[str] = None) -> str:
+        """
+        Show the BMAD agent voice map, or how one agent resolves.
 
-    async def _get_provider(self) -> str:
-        """Get the active TTS provider"""
-        provider_file = self.claude_dir / "tts-provider.txt"
-        if not provider_file.exists():
-            provider_file = Path.home() / self.CLAUDE_DIR_NAME / "tts-provider.txt"
+        Args:
+            agent: Agent id or display name to look up (None = the whole map)
 
-        provider_labels = {
-            "macos": "macOS TTS",
-            "piper": "Piper TTS (Free, Offline)",
-            "termux-ssh": "Termux SSH (Android)",
-            "windows-piper": "Windows Piper TTS (Free, Offline)",
-            "windows-sapi": "Windows SAPI (Built-in)",
-            "soprano": "Soprano TTS (Ultra-fast Neural)",
-        }
-        try:
-            if provider_file.exists():
-                provider = provider_file.read_text().strip()
-                # Strip BOM from PowerShell-written files
-                provider = provider.lstrip('\ufeff')
-                return provider_labels.get(provider, provider)
-        except (PermissionError, UnicodeDecodeError, OSError) as e:
-            # Log error but don't crash - return default
-            import sys
-            print(f"Warning: Could not read provider file: {e}", file=sys.stderr)
-        # Default based on platform
-        if self.is_windows:
-            return "Windows SAPI (Built-in)"
-        return "Piper TTS (Free, Offline)"
+        Returns:
+            Entries, voices per provider and any problems found while loading
+        """
+        voice_map = self.voice_map.get()
+        if voice_map.source is None:
+            return f"🗺️  No voice map found (looked for {' and '.join(VOICE_MAP_PATHS)}; set AGENTVIBES_VOICE_MAP)"
+        provider = self.settings.provider()
+        installed = set(self.voice_catalog().voices) if self._uses_voice_catalog() else None
+
+        def describe(entry) -> str:
+            voice = entry.voice_for(provider)
+            text = f"{entry.agent}"
+            text += f" ({entry.name})" if entry.name else ""
+            text += f": {voice or '(default voice)'}"
+            if voice and installed is not None and voice not in installed:
+                text += " ⚠️ not installed"
+            if entry.personality:
+                text += f", {entry.personality}"
+            if entry.intro:
+                text += f' - "{entry.intro}"'
+            return text
+
+        if agent:
+            entry = voice_map.lookup(agent)
+            if entry is None:
+                return f"❌ Agent '{agent}' is not in the voice map ({voice_map.source})"
+            return f"🗺️  {describe(entry)}\n" + "".join(
+                f"   {name}: {voice}\n" for name, voice in entry.voices.items()
+            )
 
+        output = "🗺️  Voice Map\n"
+        output += f"{self.SEPARATOR}\n"
+        output += f"File: {voice_map.source}\n"
+        output += f"Agents: {len(voice_map.entries)} (voices for {', '.join(voice_map.providers) or 'no provider'})\n"
+        output += f"Provider: {provider}\n"
+        for entry in voice_map.entries.values():
+            output += f"  {describe(entry)}\n"
+        if voice_map.issues:
+            output += f"Issues ({len(voice_map.issues)}):\n"
+            output += "".join(f"  ⚠️  {issue}\n" for issue in voice_map.issues)
+        output += f"{self.SEPARATOR}\n"
+        return output
 
-# Create the MCP server
-app = Server("agentvibes")
-agent_vibes = AgentVibesServer()
+    async def enqueue_speech(
+        self,
+        text: str,
+        voice: Optional[str] = None,
+        personality: Optional[str] = None,
+        language: Optional[str] = None,
+        stream: Optional[bool] = None,
+        priority: str = "normal",
+        wait: bool = False,
+        agent: Optional[str] = None,
+    ) -> str:
+        """
+        Queue text for speech and return without waiting for playback.
 
+        Args:
+            text: The text to speak
+            voice: Optional voice name
+            personality: Optional personality style
+            language: Optional language
+            stream: Speak sentence by sentence (None = automatically for long text)
+            priority: "high" (completions, stops "low" speech), "normal" or "low"
+            wait: Wait until the speech has played and return its result
+            agent: Speaking agent (e.g. BMAD agent id); bursts are coalesced per agent
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List all available AgentVibes tools"""
-    return [
-        Tool(
-            name="text_to_speech",
-            description="""Convert text to speech using AgentVibes TTS.
+        Returns:
+            Job id and queue position, or the speech result when waiting
+        """
+        if self.speech_queue is None:
+            return await self.text_to_speech(text, voice, personality, language, stream, agent)
+        try:
+            job, outcome = self.speech_queue.offer(
+                text,
+                priority,
+                agent,
+                voice=voice,
+                personality=personality,
+                language=language,
+                stream=stream,
+            )
+        except (SpeechQueueFull, ValueError) as e:
+            return f"❌ {e}"
+        if wait:
+            return await self.speech_queue.wait(job)
+
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if outcome == "duplicate":
+            return f"⏭️  Duplicate of speech job #{job.id}, skipped: {truncated}"
+        if outcome == "merged":
+            return (
+                f"🔗 Merged into speech job #{job.id}: {truncated}\n"
+                f"💡 Check with get_speech_status(job_id={job.id})"
+            )
+        position = self.speech_queue.position(job)
+        where = f"position {position}" if position else "speaking now"
+        return (
+            f"🗣️  Queued speech job #{job.id} ({job.priority} priority, {where}): {truncated}\n"
+            f"💡 Check with get_speech_status(job_id={job.id})"
+        )
 
-Supports both macOS TTS and Piper (free, offline) providers.
-Can use different voices, personalities, and languages.
+    async def get_speech_status(self, job_id: Optional[int] = None) -> str:
+        """
+        Report one speech job, or the whole queue.
 
-Perfect for:
+        Args:
+            job_id: Job to report (None = queue overview)
+
+        Returns:
+            Formatted status
+        """
+        if self.speech_queue is None:
+            return "🗣️  Speech queue is disabled (AGENTVIBES_SPEECH_QUEUE=0)"
+        if job_id is not None:
+            job = self.speech_queue.get(job_id)
+            if job is None:
+                return f"❌ Unknown speech job #{job_id}"
+            output = f"🗣️  Speech job #{job.id}: {job.status} ({job.priority} priority)\n"
+            if job.status == "queued":
+                output += f"Position: {self.speech_queue.position(job)}\n"
+            if job.result:
+                output += f"{job.result}\n"
+            return output
+
+        current = self.speech_queue.current
+        queued = self.speech_queue.queued()
+        output = "🗣️  Speech Queue\n"
+        output += f"{self.SEPARATOR}\n"
+        if current is not None:
+            output += f"Speaking: #{current.id} [{current.priority}] {current.text[:50]}\n"
+        else:
+            output += "Speaking: (nothing)\n"
+        output += f"Waiting: {len(queued)}/{self.speech_queue.max_depth}\n"
+        for job in queued:
+            output += f"  #{job.id} [{job.priority}] {job.text[:50]}\n"
+        if self.speech_queue.coalesce_window:
+            output += (
+                f"Coalesced: {self.speech_queue.merged} merged, "
+                f"{self.speech_queue.deduplicated} duplicate(s) dropped\n"
+            )
+        output += f"{self.SEPARATOR}\n"
+        return output
+
+    async def cancel_speech(self, job_id: Optional[int] = None) -> str:
+        """
+        Cancel a queued speech job or stop the one playing.
+
+        Args:
+            job_id: Job to cancel (None = stop the current speech)
+
+        Returns:
+            Confirmation or error message
+        """
+        if self.speech_queue is None:
+            return "🗣️  Speech queue is disabled (AGENTVIBES_SPEECH_QUEUE=0)"
+        job = self.speech_queue.cancel(job_id)
+        if job is None:
+            target = f"job #{job_id}" if job_id is not None else "speech playing"
+            return f"❌ No cancellable {target}"
+        return f"🛑 Cancelled speech job #{job.id}"
+
+    async def flush_speech_queue(self, include_current: bool = False) -> str:
+        """
+        Drop all waiting speech.
+
+        Args:
+            include_current: Also stop the speech that is playing
+
+        Returns:
+            Number of jobs removed
+        """
+        if self.speech_queue is None:
+            return "🗣️  Speech queue is disabled (AGENTVIBES_SPEECH_QUEUE=0)"
+        count = self.speech_queue.flush(include_current)
+        return f"🧹 Flushed {count} speech job(s)"
+
+    async def get_metrics(self, format: str = "text") -> str:
+        """
+        Report tool latencies, script runs and audio produced since startup.
+
+        Args:
+            format: "text" (summary), "json" or "prometheus"
+
+        Returns:
+            Formatted metrics
+        """
+        if self.metrics_file is not None:
+            self.dump_metrics()
+        if format == "json":
+            return json.dumps(self.metrics.snapshot(), indent=2)
+        if format == "prometheus":
+            return self.metrics.to_prometheus()
+        if format != "text":
+            return f"❌ Unknown format: {format} (use text, json or prometheus)"
+
+        def ms(seconds: float) -> str:
+            return f"{seconds * 1000:.0f}ms" if seconds < 10 else f"{seconds:.1f}s"
+
+        def latency(summary: dict) -> str:
+            return f"p50 {ms(summary['p50'])}, p95 {ms(summary['p95'])}, max {ms(summary['max'])}"
+
+        snapshot = self.metrics.snapshot()
+        counters = snapshot["counters"]
+        histograms = snapshot["histograms"]
+
+        output = "📊 AgentVibes Metrics\n"
+        output += f"{self.SEPARATOR}\n"
+        output += f"Uptime: {snapshot['uptime_seconds'] / 60:.0f} min\n"
+        startup = self._startup_report()
+        if startup:
+            output += f"{startup}\n"
+
+        tools = [h for h in histograms if h["name"] == "tool_seconds"]
+        if tools:
+            output += "\nTools:\n"
+            for summary in sorted(tools, key=lambda h: -h["count"]):
+                tool = summary["labels"]["tool"]
+                outcomes = {
+                    c["labels"]["outcome"]: c["value"] for c in counters
+                    if c["name"] == "tool_calls_total" and c["labels"]["tool"] == tool
+                }
+                output += f"  {tool}: {summary['count']} call(s), {latency(summary)}"
+                if outcomes.get("error"):
+                    output += f", {outcomes['error']:g} error(s)"
+                if outcomes.get("busy"):
+                    output += f", {outcomes['busy']:g} busy"
+                output += "\n"
+
+        scripts = [h for h in histograms if h["name"] == "script_seconds"]
+        if scripts:
+            output += "\nScripts:\n"
+            for summary in sorted(scripts, key=lambda h: -h["count"]):
+                script = summary["labels"]["script"]
+                exits = ", ".join(
+                    f"{c['labels']['exit_code']}×{c['value']:g}" for c in counters
+                    if c["name"] == "script_runs_total" and c["labels"]["script"] == script
+                )
+                output += f"  {script}: {summary['count']} run(s), {latency(summary)}, exit codes {exits}\n"
+            spawned = sum(c["value"] for c in counters if c["name"] == "subprocesses_total")
+            spawn_times = [h for h in histograms if h["name"] == "subprocess_spawn_seconds"]
+            if spawn_times:
+                worst = max(h["p95"] for h in spawn_times)
+                output += f"  Processes spawned: {spawned:g} (spawn p95 {ms(worst)})\n"
+
+        for name, label in (
+            ("tts_seconds", "Speech (end to end)"),
+            ("synthesis_seconds", "In-process synthesis"),
+            ("playback_seconds", "Playback"),
+        ):
+            merged = [h for h in histograms if h["name"] == name]
+            if merged:
+                busiest = max(merged, key=lambda h: h["count"])
+                count = sum(h["count"] for h in merged)
+                output += f"\n{label}: {count} time(s), {latency(busiest)}\n"
+
+        audio_bytes = sum(c["value"] for c in counters if c["name"] == "audio_bytes_total")
+        if audio_bytes:
+            output += f"\nAudio produced: {audio_bytes / 1024 / 1024:.1f} MB\n"
+        if self.metrics_file is not None:
+            output += f"\n📁 Dumped to: {self.metrics_file}\n"
+        output += f"{self.SEPARATOR}\n"
+        return output
+
+    def record_startup(self, phase: str, seconds: float) -> None:
+        """Remember how long a startup phase took (shown by get_metrics)"""
+        self.startup_timings[phase] = seconds
+        self.metrics.observe("startup_seconds", seconds, phase=phase)
+
+    def start_warmup(self) -> bool:
+        """
+        Warm provider detection, the voice list, voice models and the cache index
+        in the background, so the server can answer initialize/list_tools first.
+
+        Disabled with AGENTVIBES_WARMUP=0 (everything then loads on first use).
+
+        Returns:
+            True if the warm-up was started
+        """
+        if os.environ.get("AGENTVIBES_WARMUP", "1").strip().lower() in ("0", "false", "off", "no"):
+            return False
+        if self._warmup_task is not None:
+            return False
+        self._warmup_task = asyncio.get_running_loop().create_task(self._warm_up())
+        return True
+
+    async def _warm_up(self) -> None:
+        """Run the warm-up steps concurrently and record how long each took"""
+        async def timed(phase: str, step) -> None:
+            started = time.perf_counter()
+            try:
+                await step
+            except Exception as e:
+                print(f"Warning: warm-up step '{phase}' failed: {e}", file=sys.stderr)
+            finally:
+                self.record_startup(f"warmup_{phase}", time.perf_counter() - started)
+
+        started = time.perf_counter()
+        steps = [
+            timed("provider", asyncio.to_thread(self._probe_provider)),
+            timed("voices", self._warm_voices()),
+            # Compiles the BMAD voice map so malformed rows are reported now, not at speak time
+            timed("voice_map", asyncio.to_thread(self.voice_map.get)),
+        ]
+        if self.piper_engine:
+            steps.append(timed("models", self._warm_models()))
+        if self.synthesis_cache:
+            steps.append(timed("cache", asyncio.to_thread(self.synthesis_cache.load)))
+        if self.piper_engine and self.inprocess_effects:
+            steps.append(timed("music", asyncio.to_thread(self._warm_music)))
+        await asyncio.gather(*steps)
+        self.record_startup("warmup", time.perf_counter() - started)
+        # Resident models make the phrase bank cheap to fill
+        self.refresh_phrase_bank()
+
+    def _probe_provider(self) -> dict:
+        """Find the active provider's binary and the audio player (both cached)"""
+        provider = self.settings.provider("windows-sapi" if self.is_windows else "piper")
+        binary = {"piper": "piper", "macos": "say", "termux-ssh": "ssh"}.get(provider)
+        player = find_player()
+        self.provider_probe = {
+            "provider": provider,
+            "binary": shutil.which(binary) if binary else None,
+            "player": player[0] if player else None,
+        }
+        return self.provider_probe
+
+    async def _warm_voices(self) -> None:
+        if self._uses_voice_catalog():
+            await asyncio.to_thread(self.voice_catalog)
+        else:
+            await self._list_script_voices()
+
+    def _warm_music(self) -> None:
+        """Decode the configured background track before the first utterance needs it"""
+        chain = self._effects_chain()
+        if chain is None or chain.background is None:
+            return
+        rate = 22050
+        voice_name = self.settings.voice()
+        if voice_name:
+            try:
+                config_file = self.settings.piper_voices_dir() / f"{voice_name}.onnx.json"
+                rate = int(json.loads(config_file.read_text(encoding="utf-8"))["audio"]["sample_rate"])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        self.music_cache.track(chain.background, rate, 1)
+
+    async def _warm_models(self) -> None:
+        """Load the current (and learning mode target) voice so the first utterance does not pay for it"""
+        voice_name = self.settings.voice()
+        if voice_name and self.piper_engine.has_voice(voice_name):
+            await self.piper_engine.preload(voice_name)
+        target_voice = self.settings.target_voice()
+        if self.settings.learn_mode_enabled() and target_voice and self.piper_engine.has_voice(target_voice):
+            await self.piper_engine.preload(target_voice)
+
+    def _startup_report(self) -> Optional[str]:
+        """One-line summary of startup timings"""
+        timings = self.startup_timings
+        if not timings:
+            return None
+
+        def ms(phase: str) -> str:
+            return f"{timings[phase] * 1000:.0f}ms"
+
+        parts = [
+            f"{label} {ms(phase)}"
+            for phase, label in (("import", "import"), ("init", "init"), ("first_list_tools", "first list_tools"))
+            if phase in timings
+        ]
+        if "warmup" in timings:
+            steps = ", ".join(
+                f"{phase[len('warmup_'):]} {ms(phase)}" for phase in timings if phase.startswith("warmup_")
+            )
+            parts.append(f"warm-up {ms('warmup')} ({steps})")
+        return "Startup: " + ", ".join(parts)
+
+    def refresh_phrase_bank(self) -> bool:
+        """
+        Re-synthesize the phrase bank in the background for the current settings.
+
+        Called at startup, after set_voice/set_personality/set_speed and whenever
+        the config watcher sees a settings change. Must run on the event loop.
+
+        Returns:
+            True if a warm-up was scheduled
+        """
+        if self.phrase_bank is None:
+            return False
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self.phrase_bank.schedule(self._warm_phrase_bank)
+        return True
+
+    def _phrase_bank_phrases(self) -> list[str]:
+        """Phrases for the active personality, then shared ones, else the defaults"""
+        sources = []
+        personality_file = self.settings.path(f"config/phrase-bank-{self.settings.personality()}.txt")
+        if personality_file is not None:
+            try:
+                sources.append(parse_phrases(personality_file.read_text(encoding="utf-8")))
+            except OSError:
+                pass
+        sources.append(parse_phrases(self.settings.read("config/phrase-bank.txt")))
+        if not any(sources):
+            sources = [list(DEFAULT_PHRASES)]
+        return select_phrases(sources, self.phrase_bank.max_phrases)
+
+    async def _warm_phrase_bank(self) -> None:
+        """Synthesize missing phrase bank entries with the in-process engine"""
+        bank = self.phrase_bank
+        voice_name = self.settings.voice()
+        cache_settings = self._synthesis_settings(None, None, None)
+        if (
+            cache_settings is None
+            or not self._engine_applicable()
+            or not voice_name
+            or not self.piper_engine.has_voice(voice_name)
+        ):
+            # Hooks handle these settings; phrases are cached as they are spoken instead
+            bank.invalidate()
+            bank.state = "unavailable"
+            return
+
+        length_scale = self._speech_length_scale()
+        speaker_id = self._piper_speaker_id()
+
+        async def synthesize(phrase: str, cache_key: str) -> bool:
+            fd, tmp = tempfile.mkstemp(prefix="agentvibes-phrase-", suffix=".wav")
+            os.close(fd)
+            audio_file = Path(tmp)
+            try:
+                if not await self._engine_synthesize(
+                    phrase, voice_name, audio_file, length_scale=length_scale, speaker_id=speaker_id
+                ):
+                    return False
+                self._record_audio(audio_file, "phrase-bank")
+                return self.synthesis_cache.put(cache_key, audio_file) is not None
+            except Busy:
+                return False  # live speech comes first; the next refresh fills the gap
+            finally:
+                audio_file.unlink(missing_ok=True)
+
+        await bank.warm(
+            make_key("", **cache_settings),
+            self._phrase_bank_phrases(),
+            lambda phrase: make_key(phrase, **cache_settings),
+            synthesize,
+        )
+
+    def dump_metrics(self) -> bool:
+        """Write metrics to AGENTVIBES_METRICS_FILE (.prom/.txt = Prometheus text, else JSON)"""
+        if self.metrics_file is None:
+            return False
+        try:
+            self.metrics.dump(self.metrics_file)
+            return True
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.metrics_file}: {e}", file=sys.stderr)
+            return False
+
+    def start_metrics_dump(self) -> bool:
+        """Dump metrics every AGENTVIBES_METRICS_INTERVAL seconds when a metrics file is set"""
+        if self.metrics_file is None or self._metrics_task is not None:
+            return False
+
+        async def dump_periodically():
+            while True:
+                await asyncio.sleep(max(1.0, self.metrics_interval))
+                self.dump_metrics()
+
+        self._metrics_task = asyncio.get_running_loop().create_task(dump_periodically())
+        return True
+
+    async def stop_metrics_dump(self) -> None:
+        """Stop the periodic dump and write a final one"""
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await asyncio.gather(self._metrics_task, return_exceptions=True)
+            self._metrics_task = None
+        self.dump_metrics()
+
+    def start_audio_eviction(self) -> bool:
+        """Evict generated clips every AGENTVIBES_AUDIO_EVICT_INTERVAL seconds"""
+        if self.audio_evictor is None or self._eviction_task is not None:
+            return False
+
+        async def evict_periodically():
+            while True:
+                await asyncio.sleep(self.audio_evictor.interval)
+                await self.evict_audio()
+
+        self._eviction_task = asyncio.get_running_loop().create_task(evict_periodically())
+        return True
+
+    async def stop_audio_eviction(self) -> None:
+        """Stop the background eviction pass"""
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+            await asyncio.gather(self._eviction_task, return_exceptions=True)
+            self._eviction_task = None
+
+    async def shutdown(self) -> None:
+        """Stop queued speech, background tasks, the shell workers and the config watcher"""
+        if self.speech_queue is not None:
+            await self.speech_queue.close()
+        if self.phrase_bank is not None:
+            await self.phrase_bank.close()
+        await self.stop_audio_eviction()
+        await self.stop_metrics_dump()
+        if self.shell_pool is not None:
+            await self.shell_pool.close()
+        self.stop_config_watcher()
+
+    async def evict_audio(self) -> tuple[int, int]:
+        """
+        Run one eviction pass over the audio directory.
+
+        Returns:
+            (files, bytes) reclaimed
+        """
+        if self.audio_evictor is None:
+            return 0, 0
+        started = time.perf_counter()
+        try:
+            files, freed = await self.audio_evictor.run_once(
+                [self.settings.write_dir() / "audio"], busy=lambda: self._speaking > 0
+            )
+        except Exception as e:
+            print(f"Warning: Audio eviction failed: {e}", file=sys.stderr)
+            return 0, 0
+        self.metrics.observe("audio_eviction_seconds", time.perf_counter() - started)
+        if files:
+            self.metrics.inc("audio_evicted_files_total", files)
+            self.metrics.inc("audio_evicted_bytes_total", freed)
+        return files, freed
+
+    # Helper methods
+    def _base_script_env(self) -> dict:
+        """Get the environment shared by every script run (computed once)"""
+        if self._script_env_base is None:
+            env = os.environ.copy()
+
+            # Add common locations for piper to PATH (Unix only)
+            if not self.is_windows:
+                home_dir = Path.home()
+                local_bin = str(home_dir / ".local" / "bin")
+                if "PATH" in env:
+                    if local_bin not in env["PATH"]:
+                        env["PATH"] = f"{local_bin}:{env['PATH']}"
+                else:
+                    env["PATH"] = local_bin
+
+            self._script_env_base = env
+        return self._script_env_base
+
+    def _script_env_overrides(self, project_dir: Optional[Path] = None) -> dict:
+        """
+        Get the per-call environment variables layered on top of the base env.
+
+        Args:
+            project_dir: Force CLAUDE_PROJECT_DIR (used for per-request settings overlays)
+        """
+        # Determine where to save settings based on context:
+        # 1. If cwd has .claude/ → Use cwd (real Claude Code project)
+        # 2. Otherwise → Use global ~/.claude/ (Claude Desktop, Warp, etc.)
+        # Note: Hooks are ALWAYS from package .claude/ (self.claude_dir)
+        project_dir = project_dir or self.settings.project_dir()
+        if project_dir is not None:
+            return {"CLAUDE_PROJECT_DIR": str(project_dir)}
+        return {}
+
+    def _build_script_env(self, project_dir: Optional[Path] = None) -> dict:
+        """
+        Build environment dict for script execution (shared by all script runners)
+
+        Args:
+            project_dir: Force CLAUDE_PROJECT_DIR (used for per-request settings overlays)
+        """
+        env = dict(self._base_script_env())
+        env.update(self._script_env_overrides(project_dir))
+        return env
+
+    async def _run_script(self, script_name: str, args: list[str], mutates: bool = False) -> str:
+        """
+        Run a script and return output (bash on Unix, PowerShell on Windows).
+
+        Args:
+            script_name: Hook script file name
+            args: Script arguments
+            mutates: The script writes settings files (invalidate the snapshot afterwards)
+        """
+        # Auto-resolve .sh → .ps1 on Windows (class constants handle special cases)
+        if self.is_windows and script_name.endswith('.sh'):
+            script_name = script_name[:-3] + '.ps1'
+        script_path = self.hooks_dir / script_name
+        if not script_path.exists():
+            return f"Script not found: {script_path}"
+
+        started = time.perf_counter()
+        returncode = None
+        try:
+            if self.shell_pool:
+                # Persistent bash workers (AGENTVIBES_SHELL_POOL=1)
+                returncode, stdout, stderr = await self.shell_pool.run(
+                    script_path, args, self._script_env_overrides()
+                )
+            else:
+                returncode, stdout, stderr = await self._spawn_script(script_path, args)
+            self._record_script(script_name, started, returncode)
+            if mutates:
+                self._settings_changed()
+
+            if returncode == 0:
+                return stdout.decode().strip()
+            else:
+                error_msg = stderr.decode().strip()
+                if not error_msg:  # If stderr is empty, include stdout for debugging
+                    error_msg = f"Return code {returncode}. Stdout: {stdout.decode().strip()}"
+                return error_msg
+        except Exception as e:
+            if returncode is None:
+                self._record_script(script_name, started, None)
+            return f"Error running script: {e}"
+
+    async def _spawn_script(self, script_path: Path, args: list[str]) -> tuple[int, bytes, bytes]:
+        """Run a script in a new bash/PowerShell process"""
+        # Build command — PowerShell on Windows, bash on Unix
+        if self.is_windows:
+            cmd = [
+                "powershell", "-NoProfile", "-ExecutionPolicy", "Bypass",
+                "-File", str(script_path)
+            ] + args
+        else:
+            cmd = ["bash", str(script_path)] + args
+
+        return await self._exec(script_path.name, cmd, self._build_script_env())
+
+    async def _exec(self, script_name: str, cmd: list[str], env: dict) -> tuple[int, bytes, bytes]:
+        """Spawn a process, collect its output and record how long the spawn took"""
+        started = time.perf_counter()
+        result = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        self.metrics.observe("subprocess_spawn_seconds", time.perf_counter() - started, script=script_name)
+        self.metrics.inc("subprocesses_total", script=script_name)
+        try:
+            stdout, stderr = await result.communicate()
+            return result.returncode, stdout, stderr
+        finally:
+            # Ensure process cleanup
+            if result.returncode is None:
+                result.kill()
+                await result.wait()
+
+    def _record_script(self, script_name: str, started: float, returncode: Optional[int]) -> None:
+        """Record a script run's duration and exit code ("error" when it never finished)"""
+        self.metrics.observe("script_seconds", time.perf_counter() - started, script=script_name)
+        exit_code = "error" if returncode is None else returncode
+        self.metrics.inc("script_runs_total", script=script_name, exit_code=exit_code)
+
+    def _record_audio(self, audio_file: Path, source: str) -> None:
+        """Count the bytes of audio a synthesis produced"""
+        try:
+            self.metrics.inc("audio_bytes_total", audio_file.stat().st_size, source=source)
+        except OSError:
+            pass
+
+    async def _play(self, audio_file: Path) -> bool:
+        """Play an audio file, recording playback time"""
+        started = time.perf_counter()
+        played = await play_file(audio_file)
+        self.metrics.observe("playback_seconds", time.perf_counter() - started)
+        if played:
+            self._collect_played(audio_file)
+        else:
+            self.metrics.inc("playback_failures_total")
+        return played
+
+    @contextlib.contextmanager
+    def _settings_overlay(self, overrides: dict[str, str]):
+        """
+        Create a throwaway project directory for a single request.
+
+        Its .claude/ symlinks the entries of the real settings directory except
+        the overridden files, which are written with the per-request values.
+        Hooks pointed at it via CLAUDE_PROJECT_DIR see the overrides while the
+        real settings stay untouched, so concurrent requests cannot clobber
+        each other.
+
+        The overlay sits in the project slot, so without a real project only the
+        ~/.claude entries the package .claude does not shadow are linked: the hooks
+        still resolve project > package > home. Files the hooks create in the
+        overlay are moved to the real settings directory afterwards.
+
+        Args:
+            overrides: Settings file name -> value (e.g. {"tts-personality.txt": "pirate",
+                "config/tts-speech-rate.txt": "1.5"})
+
+        Yields:
+            Path to use as CLAUDE_PROJECT_DIR
+        """
+        source = self.settings.write_dir()
+        dirs = self.settings.dirs()
+        # Settings directories that outrank the one being linked (the package .claude
+        # when there is no project); the hooks keep finding those in their own slot
+        higher = dirs[:dirs.index(source)] if source in dirs else []
+
+        def link_entries(source_dir: Path, target: Path, prefix: str = "") -> None:
+            for entry in source_dir.iterdir():
+                name = prefix + entry.name
+                if name in overrides:
+                    continue
+                # audio/ is always linked so generated clips land in the real directory
+                shadowed = [] if name == "audio" else [d / name for d in higher if (d / name).exists()]
+                if entry.is_dir() and (
+                    any(o.startswith(f"{name}/") for o in overrides) or any(p.is_dir() for p in shadowed)
+                ):
+                    # Directory holding overridden or shadowed files: recreate it, link the rest
+                    (target / entry.name).mkdir()
+                    link_entries(entry, target / entry.name, f"{name}/")
+                elif not shadowed:
+                    (target / entry.name).symlink_to(entry)
+
+        def keep_new_files(directory: Path, prefix: str = "") -> None:
+            """Move files the hooks created in the overlay to the real settings directory"""
+            for entry in directory.iterdir():
+                name = prefix + entry.name
+                if entry.is_symlink() or name in overrides:
+                    continue
+                if entry.is_dir():
+                    keep_new_files(entry, f"{name}/")
+                    continue
+                try:
+                    (source / name).parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(entry), str(source / name))
+                except OSError as e:
+                    print(f"Warning: Could not keep {name} written during the request: {e}", file=sys.stderr)
+
+        with tempfile.TemporaryDirectory(prefix="agentvibes-request-") as tmp:
+            overlay = Path(tmp) / self.CLAUDE_DIR_NAME
+            overlay.mkdir()
+            # Make sure audio written by the hooks lands in the real directory
+            (source / "audio").mkdir(parents=True, exist_ok=True)
+            link_entries(source, overlay)
+            for name, value in overrides.items():
+                (overlay / name).parent.mkdir(parents=True, exist_ok=True)
+                (overlay / name).write_text(f"{value}\n")
+            try:
+                yield Path(tmp)
+            finally:
+                keep_new_files(overlay)
+
+    def _is_muted_sync(self) -> bool:
+        """Check mute flags without formatting a message (memory read while watched)"""
+        return self.settings.memo("muted", self._read_mute_flags)
+
+    def _read_mute_flags(self) -> bool:
+        for mute_file in self._get_mute_files():
+            if mute_file.exists():
+                if mute_file.name != "tts-muted.txt":
+                    return True
+                try:
+                    if mute_file.read_text().strip() == "true":
+                        return True
+                except OSError:
+                    continue
+        return False
+
+    def _engine_applicable(self) -> bool:
+        """Check whether the in-process engine can reproduce what play-tts.sh would do"""
+        if self.settings.provider() != "piper":
+            return False
+        # Effects only sox can apply, learning and translation modes are handled
+        # by the hook scripts, so keep using them when any of those are on
+        if self._effects_chain() is None:
+            return False
+        if self.settings.learn_mode_enabled() or self.settings.translate_to():
+            return False
+        return True
+
+    def _effects_chain(self) -> Optional[EffectsChain]:
+        """
+        Get the in-process effects chain for the default agent's audio-effects.cfg entry.
+
+        Returns:
+            The chain (empty when no effects or music are on), or None when only
+            the hooks can apply the configured effects
+        """
+        return self.settings.memo("effects_chain", self._build_effects_chain)
+
+    def _build_effects_chain(self) -> Optional[EffectsChain]:
+        effects, track, volume = self.settings.effects()
+        music = self.settings.background_music_enabled()
+        if not effects and not music:
+            return EffectsChain()
+        if not self.inprocess_effects:
+            return None
+        background = None
+        if music:
+            background = self._background_track(track or self.settings.read("config/background-music.txt"))
+            if background is None:
+                return None
+        try:
+            level = float(
+                volume or self.settings.read("config/background-music-volume.txt") or DEFAULT_BACKGROUND_VOLUME
+            )
+        except ValueError:
+            level = DEFAULT_BACKGROUND_VOLUME
+        return EffectsChain.build(
+            effects, background, min(max(level, 0.0), 1.0), self.music_duck, self.music_cache
+        )
+
+    def _background_track(self, name: Optional[str]) -> Optional[Path]:
+        """Resolve a background music track name to a file under .claude/audio/tracks/"""
+        if not name:
+            return None
+        track = Path(name).expanduser()
+        if track.is_absolute():
+            return track if track.is_file() else None
+        return self.settings.path(f"audio/tracks/{name}")
+
+    async def _engine_synthesize(
+        self,
+        text: str,
+        voice_name: str,
+        audio_file: Path,
+        length_scale: Optional[float] = None,
+        speaker_id: Optional[int] = None,
+    ) -> bool:
+        """
+        Synthesize with the resident Piper engine, then apply the in-process effects chain.
+
+        Returns:
+            True if audio_file holds the finished utterance
+        """
+        async with self.limiter.slot("synthesis"):
+            with self.metrics.timer("synthesis_seconds", engine="piper"):
+                if not await self.piper_engine.synthesize(
+                    text, voice_name, audio_file, length_scale=length_scale, speaker_id=speaker_id
+                ):
+                    return False
+        chain = self._effects_chain()
+        if chain is None or chain.is_empty:
+            return True
+        try:
+            with self.metrics.timer("effects_seconds"):
+                await asyncio.to_thread(chain.apply_file, audio_file)
+        except OSError as e:
+            print(f"Warning: in-process audio effects failed: {e}", file=sys.stderr)
+            audio_file.unlink(missing_ok=True)
+            return False
+        return True
+
+    def _speech_length_scale(self, target: bool = False) -> Optional[float]:
+        """Convert the speed-manager setting (e.g. "2.0" = 2x) to a Piper length scale"""
+        speed = self.settings.speed(target)
+        return 1.0 / speed if speed else None
+
+    def _piper_speaker_id(self) -> Optional[int]:
+        """Get the speaker index for multi-speaker Piper models"""
+        speaker = self.settings.read("tts-piper-speaker-id.txt")
+        return int(speaker) if speaker and speaker.isdigit() else None
+
+    def _synthesis_cache_key(
+        self,
+        text: str,
+        voice: Optional[str],
+        personality: Optional[str],
+        language: Optional[str],
+    ) -> Optional[str]:
+        """
+        Build the synthesis cache key for an utterance.
+
+        Returns:
+            Cache key, or None when caching does not apply (disabled, remote playback)
+        """
+        settings = self._synthesis_settings(voice, personality, language)
+        return make_key(text, **settings) if settings is not None else None
+
+    def _synthesis_settings(
+        self,
+        voice: Optional[str],
+        personality: Optional[str],
+        language: Optional[str],
+    ) -> Optional[dict]:
+        """
+        Get every setting that changes the synthesized audio (the cache key minus the text).
+
+        Returns:
+            Settings for make_key(), or None when caching does not apply
+        """
+        if not self.synthesis_cache:
+            return None
+        provider = self.settings.provider()
+        # Termux SSH plays on the phone, a local replay would be wrong
+        if provider == "termux-ssh":
+            return None
+        # Learning and translation modes speak more than (or other than) the text itself
+        if self.settings.learn_mode_enabled() or self.settings.translate_to():
+            return None
+        return dict(
+            voice=voice or self.settings.voice(),
+            provider=provider,
+            speaker=self.settings.read("tts-piper-speaker-id.txt"),
+            speed=self.settings.read("config/tts-speech-rate.txt"),
+            target_speed=self.settings.read("config/tts-target-speech-rate.txt"),
+            personality=personality or self.settings.read("tts-personality.txt"),
+            language=language or self.settings.read("tts-language.txt"),
+            learn_mode=self.settings.read("tts-learn-mode.txt"),
+            translate_to=self.settings.read("tts-translate-to.txt"),
+            effects=self.settings.read("config/audio-effects.cfg"),
+            background_music=self.settings.read("config/background-music-enabled.txt"),
+            background_track=self.settings.read("config/background-music.txt"),
+            background_volume=self.settings.read("config/background-music-volume.txt"),
+        )
+
+    async def _play_cached(self, cache_key: str, text: str) -> Optional[str]:
+        """
+        Replay cached audio for an utterance.
+
+        Returns:
+            Result message on a cache hit, or None to synthesize normally
+        """
+        cached_file = self.synthesis_cache.get(cache_key)
+        if cached_file is None:
+            return None
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if self._is_muted_sync():
+            return f"🔇 TTS muted, skipped: {truncated}"
+        if not await self._play(cached_file):
+            return None
+        return f"✅ Spoke: {truncated} (cached)\n📁 Audio saved: {cached_file}"
+
+    async def _speak_in_process(
+        self, text: str, voice: Optional[str], cache_key: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Synthesize with the resident Piper engine and play the result.
+
+        Returns:
+            Result message, or None when the caller should fall back to play-tts.sh
+        """
+        if not self._engine_applicable():
+            return None
+        voice_name = voice or self.settings.voice()
+        if not voice_name or not self.piper_engine.has_voice(voice_name):
+            return None
+
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if self._is_muted_sync():
+            return f"🔇 TTS muted, skipped: {truncated}"
+
+        audio_file = self.settings.write_dir() / "audio" / f"tts-{time.time_ns()}.wav"
+        try:
+            synthesized = await self._engine_synthesize(
+                text,
+                voice_name,
+                audio_file,
+                length_scale=self._speech_length_scale(),
+                speaker_id=self._piper_speaker_id(),
+            )
+        except Busy:
+            raise
+        except Exception as e:
+            print(f"Warning: in-process Piper synthesis failed: {e}", file=sys.stderr)
+            return None
+        if not synthesized:
+            return None
+        self._record_audio(audio_file, "piper")
+        if cache_key:
+            self.synthesis_cache.put(cache_key, audio_file)
+
+        if not await self._play(audio_file):
+            return f"❌ TTS failed: no working audio player found\n📁 Audio saved: {audio_file}"
+        return f"✅ Spoke: {truncated}\n📁 Audio saved: {audio_file}"
+
+    async def _speak_learn_mode(self, text: str, voice: Optional[str]) -> Optional[str]:
+        """
+        Speak an utterance in the main language, then the target language, in-process.
+
+        The translation and target clip are produced concurrently with the main clip,
+        and keep rendering while the main clip plays. Each clip uses its own speed
+        setting (set_speed / set_speed(target=True)).
+
+        Returns:
+            Result message, or None when the caller should fall back to play-tts.sh
+        """
+        if self.settings.provider() != "piper" or self.settings.translate_to() or self._effects_chain() is None:
+            return None
+        voice_name = voice or self.settings.voice()
+        target_language = self.settings.target_language()
+        target_voice = self.settings.target_voice()
+        if not (voice_name and target_language and target_voice):
+            return None
+        if not (self.piper_engine.has_voice(voice_name) and self.piper_engine.has_voice(target_voice)):
+            return None
+
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if self._is_muted_sync():
+            return f"🔇 TTS muted, skipped: {truncated}"
+
+        stamp = time.time_ns()
+        audio_dir = self.settings.write_dir() / "audio"
+        main_file = audio_dir / f"tts-{stamp}.wav"
+        target_file = audio_dir / f"tts-{stamp}-target.wav"
+
+        async def render_target() -> Optional[str]:
+            with self.metrics.timer("translation_seconds"):
+                translated = await asyncio.to_thread(self.translator.translate, text, target_language)
+            if not translated:
+                return None
+            if not await self._engine_synthesize(
+                translated, target_voice, target_file, length_scale=self._speech_length_scale(target=True)
+            ):
+                return None
+            return translated
+
+        target = asyncio.create_task(render_target())
+        # Early returns drop the task; retrieve its outcome so nothing is logged as unhandled
+        target.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            try:
+                synthesized = await self._engine_synthesize(
+                    text,
+                    voice_name,
+                    main_file,
+                    length_scale=self._speech_length_scale(),
+                    speaker_id=self._piper_speaker_id(),
+                )
+            except Busy:
+                raise
+            except Exception as e:
+                print(f"Warning: in-process Piper synthesis failed: {e}", file=sys.stderr)
+                return None
+            if not synthesized:
+                return None
+            self._record_audio(main_file, "piper")
+            if not await self._play(main_file):
+                return f"❌ TTS failed: no working audio player found\n📁 Audio saved: {main_file}"
+            result = f"✅ Spoke: {truncated}\n"
+
+            try:
+                translated = await target
+            except Busy:
+                translated = None
+            except Exception as e:
+                print(f"Warning: learning mode target synthesis failed: {e}", file=sys.stderr)
+                translated = None
+            if translated is None:
+                return result + f"⚠️ No {target_language} translation (learning mode)\n📁 Audio saved: {main_file}"
+            if self._is_muted_sync():
+                return result + f"🔇 Muted before the {target_language} version\n📁 Audio saved: {main_file}"
+            self._record_audio(target_file, "piper")
+            await self._play(target_file)
+            shown = f"{translated[:50]}..." if len(translated) > 50 else translated
+            return result + (
+                f"🌍 {target_language.title()}: {shown}\n"
+                f"📁 Audio saved: {main_file}\n📁 Target audio saved: {target_file}"
+            )
+        finally:
+            target.cancel()
+
+    def _stream_chunks(
+        self,
+        text: str,
+        stream: Optional[bool],
+        voice: Optional[str] = None,
+        personality: Optional[str] = None,
+        language: Optional[str] = None,
+    ) -> Optional[list[str]]:
+        """
+        Decide whether to stream an utterance.
+
+        Long text streams automatically only when the in-process engine can synthesize
+        the next chunk while the current one plays. Through play-tts.sh each chunk is a
+        separate piper start (and music restart, and translation in learning mode), so
+        there streaming is opt-in with stream=True.
+
+        Returns:
+            The sentence chunks to speak, or None to speak the text in one go
+        """
+        # PowerShell hooks cannot be pinned to one settings snapshot per request
+        if stream is False or self.is_windows:
+            return None
+        if stream is None and (
+            self.stream_min_chars <= 0
+            or len(text) < self.stream_min_chars
+            or not self._engine_streams(voice or self.settings.voice(), personality, language)
+        ):
+            return None
+        chunks = split_sentences(text)
+        return chunks if len(chunks) > 1 else None
+
+    def _pinned_settings(self, personality: Optional[str], language: Optional[str]) -> dict:
+        """Snapshot the settings that shape the audio so every chunk sounds the same"""
+        pinned = {}
+        for name in (
+            "tts-personality.txt",
+            "tts-language.txt",
+            "tts-piper-speaker-id.txt",
+            "config/tts-speech-rate.txt",
+            "config/tts-target-speech-rate.txt",
+            "config/audio-effects.cfg",
+        ):
+            value = self.settings.read(name)
+            if value is not None:
+                pinned[name] = value
+        if personality:
+            pinned["tts-personality.txt"] = personality
+        if language:
+            pinned["tts-language.txt"] = language.lower()
+        return pinned
+
+    async def _play_chunk(self, audio_file: Path) -> bool:
+        """Play one streamed chunk; muting mid-stream stops the rest"""
+        if self._is_muted_sync():
+            return False
+        return await self._play(audio_file)
+
+    def _engine_streams(self, voice_name: Optional[str], personality: Optional[str], language: Optional[str]) -> bool:
+        """Check whether the in-process engine can pipeline a streamed utterance"""
+        return bool(
+            self.piper_engine
+            and not personality
+            and not language
+            and voice_name
+            and self._engine_applicable()
+            and self.piper_engine.has_voice(voice_name)
+        )
+
+    async def _speak_streaming(
+        self,
+        text: str,
+        chunks: list[str],
+        voice: Optional[str],
+        personality: Optional[str],
+        language: Optional[str],
+    ) -> str:
+        """
+        Speak text chunk by chunk with voice, speed and effects resolved once.
+
+        With the in-process engine the next chunk is synthesized while the current
+        one plays. Through play-tts.sh (which synthesizes and plays in one call)
+        chunks are spoken back to back against a pinned settings overlay.
+
+        Returns:
+            Result message
+        """
+        truncated = f"{text[:50]}..." if len(text) > 50 else text
+        if self._is_muted_sync():
+            return f"🔇 TTS muted, skipped: {truncated}"
+
+        voice_name = voice or self.settings.voice()
+        played: list[Path] = []
+        if self._engine_streams(voice_name, personality, language):
+            length_scale = self._speech_length_scale()
+            speaker_id = self._piper_speaker_id()
+            cache_settings = self._synthesis_settings(voice_name, None, None)
+
+            async def synthesize(chunk: str) -> Optional[Path]:
+                cache_key = make_key(chunk, **cache_settings) if cache_settings else None
+                cached = self.synthesis_cache.get(cache_key) if cache_key else None
+                if cached is not None:
+                    return cached
+                audio_file = self.settings.write_dir() / "audio" / f"tts-{time.time_ns()}.wav"
+                synthesized = await self._engine_synthesize(
+                    chunk, voice_name, audio_file, length_scale=length_scale, speaker_id=speaker_id
+                )
+                if not synthesized:
+                    return None
+                self._record_audio(audio_file, "piper")
+                if cache_key:
+                    self.synthesis_cache.put(cache_key, audio_file)
+                return audio_file
+
+            try:
+                played = await stream_chunks(chunks, synthesize, self._play_chunk)
+            except StreamError as e:
+                if self._is_muted_sync():
+                    return f"🔇 TTS muted after {len(e.played)}/{len(chunks)} chunks: {truncated}"
+                return f"❌ TTS failed: {e}"
+        else:
+            with self._settings_overlay(self._pinned_settings(personality, language)) as project_dir:
+                for index, chunk in enumerate(chunks):
+                    if self._is_muted_sync():
+                        return f"🔇 TTS muted after {index}/{len(chunks)} chunks: {truncated}"
+                    returncode, output, error = await self._run_play_tts(chunk, voice_name, project_dir)
+                    if returncode != 0:
+                        return f"❌ TTS failed at chunk {index + 1}/{len(chunks)}: {error or output}"
+                    for saved in self._saved_files(output):
+                        self._record_audio(saved, "play-tts")
+                        self._collect_played(saved)
+                        played.append(saved)
+
+        result = f"✅ Spoke: {truncated} (streamed in {len(chunks)} chunks)"
+        if played:
+            result += f"\n📁 Audio saved: {played[-1]}"
+        return result
+
+    async def _get_current_voice(self) -> str:
+        """Get the currently active voice"""
+        if not self.is_windows:
+            voice = self.settings.voice()
+            if voice:
+                return voice
+        # No saved voice (or Windows) - let the voice manager apply its defaults
+        result = await self._run_script(self.VOICE_MANAGER_SCRIPT, ["get"])
+        return result.strip() if result else "Unknown"
+
+    async def _get_personality(self) -> str:
+        """Get the current personality setting"""
+        return self.settings.personality()
+
+    async def _get_language(self) -> str:
+        """Get the current language setting"""
+        if not self.is_windows:
+            return self.settings.language_code()
+        result = await self._run_script(self.LANGUAGE_MANAGER_SCRIPT, ["code"])
+        return result.strip() if result else "english"
+
+    async def _get_provider(self) -> str:
+        """Get the active TTS provider"""
+        provider_labels = {
+            "macos": "macOS TTS",
+            "piper": "Piper TTS (Free, Offline)",
+            "termux-ssh": "Termux SSH (Android)",
+            "windows-piper": "Windows Piper TTS (Free, Offline)",
+            "windows-sapi": "Windows SAPI (Built-in)",
+            "soprano": "Soprano TTS (Ultra-fast Neural)",
+        }
+        # Default based on platform
+        provider = self.settings.provider("windows-sapi" if self.is_windows else "piper")
+        return provider_labels.get(provider, provider)
+
+
+def build_registry(server: AgentVibesServer) -> ToolRegistry:
+    """
+    Register every AgentVibes tool with its schema.
+
+    Args:
+        server: The AgentVibesServer whose methods handle the tools
+
+    Returns:
+        Registry used by list_tools() and call_tool()
+    """
+    try:
+        timeout = float(os.environ.get("AGENTVIBES_TOOL_TIMEOUT", "0"))
+    except ValueError:
+        timeout = 0.0
+    # Config writes and downloads are limited per call here; synthesis is limited
+    # inside the server, where play-tts/piper actually run (queued speech included)
+    registry = ToolRegistry(default_timeout=timeout or None, limiter=server.limiter)
+    # Outermost, so timeouts and limits count toward the recorded latency
+    registry.use(server.metrics.tool_middleware)
+
+    registry.add(
+        "text_to_speech",
+        server.enqueue_speech,
+        description="""Convert text to speech using AgentVibes TTS.
+
+Supports both macOS TTS and Piper (free, offline) providers.
+Can use different voices, personalities, and languages.
+
+Perfect for:
 - Speaking acknowledgments and confirmations
 - Adding voice to Claude responses
 - Multi-language communication
 - Personality-driven interactions
 
+Returns as soon as the speech is queued (with a job id); pass wait=true to block until
+it has played. Use priority="high" for completions so they interrupt low-priority chatter.
+
 Examples:
 - text_to_speech(text="Hello, I'm ready to help!")
 - text_to_speech(text="Task completed!", personality="flirty")
 - text_to_speech(text="Hola, ¿cómo estás?", language="spanish")
 """,
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {
-                        "type": "string",
-                        "description": "Text to convert to speech (max 500 characters)",
-                    },
-                    "voice": {
-                        "type": "string",
-                        "description": "Voice name (optional). Use list_voices to see options.",
-                    },
-                    "personality": {
-                        "type": "string",
-                        "description": "Personality style (optional). Examples: flirty, sarcastic, pirate, robot, zen",
-                    },
-                    "language": {
-                        "type": "string",
-                        "description": "Language to speak in (optional). Examples: spanish, french, german, italian",
-                    },
-                },
-                "required": ["text"],
+        properties={
+            "text": {
+                "type": "string",
+                "description": "Text to convert to speech (max 500 characters)",
             },
-        ),
-        Tool(
-            name="list_voices",
-            description="List all available TTS voices with current selection",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="set_voice",
-            description="Switch to a different TTS voice",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "voice_name": {
-                        "type": "string",
-                        "description": "Name of the voice to switch to",
-                    }
-                },
-                "required": ["voice_name"],
+            "voice": {
+                "type": "string",
+                "description": "Voice name (optional). Use list_voices to see options.",
             },
-        ),
-        Tool(
-            name="list_personalities",
-            description="List all available personality styles with descriptions",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="set_personality",
-            description="Set the personality style for TTS messages",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "personality": {
-                        "type": "string",
-                        "description": "Personality name (e.g., flirty, sarcastic, pirate)",
-                    }
-                },
-                "required": ["personality"],
+            "personality": {
+                "type": "string",
+                "description": "Personality style (optional). Examples: flirty, sarcastic, pirate, robot, zen",
             },
-        ),
-        Tool(
-            name="set_language",
-            description="Set the language for TTS speech (supports 25+ languages)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "language": {
-                        "type": "string",
-                        "description": "Language name (e.g., spanish, french, german)",
-                    }
-                },
-                "required": ["language"],
+            "language": {
+                "type": "string",
+                "description": "Language to speak in (optional). Examples: spanish, french, german, italian",
             },
-        ),
-        Tool(
-            name="get_config",
-            description="Get current voice, personality, language, and provider configuration",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="replay_audio",
-            description="Replay recently generated TTS audio",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "n": {
-                        "type": "integer",
-                        "description": "Which audio to replay (1 = most recent, default: 1)",
-                        "minimum": 1,
-                        "maximum": 10,
-                    }
-                },
+            "stream": {
+                "type": "boolean",
+                "description": "Speak sentence by sentence so audio starts sooner (optional, default: automatic for long text with the in-process Piper engine)",
             },
-        ),
-        Tool(
-            name="set_provider",
-            description="Switch between TTS providers" + (
-                ": Windows Piper, Windows SAPI, or Soprano" if agent_vibes.is_windows
-                else ": macOS TTS, Piper (free, offline), Soprano, or Termux SSH (Android)"
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "provider": {
-                        "type": "string",
-                        "description": (
-                            "Provider name: 'windows-piper', 'windows-sapi', or 'soprano'"
-                            if agent_vibes.is_windows
-                            else "Provider name: 'piper', 'macos', 'soprano', or 'termux-ssh'"
-                        ),
-                        "enum": (
-                            ["windows-piper", "windows-sapi", "soprano"]
-                            if agent_vibes.is_windows
-                            else ["piper", "macos", "soprano", "termux-ssh"]
-                        ),
-                    }
-                },
-                "required": ["provider"],
+            "priority": {
+                "type": "string",
+                "enum": ["high", "normal", "low"],
+                "description": "Queue priority (default: normal). High stops low-priority speech that is playing.",
             },
-        ),
-        Tool(
-            name="set_learn_mode",
-            description="Enable or disable language learning mode. When ON, TTS speaks in both your main language and target language for bilingual learning.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "enabled": {
-                        "type": "boolean",
-                        "description": "True to enable learning mode, False to disable"
-                    }
-                },
-                "required": ["enabled"],
+            "wait": {
+                "type": "boolean",
+                "description": "Wait until the speech has played before returning (default: False)",
             },
-        ),
-        Tool(
-            name="set_speed",
-            description="Set speech speed for main or target voice. Works with both Piper and macOS providers. Use this to make voices faster or slower.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "speed": {
-                        "type": "string",
-                        "description": "Speed value: '0.5x' or 'slow/slower' (half speed, slower), '1x' or 'normal' (normal speed), '2x' or 'fast' (double speed, faster), '3x' or 'faster' (triple speed, very fast)"
+            "agent": {
+                "type": "string",
+                "description": "Speaking agent id or display name (optional). Without a voice, the agent's voice from the BMAD voice map is used. Near-simultaneous messages from one agent are merged, duplicates dropped.",
+            },
+        },
+        required=("text",),
+    )
+    registry.add(
+        "text_to_speech_batch",
+        server.text_to_speech_batch,
+        description="""Speak several agents' lines with one call (BMAD party mode).
+
+Lines that share a voice are synthesized together, voice groups in parallel, and
+playback follows the order of items. The batch is one speech job: returns its job id
+right away unless wait=true.""",
+        properties={
+            "items": {
+                "type": "array",
+                "description": "Lines in speaking order",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string", "description": "Text to speak"},
+                        "agent": {"type": "string", "description": "Speaking agent id (optional, picks its mapped voice)"},
+                        "voice": {"type": "string", "description": "Voice name (optional)"},
+                        "personality": {"type": "string", "description": "Personality style (optional)"},
+                        "language": {"type": "string", "description": "Language to speak in (optional)"},
                     },
-                    "target": {
-                        "type": "boolean",
-                        "description": "If true, sets target language speed (for learning mode); if false or omitted, sets main voice speed",
-                        "default": False
-                    }
+                    "required": ["text"],
                 },
-                "required": ["speed"],
+                "maxItems": AgentVibesServer.MAX_BATCH_ITEMS,
             },
-        ),
-        Tool(
-            name="get_speed",
-            description="Get current speech speed settings for main and target voices",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="download_extra_voices",
-            description="Download extra high-quality custom Piper voices from HuggingFace. Includes: Kristin (US female), Jenny (UK female with Irish accent), and Tracy/16Speakers (multi-speaker). Perfect for adding variety to your TTS voices.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "auto_yes": {
-                        "type": "boolean",
-                        "description": "Skip confirmation prompt and download automatically (default: False)",
-                        "default": False
-                    }
-                },
+            "priority": {
+                "type": "string",
+                "enum": ["high", "normal", "low"],
+                "description": "Queue priority of the whole batch (default: normal)",
             },
+            "wait": {
+                "type": "boolean",
+                "description": "Wait until every line has played and return per-line results (default: False)",
+            },
+        },
+        required=("items",),
+    )
+    registry.add(
+        "get_voice_map",
+        server.get_voice_map,
+        description="Show the BMAD agent voice map (agent-voice-map.csv): each agent's voice for the active provider, personality and intro, plus rows that failed validation. text_to_speech uses it when an agent is given without a voice.",
+        properties={
+            "agent": {
+                "type": "string",
+                "description": "Agent id or display name to look up (optional, default: whole map)",
+            }
+        },
+    )
+    registry.add(
+        "list_voices",
+        server.list_voices,
+        description="List available TTS voices with current selection. For Piper, shows language, quality, sample rate and speaker count, and can search by name (prefix or fuzzy) and language.",
+        properties={
+            "query": {
+                "type": "string",
+                "description": "Only voices matching this name: prefix, part or close spelling (optional)",
+            },
+            "language": {
+                "type": "string",
+                "description": "Only voices in this language, e.g. en_GB, de, french (optional, Piper)",
+            },
+        },
+    )
+    registry.add(
+        "set_voice",
+        server.set_voice,
+        description="Switch to a different TTS voice. For Piper, the name is checked against installed voices; a unique partial name (e.g. 'lessac') is completed, otherwise close matches are suggested.",
+        properties={
+            "voice_name": {
+                "type": "string",
+                "description": "Name of the voice to switch to",
+            }
+        },
+        required=("voice_name",),
+        category="config_write",
+    )
+    registry.add(
+        "list_personalities",
+        server.list_personalities,
+        description="List all available personality styles with descriptions",
+    )
+    registry.add(
+        "set_personality",
+        server.set_personality,
+        description="Set the personality style for TTS messages",
+        properties={
+            "personality": {
+                "type": "string",
+                "description": "Personality name (e.g., flirty, sarcastic, pirate)",
+            }
+        },
+        required=("personality",),
+        category="config_write",
+    )
+    registry.add(
+        "set_language",
+        server.set_language,
+        description="Set the language for TTS speech (supports 25+ languages)",
+        properties={
+            "language": {
+                "type": "string",
+                "description": "Language name (e.g., spanish, french, german)",
+            }
+        },
+        required=("language",),
+        category="config_write",
+    )
+    registry.add(
+        "get_config",
+        server.get_config,
+        description="Get current voice, personality, language, and provider configuration",
+    )
+    registry.add(
+        "replay_audio",
+        server.replay_audio,
+        description="Replay recently generated TTS audio: the Nth most recent, the Nth by one agent, or the latest matching some text",
+        properties={
+            "n": {
+                "type": "integer",
+                "description": "Which audio to replay (1 = most recent, default: 1)",
+                "minimum": 1,
+                "maximum": 500,
+            },
+            "agent": {
+                "type": "string",
+                "description": "Only replay audio spoken by this agent (e.g. BMAD agent id)",
+            },
+            "text": {
+                "type": "string",
+                "description": "Replay audio whose text matches (exact text, or containing all these words)",
+            },
+        },
+    )
+    registry.add(
+        "set_provider",
+        server.set_provider,
+        description="Switch between TTS providers" + (
+            ": Windows Piper, Windows SAPI, or Soprano" if server.is_windows
+            else ": macOS TTS, Piper (free, offline), Soprano, or Termux SSH (Android)"
         ),
-        Tool(
-            name="get_verbosity",
-            description="Get current AgentVibes verbosity level (low/medium/high). Verbosity controls how much Claude speaks while working - from minimal (acknowledgments only) to maximum transparency (all reasoning spoken).",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="set_verbosity",
-            description="""Set AgentVibes verbosity level to control how much Claude speaks while working.
+        properties={
+            "provider": {
+                "type": "string",
+                "description": (
+                    "Provider name: 'windows-piper', 'windows-sapi', or 'soprano'"
+                    if server.is_windows
+                    else "Provider name: 'piper', 'macos', 'soprano', or 'termux-ssh'"
+                ),
+                "enum": (
+                    ["windows-piper", "windows-sapi", "soprano"]
+                    if server.is_windows
+                    else ["piper", "macos", "soprano", "termux-ssh"]
+                ),
+            }
+        },
+        required=("provider",),
+        category="config_write",
+    )
+    registry.add(
+        "set_learn_mode",
+        server.set_learn_mode,
+        description="Enable or disable language learning mode. When ON, TTS speaks in both your main language and target language for bilingual learning. The target version is translated and rendered while the main version plays; translations are cached.",
+        properties={
+            "enabled": {
+                "type": "boolean",
+                "description": "True to enable learning mode, False to disable"
+            }
+        },
+        required=("enabled",),
+        category="config_write",
+    )
+    registry.add(
+        "set_speed",
+        server.set_speed,
+        description="Set speech speed for main or target voice. Works with both Piper and macOS providers. Use this to make voices faster or slower.",
+        properties={
+            "speed": {
+                "type": "string",
+                "description": "Speed value: '0.5x' or 'slow/slower' (half speed, slower), '1x' or 'normal' (normal speed), '2x' or 'fast' (double speed, faster), '3x' or 'faster' (triple speed, very fast)"
+            },
+            "target": {
+                "type": "boolean",
+                "description": "If true, sets target language speed (for learning mode); if false or omitted, sets main voice speed",
+                "default": False
+            }
+        },
+        required=("speed",),
+        # config_write is taken inside set_speed, around the write but not the demo
+    )
+    registry.add(
+        "get_speed",
+        server.get_speed,
+        description="Get current speech speed settings for main and target voices",
+    )
+    registry.add(
+        "download_extra_voices",
+        server.download_extra_voices,
+        description="Download extra high-quality custom Piper voices from HuggingFace. Includes: Kristin (US female), Jenny (UK female with Irish accent), and Tracy/16Speakers (multi-speaker). Perfect for adding variety to your TTS voices. Files download in parallel in the background and resume after interruptions; files with a published SHA-256 are checksum-verified. Follow progress with get_download_status.",
+        properties={
+            "auto_yes": {
+                "type": "boolean",
+                "description": "Kept for compatibility; downloads never prompt (default: False)",
+                "default": False
+            },
+            "voices": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(EXTRA_VOICES)},
+                "description": "Voices to download (default: all)",
+            },
+            "wait": {
+                "type": "boolean",
+                "description": "Wait until the downloads finish and return the summary (default: False)",
+                "default": False
+            },
+        },
+    )
+    registry.add(
+        "get_download_status",
+        server.get_download_status,
+        description="Show progress of voice downloads started by download_extra_voices: per-file status, bytes received, resumed files and checksum verification",
+        properties={
+            "batch_id": {
+                "type": "integer",
+                "description": "Download batch to report (optional, default: the most recent)",
+            }
+        },
+    )
+    registry.add(
+        "get_verbosity",
+        server.get_verbosity,
+        description="Get current AgentVibes verbosity level (low/medium/high). Verbosity controls how much Claude speaks while working - from minimal (acknowledgments only) to maximum transparency (all reasoning spoken).",
+    )
+    registry.add(
+        "set_verbosity",
+        server.set_verbosity,
+        description="""Set AgentVibes verbosity level to control how much Claude speaks while working.
 
 Verbosity Levels:
 - LOW: Only acknowledgments (start) and completions (end). Minimal interruption.
@@ -1102,41 +3216,42 @@ Perfect for:
 - HIGH: Full transparency, learning mode, debugging complex tasks
 
 Note: Changes take effect on next Claude Code session restart.""",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "level": {
-                        "type": "string",
-                        "description": "Verbosity level to set",
-                        "enum": ["low", "medium", "high"]
-                    }
-                },
-                "required": ["level"],
-            },
-        ),
-        Tool(
-            name="mute",
-            description="Mute all AgentVibes TTS output. Creates a persistent mute flag that silences all voice output until unmuted. Persists across sessions.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="unmute",
-            description="Unmute AgentVibes TTS output. Removes the mute flag and restores voice output.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="is_muted",
-            description="Check if TTS is currently muted.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="list_background_music",
-            description="List all available pre-packaged background music tracks. Shows all audio files that can be used as background music for TTS.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="set_background_music",
-            description="""Set background music track for a specific agent, all agents, or as default. Supports smart fuzzy matching.
+        properties={
+            "level": {
+                "type": "string",
+                "description": "Verbosity level to set",
+                "enum": ["low", "medium", "high"]
+            }
+        },
+        required=("level",),
+        category="config_write",
+    )
+    registry.add(
+        "mute",
+        server.mute,
+        description="Mute all AgentVibes TTS output. Creates a persistent mute flag that silences all voice output until unmuted. Persists across sessions.",
+        category="config_write",
+    )
+    registry.add(
+        "unmute",
+        server.unmute,
+        description="Unmute AgentVibes TTS output. Removes the mute flag and restores voice output.",
+        category="config_write",
+    )
+    registry.add(
+        "is_muted",
+        server.is_muted,
+        description="Check if TTS is currently muted.",
+    )
+    registry.add(
+        "list_background_music",
+        server.list_background_music,
+        description="List all available pre-packaged background music tracks. Shows all audio files that can be used as background music for TTS.",
+    )
+    registry.add(
+        "set_background_music",
+        server.set_background_music,
+        description="""Set background music track for a specific agent, all agents, or as default. Supports smart fuzzy matching.
 
 Perfect for:
 - "change background music to flamenco" - Sets for all agents
@@ -1147,60 +3262,58 @@ Fuzzy matching examples:
 - "flamenco" matches "agentvibes_soft_flamenco_loop.mp3"
 - "celtic" matches "agent_vibes_celtic_harp_v1_loop.mp3"
 - "bossa" matches "agent_vibes_bossa_nova_v2_loop.mp3"
+- "celtik" (typo) still matches the celtic harp track; unclear names list the closest tracks
 """,
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "track_name": {
-                        "type": "string",
-                        "description": "Track filename or partial name for fuzzy matching (e.g., 'celtic', 'flamenco', 'bossa nova')",
-                    },
-                    "agent_name": {
-                        "type": "string",
-                        "description": "Agent name to configure (optional). Use 'all' for all agents, omit for default",
-                    },
-                },
-                "required": ["track_name"],
+        properties={
+            "track_name": {
+                "type": "string",
+                "description": "Track filename or partial name for fuzzy matching (e.g., 'celtic', 'flamenco', 'bossa nova')",
             },
-        ),
-        Tool(
-            name="enable_background_music",
-            description="Enable or disable background music globally. When enabled, TTS audio will be mixed with background music at configured volume (default 30%).",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "enabled": {
-                        "type": "boolean",
-                        "description": "True to enable background music, False to disable",
-                    }
-                },
-                "required": ["enabled"],
+            "agent_name": {
+                "type": "string",
+                "description": "Agent name to configure (optional). Use 'all' for all agents, omit for default",
             },
-        ),
-        Tool(
-            name="set_background_music_volume",
-            description="Set the volume level for background music (0.0-1.0). Recommended: 0.20-0.40 for subtle background ambiance.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "volume": {
-                        "type": "number",
-                        "description": "Volume level (0.0 = silent, 0.30 = default, 1.0 = full volume)",
-                        "minimum": 0.0,
-                        "maximum": 1.0,
-                    }
-                },
-                "required": ["volume"],
-            },
-        ),
-        Tool(
-            name="get_background_music_status",
-            description="Get current background music configuration including enabled status, volume, default track, and number of available tracks.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="set_reverb",
-            description="""Set reverb level for TTS audio. Can apply globally (default agent), to a specific agent, or to all agents.
+        },
+        required=("track_name",),
+        category="config_write",
+    )
+    registry.add(
+        "enable_background_music",
+        server.enable_background_music,
+        description="Enable or disable background music globally. When enabled, TTS audio will be mixed with background music at configured volume (default 30%).",
+        properties={
+            "enabled": {
+                "type": "boolean",
+                "description": "True to enable background music, False to disable",
+            }
+        },
+        required=("enabled",),
+        category="config_write",
+    )
+    registry.add(
+        "set_background_music_volume",
+        server.set_background_music_volume,
+        description="Set the volume level for background music (0.0-1.0). Recommended: 0.20-0.40 for subtle background ambiance.",
+        properties={
+            "volume": {
+                "type": "number",
+                "description": "Volume level (0.0 = silent, 0.30 = default, 1.0 = full volume)",
+                "minimum": 0.0,
+                "maximum": 1.0,
+            }
+        },
+        required=("volume",),
+        category="config_write",
+    )
+    registry.add(
+        "get_background_music_status",
+        server.get_background_music_status,
+        description="Get current background music configuration including enabled status, volume, default track, and number of available tracks.",
+    )
+    registry.add(
+        "set_reverb",
+        server.set_reverb,
+        description="""Set reverb level for TTS audio. Can apply globally (default agent), to a specific agent, or to all agents.
 
 Reverb adds room/space ambiance to the voice, making it sound like it's in a small room, conference room, or large hall.
 
@@ -1210,129 +3323,129 @@ Examples:
 - set_reverb(level="light", apply_all=True) - Set light reverb for all agents
 - set_reverb(level="off") - Turn off reverb for default agent
 """,
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "level": {
-                        "type": "string",
-                        "description": "Reverb level",
-                        "enum": ["off", "light", "medium", "heavy", "cathedral"]
-                    },
-                    "agent": {
-                        "type": "string",
-                        "description": "Agent name (optional, defaults to 'default'). Examples: Winston, John, Mary, Amelia",
-                    },
-                    "apply_all": {
-                        "type": "boolean",
-                        "description": "Apply to all agents (optional, default: false)",
-                    }
-                },
-                "required": ["level"],
+        properties={
+            "level": {
+                "type": "string",
+                "description": "Reverb level",
+                "enum": ["off", "light", "medium", "heavy", "cathedral"]
             },
-        ),
-        Tool(
-            name="get_reverb",
-            description="Get current reverb level for a specific agent or default",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "agent": {
-                        "type": "string",
-                        "description": "Agent name (optional, defaults to 'default')",
-                    }
-                },
+            "agent": {
+                "type": "string",
+                "description": "Agent name (optional, defaults to 'default'). Examples: Winston, John, Mary, Amelia",
             },
-        ),
-        Tool(
-            name="list_audio_effects",
-            description="List current audio effects configuration for all agents, including reverb levels and other effects",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="clean_audio_cache",
-            description="Clean all TTS audio cache files and report space freed. Non-interactive cleanup that removes all wav/mp3/aiff files while preserving background music tracks.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-    ]
+            "apply_all": {
+                "type": "boolean",
+                "description": "Apply to all agents (optional, default: false)",
+            }
+        },
+        required=("level",),
+        category="config_write",
+    )
+    registry.add(
+        "get_reverb",
+        server.get_reverb,
+        description="Get current reverb level for a specific agent or default",
+        properties={
+            "agent": {
+                "type": "string",
+                "description": "Agent name (optional, defaults to 'default')",
+            }
+        },
+    )
+    registry.add(
+        "list_audio_effects",
+        server.list_audio_effects,
+        description="List current audio effects configuration for all agents, including reverb levels and other effects",
+    )
+    registry.add(
+        "clean_audio_cache",
+        server.clean_audio_cache,
+        description="Clean all TTS audio cache files and report space freed. Non-interactive cleanup that removes all wav/mp3/aiff files while preserving background music tracks. Use stats_only to see synthesis cache hit rate and size, and the files and bytes reclaimed by background auto-eviction, without deleting anything.",
+        properties={
+            "stats_only": {
+                "type": "boolean",
+                "description": "Only report cache statistics and auto-eviction totals (default: False)",
+                "default": False
+            }
+        },
+    )
+    registry.add(
+        "get_speech_status",
+        server.get_speech_status,
+        description="Show queued and playing speech, or the status and result of one speech job",
+        properties={
+            "job_id": {
+                "type": "integer",
+                "description": "Job id returned by text_to_speech (optional, default: whole queue)",
+            }
+        },
+    )
+    registry.add(
+        "cancel_speech",
+        server.cancel_speech,
+        description="Cancel a queued speech job, or stop the speech that is playing",
+        properties={
+            "job_id": {
+                "type": "integer",
+                "description": "Job id to cancel (optional, default: the speech playing now)",
+            }
+        },
+    )
+    registry.add(
+        "flush_speech_queue",
+        server.flush_speech_queue,
+        description="Drop all speech waiting in the queue",
+        properties={
+            "include_current": {
+                "type": "boolean",
+                "description": "Also stop the speech playing now (default: False)",
+                "default": False
+            }
+        },
+    )
+    registry.add(
+        "get_metrics",
+        server.get_metrics,
+        description="Show per-tool latency (p50/p95), script runs and exit codes, synthesis and playback time, and audio bytes produced since the server started.",
+        properties={
+            "format": {
+                "type": "string",
+                "enum": ["text", "json", "prometheus"],
+                "description": "Output format (default: text)",
+                "default": "text"
+            }
+        },
+    )
+    return registry
+
+
+# Create the MCP server
+app = Server("agentvibes")
+_init_started = time.perf_counter()
+agent_vibes = AgentVibesServer()
+registry = build_registry(agent_vibes)
+agent_vibes.record_startup("import", _init_started - _MODULE_STARTED)
+agent_vibes.record_startup("init", time.perf_counter() - _init_started)
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List all available AgentVibes tools"""
+    if "first_list_tools" not in agent_vibes.startup_timings:
+        agent_vibes.record_startup("first_list_tools", time.perf_counter() - _MODULE_STARTED)
+    return registry.list_tools()
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls"""
     try:
-        if name == "text_to_speech":
-            result = await agent_vibes.text_to_speech(
-                text=arguments["text"],
-                voice=arguments.get("voice"),
-                personality=arguments.get("personality"),
-                language=arguments.get("language"),
-            )
-        elif name == "list_voices":
-            result = await agent_vibes.list_voices()
-        elif name == "set_voice":
-            result = await agent_vibes.set_voice(arguments["voice_name"])
-        elif name == "list_personalities":
-            result = await agent_vibes.list_personalities()
-        elif name == "set_personality":
-            result = await agent_vibes.set_personality(arguments["personality"])
-        elif name == "set_language":
-            result = await agent_vibes.set_language(arguments["language"])
-        elif name == "get_config":
-            result = await agent_vibes.get_config()
-        elif name == "replay_audio":
-            n = arguments.get("n", 1)
-            result = await agent_vibes.replay_audio(n)
-        elif name == "set_provider":
-            result = await agent_vibes.set_provider(arguments["provider"])
-        elif name == "set_learn_mode":
-            result = await agent_vibes.set_learn_mode(arguments["enabled"])
-        elif name == "set_speed":
-            target = arguments.get("target", False)
-            result = await agent_vibes.set_speed(arguments["speed"], target)
-        elif name == "get_speed":
-            result = await agent_vibes.get_speed()
-        elif name == "download_extra_voices":
-            auto_yes = arguments.get("auto_yes", False)
-            result = await agent_vibes.download_extra_voices(auto_yes)
-        elif name == "get_verbosity":
-            result = await agent_vibes.get_verbosity()
-        elif name == "set_verbosity":
-            result = await agent_vibes.set_verbosity(arguments["level"])
-        elif name == "mute":
-            result = await agent_vibes.mute()
-        elif name == "unmute":
-            result = await agent_vibes.unmute()
-        elif name == "is_muted":
-            result = await agent_vibes.is_muted()
-        elif name == "list_background_music":
-            result = await agent_vibes.list_background_music()
-        elif name == "set_background_music":
-            track_name = arguments.get("track_name")
-            agent_name = arguments.get("agent_name")
-            result = await agent_vibes.set_background_music(track_name, agent_name)
-        elif name == "enable_background_music":
-            enabled = arguments.get("enabled")
-            result = await agent_vibes.enable_background_music(enabled)
-        elif name == "set_background_music_volume":
-            volume = arguments.get("volume")
-            result = await agent_vibes.set_background_music_volume(volume)
-        elif name == "get_background_music_status":
-            result = await agent_vibes.get_background_music_status()
-        elif name == "set_reverb":
-            level = arguments["level"]
-            agent = arguments.get("agent", "default")
-            apply_all = arguments.get("apply_all", False)
-            result = await agent_vibes.set_reverb(level, agent, apply_all)
-        elif name == "get_reverb":
-            agent = arguments.get("agent", "default")
-            result = await agent_vibes.get_reverb(agent)
-        elif name == "list_audio_effects":
-            result = await agent_vibes.list_audio_effects()
-        elif name == "clean_audio_cache":
-            result = await agent_vibes.clean_audio_cache()
-        else:
-            result = f"Unknown tool: {name}"
-
+        # Remember the session so config changes can be pushed to the client
+        agent_vibes.notify_session = app.request_context.session
+    except LookupError:
+        pass
+    try:
+        result = await registry.call(name, arguments)
         return [TextContent(type="text", text=result)]
 
     except Exception as e:
@@ -1341,12 +3454,21 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
 async def main():
     """Run the MCP server"""
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options(),
-        )
+    agent_vibes.start_config_watcher()
+    agent_vibes.start_metrics_dump()
+    agent_vibes.start_audio_eviction()
+    # Heavy discovery runs in the background; initialize/list_tools answer right away
+    if not agent_vibes.start_warmup():
+        agent_vibes.refresh_phrase_bank()
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options(),
+            )
+    finally:
+        await agent_vibes.shutdown()
 
 
 if __name__ == "__main__":
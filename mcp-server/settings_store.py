@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/settings_store.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Native Python reader for the AgentVibes settings files under .claude/
+@context Read-only getters used to spawn voice-manager.sh / speed-manager.sh / ... just to cat a text file
+@architecture Same precedence as the hooks: project .claude/ (CLAUDE_PROJECT_DIR) > package .claude/ > ~/.claude/
+@dependencies .claude/tts-*.txt, .claude/config/*.txt, .claude/config/audio-effects.cfg
+@entrypoints AgentVibesServer getters (get_config, get_speed, get_verbosity, get_reverb, list_voices)
+@patterns Fail-soft reads with defaults, file formats owned by the bash managers (read-only here),
+          optional in-memory snapshot invalidated by config_watch.ConfigWatcher
+@related mcp-server/server.py, mcp-server/config_watch.py, .claude/hooks/*-manager.sh, docs/how-hooks-work.md
+"""
+
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+CLAUDE_DIR_NAME = ".claude"
+
+DEFAULT_PIPER_VOICES_DIR = Path.home() / ".local" / "share" / "piper" / "voices"
+
+# SoX effect strings written by effects-manager.sh set-reverb
+REVERB_PRESETS = {
+    "off": "",
+    "light": "reverb 20 50 50",
+    "medium": "reverb 40 50 70",
+    "heavy": "reverb 70 50 100",
+    "cathedral": "reverb 90 30 100",
+}
+
+# Language name -> ISO 639-1 code, as printed by language-manager.sh code
+LANGUAGE_CODES = {
+    "english": "en",
+    "spanish": "es",
+    "french": "fr",
+    "german": "de",
+    "italian": "it",
+    "portuguese": "pt",
+    "chinese": "zh",
+    "japanese": "ja",
+    "korean": "ko",
+    "polish": "pl",
+    "dutch": "nl",
+    "turkish": "tr",
+    "russian": "ru",
+    "arabic": "ar",
+    "hindi": "hi",
+    "swedish": "sv",
+    "danish": "da",
+    "norwegian": "no",
+    "finnish": "fi",
+    "czech": "cs",
+    "romanian": "ro",
+    "ukrainian": "uk",
+    "greek": "el",
+    "bulgarian": "bg",
+    "croatian": "hr",
+    "slovak": "sk",
+}
+
+# Every settings file read through this store (watched for snapshot invalidation)
+SETTINGS_FILES = (
+    "tts-provider.txt",
+    "tts-voice.txt",
+    "tts-personality.txt",
+    "tts-language.txt",
+    "tts-verbosity.txt",
+    "tts-learn-mode.txt",
+    "tts-translate-to.txt",
+    "tts-target-language.txt",
+    "tts-target-voice.txt",
+    "tts-piper-speaker-id.txt",
+    "piper-voices-dir.txt",
+    "config/tts-speech-rate.txt",
+    "config/tts-target-speech-rate.txt",
+    "config/background-music-enabled.txt",
+    "config/background-music.txt",
+    "config/background-music-volume.txt",
+    "config/audio-effects.cfg",
+    "config/phrase-bank.txt",
+)
+
+
+class SettingsStore:
+    """Reads AgentVibes settings files with hook-compatible precedence"""
+
+    def __init__(self, package_claude_dir: Path, agentvibes_root: Path):
+        """
+        Args:
+            package_claude_dir: The package's own .claude/ (where the hooks live)
+            agentvibes_root: Package root; a cwd equal to it is not treated as a project
+        """
+        self.package_claude_dir = package_claude_dir
+        self.agentvibes_root = agentvibes_root
+        # (cwd, key) -> value; None while no watcher keeps it fresh
+        self._snapshot: Optional[dict] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def enable_snapshot(self) -> None:
+        """Keep reads in memory; the caller must invalidate() whenever files change"""
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = {}
+
+    def disable_snapshot(self) -> None:
+        """Go back to reading files on every call"""
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def invalidate(self) -> None:
+        """Drop the in-memory snapshot (safe to call from any thread)"""
+        with self._lock:
+            self._generation += 1
+            if self._snapshot is not None:
+                self._snapshot.clear()
+
+    def memo(self, name: str, compute: Callable[[], object]) -> object:
+        """
+        Return a value derived from settings files, computed once per snapshot.
+
+        Args:
+            name: Snapshot key (e.g. "muted")
+            compute: Reads the files; called again after each invalidate()
+        """
+        with self._lock:
+            if self._snapshot is None:
+                snapshot_key = None
+            else:
+                # The project directory (and so precedence) follows the cwd
+                snapshot_key = (str(Path.cwd()), name)
+                if snapshot_key in self._snapshot:
+                    return self._snapshot[snapshot_key]
+            generation = self._generation
+        value = compute()
+        if snapshot_key is not None:
+            with self._lock:
+                # Don't store a value read before a concurrent invalidation
+                if self._snapshot is not None and generation == self._generation:
+                    self._snapshot[snapshot_key] = value
+        return value
+
+    def watched_files(self) -> list[Path]:
+        """Get every file whose change must invalidate the snapshot"""
+        files = []
+        for settings_dir in self.dirs() + [Path.cwd() / CLAUDE_DIR_NAME]:
+            files.extend(settings_dir / name for name in SETTINGS_FILES)
+        return files
+
+    def project_dir(self) -> Optional[Path]:
+        """Get the project directory the hooks would receive as CLAUDE_PROJECT_DIR"""
+        cwd = Path.cwd()
+        if (cwd / CLAUDE_DIR_NAME).is_dir() and cwd != self.agentvibes_root:
+            return cwd
+        return None
+
+    def dirs(self) -> list[Path]:
+        """Get .claude directories to read settings from, highest precedence first"""
+        dirs = []
+        project = self.project_dir()
+        if project is not None:
+            dirs.append(project / CLAUDE_DIR_NAME)
+        for candidate in (self.package_claude_dir, Path.home() / CLAUDE_DIR_NAME):
+            if candidate not in dirs:
+                dirs.append(candidate)
+        return dirs
+
+    def write_dir(self) -> Path:
+        """Get the .claude directory the hook scripts write state to"""
+        project = self.project_dir()
+        if project is not None:
+            return project / CLAUDE_DIR_NAME
+        return Path.home() / CLAUDE_DIR_NAME
+
+    def path(self, relative_path: str) -> Optional[Path]:
+        """Get the highest-precedence existing settings file, or None"""
+        for settings_dir in self.dirs():
+            setting_file = settings_dir / relative_path
+            if setting_file.is_file():
+                return setting_file
+        return None
+
+    def read(self, relative_path: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Read a small settings file (e.g. "tts-voice.txt", "config/tts-speech-rate.txt").
+
+        Returns:
+            Stripped file contents from the highest-precedence directory, or default
+        """
+        value = self.memo(relative_path, lambda: self._read_files(relative_path))
+        return default if value is None else value
+
+    def _read_files(self, relative_path: str) -> Optional[str]:
+        for settings_dir in self.dirs():
+            setting_file = settings_dir / relative_path
+            try:
+                if setting_file.is_file():
+                    # utf-8-sig strips the BOM PowerShell's Set-Content may add
+                    return setting_file.read_text(encoding="utf-8-sig").strip()
+            except (PermissionError, UnicodeDecodeError, OSError) as e:
+                print(f"Warning: Could not read {setting_file}: {e}", file=sys.stderr)
+        return None
+
+    # Typed getters -----------------------------------------------------------
+
+    def provider(self, default: str = "piper") -> str:
+        """Get the raw provider id (e.g. "piper", "macos")"""
+        return self.read("tts-provider.txt") or default
+
+    def voice(self) -> Optional[str]:
+        """Get the saved voice name"""
+        return self.read("tts-voice.txt") or None
+
+    def personality(self) -> str:
+        """Get the saved personality"""
+        return self.read("tts-personality.txt") or "normal"
+
+    def language(self) -> str:
+        """Get the saved language"""
+        return self.read("tts-language.txt") or "english"
+
+    def language_code(self) -> str:
+        """Get the saved language as an ISO code (unknown names fall back to "en")"""
+        name = self.language().lower()
+        if name in LANGUAGE_CODES.values():
+            return name
+        return LANGUAGE_CODES.get(name, "en")
+
+    def verbosity(self) -> str:
+        """Get the verbosity level (low/medium/high)"""
+        return (self.read("tts-verbosity.txt") or "low").lower()
+
+    def speed(self, target: bool = False) -> Optional[float]:
+        """Get the main (or target language) speed multiplier, None if unset"""
+        name = "tts-target-speech-rate.txt" if target else "tts-speech-rate.txt"
+        try:
+            value = float(self.read(f"config/{name}", ""))
+        except ValueError:
+            return None
+        return value if value > 0 else None
+
+    def effects(self, agent: str = "default") -> tuple[str, str, str]:
+        """
+        Get an agent's audio-effects.cfg entry, falling back to the default agent.
+
+        Returns:
+            (sox effects, background file, background volume)
+        """
+        entries = {}
+        for line in (self.read("config/audio-effects.cfg") or "").splitlines():
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            fields = (line.split("|") + ["", "", ""])[:4]
+            entries[fields[0].strip()] = (fields[1].strip(), fields[2].strip(), fields[3].strip())
+        return entries.get(agent) or entries.get("default") or ("", "", "")
+
+    def reverb_level(self, agent: str = "default") -> str:
+        """Get the reverb preset name for an agent (nearest preset for custom values)"""
+        effects = self.effects(agent)[0].split()
+        if "reverb" not in effects:
+            return "off"
+        index = effects.index("reverb")
+        params = effects[index + 1:index + 4]
+        current = " ".join(["reverb"] + params)
+        for name, preset in REVERB_PRESETS.items():
+            if preset == current:
+                return name
+        try:
+            reverberance = float(params[0])
+        except (IndexError, ValueError):
+            return "custom"
+        return min(
+            (name for name in REVERB_PRESETS if name != "off"),
+            key=lambda name: abs(float(REVERB_PRESETS[name].split()[1]) - reverberance),
+        )
+
+    def background_music_enabled(self) -> bool:
+        """Check the background music on/off flag"""
+        return (self.read("config/background-music-enabled.txt") or "false").lower() == "true"
+
+    def learn_mode_enabled(self) -> bool:
+        """Check whether language learning mode is on"""
+        return (self.read("tts-learn-mode.txt") or "OFF").upper() == "ON"
+
+    def translate_to(self) -> Optional[str]:
+        """Get the translation target language, None when translation is off"""
+        value = (self.read("tts-translate-to.txt") or "off").lower()
+        return None if value in ("", "off") else value
+
+    def target_language(self) -> Optional[str]:
+        """Get the learning mode target language (e.g. "spanish"), None if unset"""
+        return self.read("tts-target-language.txt") or None
+
+    def target_voice(self) -> Optional[str]:
+        """Get the voice used for the learning mode target language, None if unset"""
+        return self.read("tts-target-voice.txt") or None
+
+    def piper_voices_dir(self) -> Path:
+        """Get the directory holding Piper .onnx voice models"""
+        configured = self.read("piper-voices-dir.txt")
+        return Path(configured).expanduser() if configured else DEFAULT_PIPER_VOICES_DIR
+
+    def piper_voices(self) -> list[str]:
+        """List installed Piper voice names (model file stems), sorted"""
+        try:
+            return sorted(
+                model.name[:-len(".onnx")]
+                for model in self.piper_voices_dir().glob("*.onnx")
+                if model.is_file()
+            )
+        except OSError:
+            return []
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/shell_pool.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Pool of long-lived bash workers that run hook scripts without a fresh interpreter per call
+@context Every _run_script call used to fork+exec a new bash; bursts of manager calls paid that repeatedly
+@architecture Each worker is a persistent `bash --noprofile --norc` reading commands from a pipe.
+              A command runs the hook in a forked subshell (`source`), writes stdout/stderr to
+              per-worker files and reports "<token> <exit code>" on the worker's stdout.
+@dependencies bash (BASH_ARGV0 needs bash >= 5.0 for scripts that inspect $0)
+@entrypoints AgentVibesServer._run_script when AGENTVIBES_SHELL_POOL=1 (Unix only)
+@patterns Bounded pool, lazy worker start, ping health check, kill+restart on timeout or crash
+@related mcp-server/server.py
+"""
+
+import asyncio
+import os
+import secrets
+import shlex
+import shutil
+import signal
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class ShellWorkerError(Exception):
+    """Raised when a worker dies or a command times out"""
+
+
+class ShellWorker:
+    """A single persistent bash process"""
+
+    def __init__(self, env: dict):
+        self.env = env
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.tmp_dir: Optional[Path] = None
+        self.last_used = 0.0
+
+    async def start(self) -> None:
+        """Start the bash process"""
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="agentvibes-worker-"))
+        self.proc = await asyncio.create_subprocess_exec(
+            "bash", "--noprofile", "--norc",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            env=self.env,
+            # Own process group so a timeout can kill the hook's children too
+            start_new_session=True,
+        )
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        """Check whether the bash process is still running"""
+        return self.proc is not None and self.proc.returncode is None
+
+    async def _exchange(self, command: str, token: str, timeout: float) -> int:
+        """Send one command and wait for its "<token> <rc>" completion line"""
+        if not self.alive():
+            raise ShellWorkerError("worker is not running")
+        try:
+            self.proc.stdin.write(command.encode())
+            await self.proc.stdin.drain()
+            while True:
+                line = await asyncio.wait_for(self.proc.stdout.readline(), timeout)
+                if not line:
+                    raise ShellWorkerError("worker exited unexpectedly")
+                parts = line.decode(errors="replace").split()
+                # Ignore anything a misbehaving script wrote to the worker's own stdout
+                if len(parts) == 2 and parts[0] == token:
+                    self.last_used = time.monotonic()
+                    return int(parts[1])
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise ShellWorkerError(f"timed out after {timeout:g}s")
+        except (BrokenPipeError, ConnectionResetError):
+            await self.stop()
+            raise ShellWorkerError("worker exited unexpectedly")
+
+    async def ping(self, timeout: float = 2.0) -> bool:
+        """Health check: the worker answers a no-op command"""
+        token = secrets.token_hex(8)
+        try:
+            await self._exchange(f"printf '%s 0\\n' {token}\n", token, timeout)
+            return True
+        except ShellWorkerError:
+            return False
+
+    async def run(
+        self,
+        script: Path,
+        args: list[str],
+        cwd: Path,
+        env_overrides: dict,
+        timeout: float,
+    ) -> tuple[int, bytes, bytes]:
+        """
+        Run a hook script inside a subshell of this worker.
+
+        Returns:
+            (exit code, stdout bytes, stderr bytes)
+        """
+        token = secrets.token_hex(8)
+        out_file = self.tmp_dir / "out"
+        err_file = self.tmp_dir / "err"
+
+        setup = [f"cd -- {shlex.quote(str(cwd))} 2>/dev/null"]
+        for key, value in env_overrides.items():
+            if value is None:
+                setup.append(f"unset {key}")
+            else:
+                setup.append(f"export {key}={shlex.quote(value)}")
+        # $0 and BASH_SOURCE both point at the script, as if it were executed
+        setup.append(f"BASH_ARGV0={shlex.quote(str(script))}")
+        invocation = " ".join(shlex.quote(part) for part in ["source", str(script), *args])
+
+        command = (
+            f"( {'; '.join(setup)}; {invocation} ) </dev/null "
+            f">{shlex.quote(str(out_file))} 2>{shlex.quote(str(err_file))}; "
+            f"printf '%s %d\\n' {token} $?\n"
+        )
+        returncode = await self._exchange(command, token, timeout)
+        return returncode, out_file.read_bytes(), err_file.read_bytes()
+
+    async def stop(self) -> None:
+        """Kill the worker (and anything it started) and remove its temp files"""
+        if self.proc is not None and self.proc.returncode is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self.proc.kill()
+            await self.proc.wait()
+        if self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+
+
+class ShellWorkerPool:
+    """Bounded pool of ShellWorkers with health checks and restart on failure"""
+
+    def __init__(self, env: dict, size: int = 2, timeout: float = 60.0, idle_check: float = 30.0):
+        """
+        Args:
+            env: Base environment every worker starts with
+            size: Maximum number of workers
+            timeout: Per-command timeout in seconds
+            idle_check: Ping workers idle for longer than this before reusing them
+        """
+        self.env = env
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self.restarts = 0
+        self._idle: list[ShellWorker] = []
+        self._started = 0
+        self._slots = asyncio.Semaphore(self.size)
+
+    @classmethod
+    def from_env(cls, env: dict) -> Optional["ShellWorkerPool"]:
+        """
+        Build a pool from AGENTVIBES_SHELL_POOL* environment variables.
+
+        Returns:
+            A ShellWorkerPool, or None unless AGENTVIBES_SHELL_POOL=1
+        """
+        if os.environ.get("AGENTVIBES_SHELL_POOL", "").strip().lower() not in ("1", "true", "yes", "on"):
+            return None
+        try:
+            size = int(os.environ.get("AGENTVIBES_SHELL_POOL_SIZE", "2"))
+            timeout = float(os.environ.get("AGENTVIBES_SCRIPT_TIMEOUT", "60"))
+        except ValueError:
+            size, timeout = 2, 60.0
+        return cls(env, size, timeout)
+
+    async def _acquire(self) -> ShellWorker:
+        """Get a healthy worker (slot already held)"""
+        while self._idle:
+            worker = self._idle.pop()
+            if not worker.alive():
+                await self._discard(worker)
+                continue
+            if time.monotonic() - worker.last_used > self.idle_check and not await worker.ping():
+                await self._discard(worker)
+                continue
+            return worker
+        worker = ShellWorker(self.env)
+        await worker.start()
+        self._started += 1
+        return worker
+
+    async def _discard(self, worker: ShellWorker) -> None:
+        await worker.stop()
+        self.restarts += 1
+
+    async def run(
+        self,
+        script: Path,
+        args: list[str],
+        env_overrides: Optional[dict] = None,
+        cwd: Optional[Path] = None,
+        timeout: Optional[float] = None,
+    ) -> tuple[int, bytes, bytes]:
+        """
+        Run a hook script on a pooled worker.
+
+        Args:
+            script: Script to run
+            args: Script arguments
+            env_overrides: Variables to export (None value = unset) on top of the base env
+            cwd: Working directory (defaults to the server's cwd)
+            timeout: Per-command timeout (defaults to the pool timeout)
+
+        Returns:
+            (exit code, stdout bytes, stderr bytes)
+
+        Raises:
+            ShellWorkerError: The command timed out or the worker crashed
+        """
+        async with self._slots:
+            worker = await self._acquire()
+            try:
+                result = await worker.run(
+                    script, args, cwd or Path.cwd(), env_overrides or {}, timeout or self.timeout
+                )
+            except BaseException:
+                # Timeouts, crashes and cancellation leave the worker in an unknown state
+                await self._discard(worker)
+                raise
+            self._idle.append(worker)
+            return result
+
+    def stats(self) -> dict:
+        """Get pool counters"""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "started": self._started,
+            "restarts": self.restarts,
+        }
+
+    async def close(self) -> None:
+        """Stop all idle workers"""
+        while self._idle:
+            await self._idle.pop().stop()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/speech_queue.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Server-side utterance queue so text_to_speech returns before playback ends
+@context The text_to_speech tool call used to block the agent's turn until the audio finished playing
+@architecture Priority heap of SpeechJobs drained by one consumer task (one utterance at a time).
+              Each job runs as its own task so it can be cancelled or preempted mid-playback.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.enqueue_speech, get_speech_status, cancel_speech, flush_speech_queue
+@patterns Bounded priority queue, lazy consumer start, drop-lowest-priority on overflow,
+          per-agent coalescing window (duplicates dropped, bursts merged before synthesis)
+@related mcp-server/server.py
+"""
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+# Lower value = spoken first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+def _comparable(text: str) -> str:
+    """Normalize text for duplicate detection ("Starting..." == "starting")"""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class SpeechQueueFull(Exception):
+    """Raised when the queue is at max depth and nothing lower-priority can be dropped"""
+
+
+@dataclass
+class SpeechJob:
+    """One queued utterance"""
+
+    id: int
+    text: str
+    priority: str
+    options: dict = field(default_factory=dict)
+    agent: Optional[str] = None
+    status: str = "queued"  # queued, speaking, done, failed, cancelled, preempted, dropped
+    result: Optional[str] = None
+    created: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    # Speaks this job instead of speak(text, **options) (batches)
+    call: Optional[Callable[[], Awaitable[str]]] = field(default=None, repr=False)
+
+    @property
+    def rank(self) -> int:
+        return PRIORITIES[self.priority]
+
+    def finish(self, status: str, result: Optional[str] = None) -> None:
+        self.status = status
+        self.result = result
+        self.finished = time.monotonic()
+        self.done.set()
+
+
+class SpeechQueue:
+    """Plays queued utterances one at a time in priority order"""
+
+    def __init__(
+        self,
+        speak: Callable[..., Awaitable[str]],
+        max_depth: int = 20,
+        history: int = 50,
+        coalesce_window: float = 0.0,
+    ):
+        """
+        Args:
+            speak: Coroutine that synthesizes and plays one utterance (text, **options, agent=...)
+            max_depth: Maximum number of waiting jobs (the one speaking is not counted)
+            history: Finished jobs remembered for get_speech_status
+            coalesce_window: Seconds within which duplicates are dropped and an agent's
+                queued utterances are merged (0 = off)
+        """
+        self.speak = speak
+        self.max_depth = max(1, max_depth)
+        self.history = history
+        self.coalesce_window = max(0.0, coalesce_window)
+        self.merged = 0
+        self.deduplicated = 0
+        self.current: Optional[SpeechJob] = None
+        self._heap: list[tuple[int, int, SpeechJob]] = []
+        self._jobs: "OrderedDict[int, SpeechJob]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._current_task: Optional[asyncio.Task] = None
+
+    def queued(self) -> list[SpeechJob]:
+        """Waiting jobs in the order they will be spoken"""
+        return [job for _, _, job in sorted(self._heap) if job.status == "queued"]
+
+    def get(self, job_id: int) -> Optional[SpeechJob]:
+        """Look up a job (queued, speaking or recently finished)"""
+        return self._jobs.get(job_id)
+
+    def submit(self, text: str, priority: str = "normal", **options) -> SpeechJob:
+        """Queue an utterance (see offer()); returns the job that will speak it"""
+        return self.offer(text, priority, **options)[0]
+
+    def offer(
+        self, text: str, priority: str = "normal", agent: Optional[str] = None, **options
+    ) -> tuple[SpeechJob, str]:
+        """
+        Queue an utterance, coalescing it with recent ones.
+
+        Within the coalescing window (measured from a job's first submission), text
+        matching a job from the same agent with the same priority and options (voice,
+        language, ...) that is queued, speaking or just spoken is dropped as a
+        duplicate. A new utterance from an agent whose earlier one is still waiting
+        (same priority and options) is merged into it: it replaces the old text when
+        it extends it ("Starting" -> "Starting the build"), otherwise the two are
+        spoken as one message.
+
+        A "high" job stops a "low" job that is currently speaking. When the queue
+        is full the newest, lowest-priority waiting job is dropped to make room
+        for a more important one.
+
+        Args:
+            text: Text to speak
+            priority: "high", "normal" or "low"
+            agent: Who is speaking (BMAD agent id); merging only happens per agent
+            **options: Passed through to speak() (voice, personality, ...)
+
+        Returns:
+            (job that will speak the text, "queued" | "merged" | "duplicate")
+
+        Raises:
+            ValueError: Unknown priority
+            SpeechQueueFull: Queue is full of jobs at least as important
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (use {', '.join(PRIORITIES)})")
+        if self.coalesce_window:
+            coalesced = self._coalesce(text, priority, agent, options)
+            if coalesced is not None:
+                return coalesced
+        return self._push(SpeechJob(next(self._ids), text, priority, options, agent)), "queued"
+
+    def submit_call(self, text: str, call: Callable[[], Awaitable[str]], priority: str = "normal") -> SpeechJob:
+        """
+        Queue a job spoken by its own coroutine (e.g. a batch of lines), never coalesced.
+
+        Args:
+            text: Description shown by get_speech_status
+            call: Returns a fresh coroutine that speaks the job
+            priority: "high", "normal" or "low"
+
+        Raises:
+            ValueError: Unknown priority
+            SpeechQueueFull: Queue is full of jobs at least as important
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (use {', '.join(PRIORITIES)})")
+        job = SpeechJob(next(self._ids), text, priority)
+        job.call = call
+        return self._push(job)
+
+    def _push(self, job: SpeechJob) -> SpeechJob:
+        """Add a job to the heap, dropping or preempting lower-priority speech"""
+        waiting = self.queued()
+        if len(waiting) >= self.max_depth:
+            victim = max(waiting, key=lambda j: (j.rank, j.id))
+            if victim.rank <= job.rank:
+                raise SpeechQueueFull(f"Speech queue is full ({self.max_depth} waiting)")
+            victim.finish("dropped", "Dropped to make room for a higher-priority message")
+
+        self._remember(job)
+        heapq.heappush(self._heap, (job.rank, next(self._seq), job))
+        self._ensure_consumer()
+        self._wakeup.set()
+
+        if (
+            self.current is not None
+            and self.current.priority == "low"
+            and job.rank < self.current.rank
+            and self._current_task is not None
+        ):
+            self.current.status = "preempted"
+            self._current_task.cancel()
+        return job
+
+    def _coalesce(
+        self, text: str, priority: str, agent: Optional[str], options: dict
+    ) -> Optional[tuple[SpeechJob, str]]:
+        """
+        Drop or merge an utterance into a recent job; None to queue it normally.
+
+        Only jobs with the same agent, priority and options (voice, language, ...)
+        are candidates, and the window runs from a job's first submission, so a
+        phrase repeated more often than the window is still spoken once per window.
+        """
+        now = time.monotonic()
+        new = _comparable(text)
+        recent = [
+            job for job in self._jobs.values()
+            if now - job.created <= self.coalesce_window
+            and job.status in ("queued", "speaking", "done")
+            and job.call is None
+            and job.agent == agent
+            and job.priority == priority
+            and job.options == options
+        ]
+        for job in recent:
+            old = _comparable(job.text)
+            if new == old or (job.status == "queued" and new in old):
+                self.deduplicated += 1
+                return job, "duplicate"
+
+        for job in reversed(recent):
+            if job.status == "queued":
+                if new.startswith(_comparable(job.text)):
+                    job.text = text  # superseded by a fuller status
+                else:
+                    separator = " " if job.text.rstrip()[-1:] in ".!?…" else ". "
+                    job.text = f"{job.text.rstrip()}{separator}{text.strip()}"
+                self.merged += 1
+                return job, "merged"
+        return None
+
+    def position(self, job: SpeechJob) -> int:
+        """1-based position of a waiting job (0 if it is not waiting)"""
+        for index, waiting in enumerate(self.queued(), start=1):
+            if waiting is job:
+                return index
+        return 0
+
+    def cancel(self, job_id: Optional[int] = None) -> Optional[SpeechJob]:
+        """
+        Cancel a waiting job, or stop the one speaking.
+
+        Args:
+            job_id: Job to cancel (None = the job currently speaking)
+
+        Returns:
+            The cancelled job, or None if there was nothing to cancel
+        """
+        job = self.current if job_id is None else self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == "queued":
+            job.finish("cancelled", "Cancelled before it was spoken")
+            return job
+        if job is self.current and job.status == "speaking" and self._current_task is not None:
+            job.status = "cancelled"
+            self._current_task.cancel()
+            return job
+        return None
+
+    def flush(self, include_current: bool = False) -> int:
+        """
+        Drop every waiting job.
+
+        Args:
+            include_current: Also stop the job that is speaking
+
+        Returns:
+            Number of jobs removed
+        """
+        count = 0
+        for job in self.queued():
+            job.finish("cancelled", "Flushed from the queue")
+            count += 1
+        self._heap.clear()
+        if include_current and self.cancel() is not None:
+            count += 1
+        return count
+
+    async def wait(self, job: SpeechJob) -> str:
+        """Wait until a job has been spoken (or cancelled) and return its result"""
+        await job.done.wait()
+        return job.result or job.status
+
+    def stats(self) -> dict:
+        """Get queue counters"""
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "queued": len(self.queued()),
+            "max_depth": self.max_depth,
+            "merged": self.merged,
+            "deduplicated": self.deduplicated,
+            **counts,
+        }
+
+    async def close(self) -> None:
+        """Stop the consumer and anything it is playing"""
+        self.flush(include_current=True)
+        if self._consumer is not None:
+            self._consumer.cancel()
+            await asyncio.gather(self._consumer, return_exceptions=True)
+            self._consumer = None
+
+    def _remember(self, job: SpeechJob) -> None:
+        self._jobs[job.id] = job
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [j.id for j in self._jobs.values() if j.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _ensure_consumer(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.get_running_loop().create_task(self._consume())
+
+    async def _consume(self) -> None:
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            _, _, job = heapq.heappop(self._heap)
+            if job.status != "queued":
+                continue  # cancelled, dropped or flushed while waiting
+
+            job.status = "speaking"
+            job.started = time.monotonic()
+            self.current = job
+            if job.call is not None:
+                speech = job.call()
+            else:
+                options = job.options if job.agent is None else {**job.options, "agent": job.agent}
+                speech = self.speak(job.text, **options)
+            task = asyncio.get_running_loop().create_task(speech)
+            self._current_task = task
+            try:
+                # wait() (unlike awaiting the task) does not raise when the job is
+                # cancelled, so a CancelledError here always means the consumer is stopping
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                job.finish("cancelled", "Stopped")
+                raise
+            finally:
+                self.current = None
+                self._current_task = None
+
+            if task.cancelled():
+                if job.status == "preempted":
+                    job.finish("preempted", "Stopped by a higher-priority message")
+                else:
+                    job.finish("cancelled", "Stopped")
+            elif task.exception() is not None:
+                job.finish("failed", f"❌ TTS failed: {task.exception()}")
+            else:
+                result = task.result()
+                job.finish("failed" if result.startswith("❌") else "done", result)
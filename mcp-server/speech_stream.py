@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/speech_stream.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Sentence chunking and a synthesize-ahead playback pipeline for long utterances
+@context With verbosity=high, long paragraphs were synthesized whole before the first sound
+@architecture split_sentences() cuts text at sentence, then clause, then word boundaries.
+              stream_chunks() runs a producer task that synthesizes chunk N+1 while the
+              caller's play() callback is still playing chunk N.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer._speak_streaming
+@patterns Bounded producer/consumer queue, callbacks for synthesis and playback
+@related mcp-server/server.py, mcp-server/piper_engine.py
+"""
+
+import asyncio
+import re
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+# Abbreviations that end with a period but rarely end a sentence
+_ABBREVIATIONS = {"e.g.", "i.e.", "mr.", "mrs.", "ms.", "dr.", "vs.", "st.", "no.", "approx."}
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"')\]])\s+|\n+")
+_CLAUSE_END = re.compile(r"(?<=[,;:—])\s+")
+
+
+def _split_keep(pattern: re.Pattern, text: str) -> list[str]:
+    return [part.strip() for part in pattern.split(text) if part and part.strip()]
+
+
+def _sentences(text: str) -> list[str]:
+    sentences: list[str] = []
+    for part in _split_keep(_SENTENCE_END, text):
+        if sentences and sentences[-1].split()[-1].lower() in _ABBREVIATIONS:
+            sentences[-1] = f"{sentences[-1]} {part}"
+        else:
+            sentences.append(part)
+    return sentences
+
+
+def _limit(piece: str, max_chars: int) -> list[str]:
+    """Break an over-long sentence at clause boundaries, then between words"""
+    if len(piece) <= max_chars:
+        return [piece]
+    out: list[str] = []
+    for clause in _split_keep(_CLAUSE_END, piece):
+        words = clause.split()
+        current = ""
+        for word in words:
+            candidate = f"{current} {word}".strip()
+            if current and len(candidate) > max_chars:
+                out.append(current)
+                current = word
+            else:
+                current = candidate
+        if current:
+            if out and len(out[-1]) + len(current) + 1 <= max_chars:
+                out[-1] = f"{out[-1]} {current}"
+            else:
+                out.append(current)
+    return out
+
+
+def split_sentences(text: str, max_chars: int = 240, min_chars: int = 20) -> list[str]:
+    """
+    Split text into speakable chunks at sentence or clause boundaries.
+
+    Args:
+        text: Text to split
+        max_chars: Longer sentences are split at clauses (then words) to this length
+        min_chars: Shorter chunks are joined with the next one ("OK." is not worth its own clip)
+
+    Returns:
+        Chunks in order; joining them with spaces gives back the text's words
+    """
+    chunks: list[str] = []
+    pending = ""
+    for sentence in _sentences(text):
+        for piece in _limit(sentence, max_chars):
+            piece = f"{pending} {piece}".strip() if pending else piece
+            if len(piece) < min_chars:
+                pending = piece
+            else:
+                chunks.append(piece)
+                pending = ""
+    if pending:
+        if chunks and len(chunks[-1]) + len(pending) + 1 <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+    return chunks
+
+
+class StreamError(Exception):
+    """Raised when a chunk cannot be synthesized or played"""
+
+    def __init__(self, message: str, played: list[Path]):
+        super().__init__(message)
+        self.played = played
+
+
+async def stream_chunks(
+    chunks: list[str],
+    synthesize: Callable[[str], Awaitable[Optional[Path]]],
+    play: Callable[[Path], Awaitable[bool]],
+    lookahead: int = 1,
+) -> list[Path]:
+    """
+    Play chunks in order while synthesizing the following ones in the background.
+
+    Args:
+        chunks: Text chunks (from split_sentences)
+        synthesize: Renders one chunk to an audio file, None on failure
+        play: Plays one file, False to stop the stream (failure or mute)
+        lookahead: Chunks that may be synthesized ahead of playback
+
+    Returns:
+        The files that were played, in order
+
+    Raises:
+        StreamError: A chunk failed to synthesize or play (carries the files played so far)
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, lookahead))
+
+    async def produce() -> None:
+        for index, chunk in enumerate(chunks):
+            try:
+                audio_file = await synthesize(chunk)
+            except Exception as e:
+                await queue.put((index, None, e))
+                return
+            await queue.put((index, audio_file, None))
+            if audio_file is None:
+                return
+
+    producer = asyncio.create_task(produce())
+    played: list[Path] = []
+    try:
+        for _ in chunks:
+            index, audio_file, error = await queue.get()
+            if audio_file is None:
+                reason = f": {error}" if error else ""
+                raise StreamError(f"synthesis failed for chunk {index + 1}/{len(chunks)}{reason}", played)
+            if not await play(audio_file):
+                raise StreamError(f"playback stopped at chunk {index + 1}/{len(chunks)}", played)
+            played.append(audio_file)
+        return played
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/synthesis_cache.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Content-addressed cache of synthesized TTS audio
+@context Agents repeat short phrases ("Starting task", "Done") and each repeat paid full synthesis cost
+@architecture Files named <sha256>.<ext> in a cache directory, in-memory LRU index bounded by bytes and age
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.text_to_speech (lookup/store), clean_audio_cache (stats/clear)
+@patterns Content addressing, LRU eviction, atomic file replacement, fail-soft on I/O errors
+@related mcp-server/server.py, .claude/hooks/play-tts.sh
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".aiff")
+
+
+def default_cache_dir() -> Path:
+    """Get the synthesis cache directory (honours XDG_CACHE_HOME)"""
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "agentvibes" / "synthesis"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different strings share a cache entry"""
+    return " ".join(text.split())
+
+
+def make_key(text: str, **settings: Optional[str]) -> str:
+    """
+    Build a cache key from the spoken text and every setting that changes the audio.
+
+    Args:
+        text: Text to speak
+        **settings: voice, provider, speed, personality, effects, ... (None allowed)
+
+    Returns:
+        Hex sha256 digest
+    """
+    payload = {"text": normalize_text(text)}
+    payload.update({name: value or "" for name, value in settings.items()})
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class SynthesisCache:
+    """LRU cache of audio files keyed by content hash"""
+
+    def __init__(self, cache_dir: Path, max_bytes: int, max_age: float):
+        """
+        Args:
+            cache_dir: Directory holding cached audio files
+            max_bytes: Evict least recently used entries above this total size
+            max_age: Entries older than this many seconds are treated as misses
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple[Path, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Files from earlier runs are indexed on first use, not at server startup
+        self._loaded = False
+
+    @classmethod
+    def from_env(cls) -> Optional["SynthesisCache"]:
+        """
+        Build a cache from AGENTVIBES_SYNTH_CACHE* environment variables.
+
+        Returns:
+            A SynthesisCache, or None when AGENTVIBES_SYNTH_CACHE=0
+        """
+        if os.environ.get("AGENTVIBES_SYNTH_CACHE", "1").strip().lower() in ("0", "false", "off", "no"):
+            return None
+        try:
+            max_mb = float(os.environ.get("AGENTVIBES_SYNTH_CACHE_MAX_MB", "50"))
+            max_days = float(os.environ.get("AGENTVIBES_SYNTH_CACHE_MAX_AGE_DAYS", "7"))
+        except ValueError:
+            max_mb, max_days = 50.0, 7.0
+        return cls(default_cache_dir(), int(max_mb * 1024 * 1024), max_days * 86400)
+
+    def load(self) -> None:
+        """Index cache files now instead of on first lookup (background warm-up)"""
+        with self._lock:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+    def _load(self) -> None:
+        """Index cache files left by previous server runs (oldest first)"""
+        try:
+            files = [
+                f for f in self.cache_dir.iterdir()
+                if f.suffix in AUDIO_EXTENSIONS and f.is_file()
+            ]
+        except OSError:
+            return
+        stats = []
+        for f in files:
+            try:
+                stats.append((f, f.stat()))
+            except OSError:
+                continue
+        for f, st in sorted(stats, key=lambda item: item[1].st_mtime):
+            self._entries[f.stem] = (f, st.st_size, st.st_mtime)
+        self._evict()
+
+    def _bytes_held(self) -> int:
+        return sum(size for _, size, _ in self._entries.values())
+
+    def _drop(self, key: str) -> None:
+        path, _, _ = self._entries.pop(key)
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """Drop expired entries, then least recently used ones over the byte budget"""
+        now = time.time()
+        for key in [k for k, (_, _, created) in self._entries.items() if now - created > self.max_age]:
+            self._drop(key)
+        while self._entries and self._bytes_held() > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def get(self, key: str) -> Optional[Path]:
+        """
+        Look up cached audio.
+
+        Returns:
+            Path to the cached file, or None on a miss
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is not None:
+                path, _, created = entry
+                if time.time() - created <= self.max_age and path.exists():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return path
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Check for a live entry without counting a hit or miss"""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            return (
+                entry is not None
+                and time.time() - entry[2] <= self.max_age
+                and entry[0].exists()
+            )
+
+    def discard(self, key: str) -> bool:
+        """Remove one entry; returns whether it existed"""
+        with self._lock:
+            self._ensure_loaded()
+            if key not in self._entries:
+                return False
+            self._drop(key)
+            return True
+
+    def put(self, key: str, source: Path) -> Optional[Path]:
+        """
+        Copy a freshly synthesized file into the cache.
+
+        Returns:
+            Path of the cached copy, or None if it could not be stored
+        """
+        if source.suffix not in AUDIO_EXTENSIONS:
+            return None
+        target = self.cache_dir / f"{key}{source.suffix}"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, target)
+            size = target.stat().st_size
+        except OSError as e:
+            print(f"Warning: Could not store synthesis cache entry: {e}", file=sys.stderr)
+            return None
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = (target, size, time.time())
+            self._entries.move_to_end(key)
+            self._evict()
+            return target if key in self._entries else None
+
+    def clear(self) -> tuple[int, int]:
+        """
+        Remove every cached file.
+
+        Returns:
+            (files removed, bytes freed)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            count, freed = len(self._entries), self._bytes_held()
+            for key in list(self._entries):
+                self._drop(key)
+            return count, freed
+
+    def stats(self) -> dict:
+        """Get hit/miss counters and current size"""
+        with self._lock:
+            self._ensure_loaded()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes_held(),
+                "max_bytes": self.max_bytes,
+            }
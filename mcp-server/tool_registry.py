@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/tool_registry.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+@fileoverview Declarative registry of MCP tools: schema, handler and call policy in one place
+@context call_tool dispatched through a 30-branch if/elif chain and list_tools rebuilt every Tool per request
+@architecture ToolSpec per tool -> dict lookup for dispatch, Tool list built once and cached.
+              Calls pass through middleware (timing, ...), then a category slot (bounded wait,
+              "busy" on timeout), per-tool concurrency and timeout.
+@dependencies mcp.types.Tool
+@entrypoints server.py list_tools() / call_tool()
+@patterns Registry + middleware chain, schema-driven argument binding, per-category semaphores
+@related mcp-server/server.py
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from mcp.types import Tool
+
+Handler = Callable[..., Awaitable[str]]
+# middleware(spec, arguments, call_next) -> result; call_next(arguments) runs the rest of the chain
+Middleware = Callable[["ToolSpec", dict, Callable[[dict], Awaitable[str]]], Awaitable[str]]
+
+# Category -> (environment variable, default limit); 0 = unlimited
+CATEGORY_LIMITS = {
+    "synthesis": ("AGENTVIBES_SYNTHESIS_CONCURRENCY", 2),
+    "config_write": ("AGENTVIBES_CONFIG_WRITE_CONCURRENCY", 1),
+}
+
+
+class Busy(Exception):
+    """Raised when a category slot did not free up within the queue timeout"""
+
+    def __init__(self, category: str, limit: int, waited: float):
+        self.category = category
+        self.limit = limit
+        self.waited = waited
+        super().__init__(
+            f"{limit} {category.replace('_', ' ')} call(s) already running, waited {waited:.0f}s"
+        )
+
+    def response(self, what: str) -> str:
+        """Tool result telling the caller to retry"""
+        return f"⏳ Busy: {what} did not start ({self}). Try again shortly."
+
+
+class CategoryLimiter:
+    """Caps how many calls of a category (synthesis, config_write, ...) run at once"""
+
+    def __init__(self, limits: dict[str, int], queue_timeout: float = 30.0):
+        """
+        Args:
+            limits: Maximum concurrent calls per category (0 or missing = unlimited)
+            queue_timeout: Seconds a call may wait for a slot before it gets Busy
+                (0 = fail immediately when the category is full)
+        """
+        self.limits = {category: limit for category, limit in limits.items() if limit > 0}
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.rejected: dict[str, int] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+
+    @classmethod
+    def from_env(cls) -> "CategoryLimiter":
+        """Build limits from AGENTVIBES_*_CONCURRENCY and AGENTVIBES_BUSY_TIMEOUT"""
+        limits = {}
+        for category, (variable, default) in CATEGORY_LIMITS.items():
+            try:
+                limits[category] = int(os.environ.get(variable, str(default)))
+            except ValueError:
+                limits[category] = default
+        try:
+            queue_timeout = float(os.environ.get("AGENTVIBES_BUSY_TIMEOUT", "30"))
+        except ValueError:
+            queue_timeout = 30.0
+        return cls(limits, queue_timeout)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, category: Optional[str]):
+        """
+        Hold one slot of a category for the duration of the block.
+
+        Raises:
+            Busy: No slot freed up within queue_timeout
+        """
+        limit = self.limits.get(category) if category else None
+        if not limit:
+            yield
+            return
+        semaphore = self._semaphore(category, limit)
+        if semaphore.locked():
+            started = time.monotonic()
+            try:
+                if self.queue_timeout <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected[category] = self.rejected.get(category, 0) + 1
+                raise Busy(category, limit, time.monotonic() - started) from None
+        else:
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _semaphore(self, category: str, limit: int) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; start fresh if the loop changed
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphores = {}
+        semaphore = self._semaphores.get(category)
+        if semaphore is None:
+            semaphore = self._semaphores[category] = asyncio.Semaphore(limit)
+        return semaphore
+
+
+@dataclass
+class ToolSpec:
+    """One MCP tool: schema, handler and call policy"""
+
+    name: str
+    handler: Handler
+    description: str
+    properties: dict = field(default_factory=dict)
+    required: tuple = ()
+    # Call policy
+    timeout: Optional[float] = None  # seconds, None = registry default
+    max_concurrency: Optional[int] = None  # None = unlimited
+    category: Optional[str] = None  # shared limits/metrics group (e.g. "synthesis")
+
+    def input_schema(self) -> dict:
+        schema = {"type": "object", "properties": self.properties}
+        if self.required:
+            schema["required"] = list(self.required)
+        return schema
+
+
+class ToolRegistry:
+    """Maps tool names to ToolSpecs and runs calls through the middleware chain"""
+
+    def __init__(
+        self,
+        default_timeout: Optional[float] = None,
+        limiter: Optional[CategoryLimiter] = None,
+    ):
+        """
+        Args:
+            default_timeout: Timeout for tools without their own (None = no timeout)
+            limiter: Per-category concurrency limits applied by ToolSpec.category
+        """
+        self.default_timeout = default_timeout
+        self.limiter = limiter or CategoryLimiter({})
+        self._specs: dict[str, ToolSpec] = {}
+        self._middleware: list[Middleware] = []
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._tools: Optional[list[Tool]] = None
+
+    def register(self, spec: ToolSpec) -> ToolSpec:
+        """Add (or replace) a tool"""
+        self._specs[spec.name] = spec
+        self._tools = None
+        return spec
+
+    def add(self, name: str, handler: Handler, description: str, **options) -> ToolSpec:
+        """Shorthand for register(ToolSpec(...))"""
+        return self.register(ToolSpec(name, handler, description, **options))
+
+    def use(self, middleware: Middleware) -> None:
+        """Wrap every call (first added = outermost)"""
+        self._middleware.append(middleware)
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self._specs.get(name)
+
+    def names(self) -> list[str]:
+        return list(self._specs)
+
+    def list_tools(self) -> list[Tool]:
+        """Get the MCP Tool list (built once, rebuilt only after register())"""
+        if self._tools is None:
+            self._tools = [
+                Tool(name=spec.name, description=spec.description, inputSchema=spec.input_schema())
+                for spec in self._specs.values()
+            ]
+        return self._tools
+
+    async def call(self, name: str, arguments: Optional[dict] = None) -> str:
+        """
+        Dispatch a tool call.
+
+        Arguments are bound to the handler's keyword parameters by schema property
+        name; anything not in the schema is ignored.
+
+        Returns:
+            The handler's result text (or an error message for unknown tools,
+            missing arguments and timeouts, or a "busy" message when the tool's
+            category stayed full for the whole queue timeout)
+        """
+        spec = self._specs.get(name)
+        if spec is None:
+            return f"Unknown tool: {name}"
+        arguments = arguments or {}
+        missing = [arg for arg in spec.required if arg not in arguments]
+        if missing:
+            return f"❌ Missing required argument(s) for {name}: {', '.join(missing)}"
+        kwargs = {key: value for key, value in arguments.items() if key in spec.properties}
+
+        async def invoke(call_args: dict) -> str:
+            return await self._invoke(spec, call_args)
+
+        call_next = invoke
+        for middleware in reversed(self._middleware):
+            call_next = self._wrap(middleware, spec, call_next)
+        return await call_next(kwargs)
+
+    @staticmethod
+    def _wrap(middleware: Middleware, spec: ToolSpec, call_next):
+        async def wrapped(call_args: dict) -> str:
+            return await middleware(spec, call_args, call_next)
+        return wrapped
+
+    async def _invoke(self, spec: ToolSpec, kwargs: dict) -> str:
+        timeout = spec.timeout if spec.timeout is not None else self.default_timeout
+        semaphore = None
+        if spec.max_concurrency:
+            semaphore = self._semaphores.setdefault(spec.name, asyncio.Semaphore(spec.max_concurrency))
+        try:
+            async with self.limiter.slot(spec.category):
+                if semaphore is None:
+                    return await asyncio.wait_for(spec.handler(**kwargs), timeout)
+                async with semaphore:
+                    return await asyncio.wait_for(spec.handler(**kwargs), timeout)
+        except Busy as e:
+            return e.response(spec.name)
+        except asyncio.TimeoutError:
+            return f"❌ {spec.name} timed out after {timeout:g}s"
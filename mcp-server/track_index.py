@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/track_index.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview Cached trigram index of background music tracks with ranked fuzzy matching
+@context set_background_music ran background-music-manager.sh list on every call, regex-parsed
+         its output and took the first track containing the query, so "chill" picked whichever
+         chill track was listed first and a typo found nothing
+@architecture The tracks directory is scanned once into TrackEntry records (stem, words,
+              trigrams) plus an inverted trigram -> tracks index; refresh() re-scans only when
+              the directory's mtime changes. match() ranks exact, prefix, word-prefix and
+              substring hits above trigram (Dice) similarity, preferring names the query
+              covers best, and only scores tracks that share a trigram with the query.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.track_index, set_background_music
+@patterns Directory-signature invalidation, inverted n-gram index, ranked "did you mean" list
+@related mcp-server/server.py, mcp-server/voice_catalog.py, .claude/hooks/background-music-manager.sh
+"""
+
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg", ".flac", ".m4a", ".aac", ".opus"}
+
+# Lowest trigram similarity reported as a "did you mean" candidate
+FUZZY_CUTOFF = 0.3
+
+# Lowest score set_background_music accepts without asking (one typo in a word passes)
+MATCH_THRESHOLD = 0.4
+
+# Other tracks scoring within this of the best one are offered as "did you mean"
+SUGGEST_MARGIN = 0.15
+
+_WORD_SPLIT = re.compile(r"[\s_.\-]+")
+
+
+def _words(text: str) -> list[str]:
+    """Lower-case words of a track name or query, without the audio extension"""
+    text = text.strip().lower()
+    stem, extension = os.path.splitext(text)
+    if extension in AUDIO_EXTENSIONS:
+        text = stem
+    return [word for word in _WORD_SPLIT.split(text) if word]
+
+
+def _trigrams(words: Iterable[str]) -> frozenset[str]:
+    """Padded trigrams of each word ("  ch", " chi", "chi", ...)"""
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _dice(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+@dataclass(frozen=True)
+class TrackEntry:
+    """One track file with its precomputed match keys"""
+
+    name: str
+    key: str
+    words: tuple[str, ...]
+    grams: frozenset[str]
+    word_grams: tuple[frozenset[str], ...]
+
+    @classmethod
+    def of(cls, name: str) -> "TrackEntry":
+        words = tuple(_words(name))
+        return cls(
+            name=name,
+            key=" ".join(words),
+            words=words,
+            grams=_trigrams(words),
+            word_grams=tuple(_trigrams([word]) for word in words),
+        )
+
+
+@dataclass(frozen=True)
+class TrackMatch:
+    """A track and how well it matched the query (1.0 = exact)"""
+
+    track: str
+    score: float
+
+
+class TrackIndex:
+    """Background music tracks indexed for ranked fuzzy lookup"""
+
+    def __init__(self, tracks_dir: Path):
+        """
+        Args:
+            tracks_dir: Directory holding the track files (.claude/audio/tracks)
+        """
+        self.tracks_dir = tracks_dir
+        self.scans = 0
+        self._entries: dict[str, TrackEntry] = {}
+        self._by_gram: dict[str, set[str]] = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracks(self) -> list[str]:
+        """Indexed track file names, sorted"""
+        with self._lock:
+            return sorted(self._entries)
+
+    def refresh(self) -> list[str]:
+        """
+        Re-scan the tracks directory if it changed since the last scan.
+
+        Returns:
+            Indexed track file names, sorted (empty when the directory is missing)
+        """
+        try:
+            stat = self.tracks_dir.stat()
+            signature = ("dir", stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            signature = None
+        with self._lock:
+            if self.scans and signature is not None and signature == self._signature:
+                return sorted(self._entries)
+        names = []
+        if signature is not None:
+            try:
+                with os.scandir(self.tracks_dir) as entries:
+                    for entry in entries:
+                        if os.path.splitext(entry.name)[1].lower() not in AUDIO_EXTENSIONS:
+                            continue
+                        try:
+                            if entry.is_file():
+                                names.append(entry.name)
+                        except OSError:
+                            continue
+            except OSError:
+                names = []
+        self._build(names, signature)
+        return self.tracks
+
+    def load_names(self, names: Iterable[str]) -> None:
+        """Index track names listed by the manager script (no tracks directory to watch)"""
+        names = sorted(set(names))
+        with self._lock:
+            if self.scans and self._signature == ("names", tuple(names)):
+                return
+        self._build(names, ("names", tuple(names)))
+
+    def _build(self, names: list[str], signature) -> None:
+        with self._lock:
+            current = self._entries
+        entries = {name: current.get(name) or TrackEntry.of(name) for name in names}
+        by_gram: dict[str, set[str]] = defaultdict(set)
+        for entry in entries.values():
+            for gram in entry.grams:
+                by_gram[gram].add(entry.name)
+        with self._lock:
+            self._entries = entries
+            self._by_gram = dict(by_gram)
+            self._signature = signature
+            self.scans += 1
+
+    @staticmethod
+    def _score(entry: TrackEntry, query: str, words: list[str], grams: frozenset[str]) -> float:
+        """Score one track: exact 1.0, prefix/word/substring 0.6-0.95, trigram similarity below 0.6"""
+        if entry.name.lower() == query.lower() or entry.key == " ".join(words):
+            return 1.0
+        joined = " ".join(words)
+        coverage = len(joined) / max(len(entry.key), 1)
+        if entry.key.startswith(joined):
+            return 0.8 + 0.15 * coverage
+        if all(any(word.startswith(part) for word in entry.words) for part in words):
+            whole = sum(part in entry.words for part in words) / len(words)
+            return 0.7 + 0.1 * whole + 0.1 * coverage
+        if joined in entry.key or "".join(words) in "".join(entry.words):
+            return 0.6 + 0.15 * coverage
+        similarity = max([_dice(grams, entry.grams)] + [_dice(grams, word) for word in entry.word_grams])
+        return 0.6 * similarity if similarity >= FUZZY_CUTOFF else 0.0
+
+    def match(self, query: str, limit: int = 5) -> list[TrackMatch]:
+        """
+        Rank tracks against a full or partial name, best first.
+
+        Args:
+            query: Track file name, part of it, or a misspelling ("celtik")
+            limit: Maximum number of matches
+
+        Returns:
+            Matches with a score above zero, highest score first
+        """
+        words = _words(query)
+        if not words:
+            return []
+        grams = _trigrams(words)
+        with self._lock:
+            entries = self._entries
+            # Only tracks sharing a trigram with the query can score
+            candidates = set()
+            for gram in grams:
+                candidates |= self._by_gram.get(gram, set())
+        matches = []
+        for name in candidates:
+            score = self._score(entries[name], query, words, grams)
+            if score > 0:
+                matches.append(TrackMatch(name, round(score, 3)))
+        matches.sort(key=lambda match: (-match.score, match.track))
+        return matches[:limit]
+
+    def best(self, query: str, limit: int = 5) -> tuple[Optional[TrackMatch], list[TrackMatch]]:
+        """
+        Pick the track a query most likely means.
+
+        Returns:
+            (best match, or None when nothing scores MATCH_THRESHOLD;
+             close runners-up, or every candidate when there is no best match)
+        """
+        matches = self.match(query, limit + 1)
+        if matches and matches[0].score >= MATCH_THRESHOLD:
+            best = matches[0]
+            return best, [match for match in matches[1:] if match.score >= best.score - SUGGEST_MARGIN]
+        return None, matches[:limit]
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/translation.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview Cached text translation for language learning mode
+@context Learning mode speaks each utterance twice, and the second copy waited for a
+         translator.py subprocess (Google Translate round trip) on every utterance, even
+         for phrases agents repeat all day ("Starting the build", "Tests passed")
+@architecture Translations are keyed by sha256(normalized text, target language) and kept
+              in an in-memory LRU backed by one small <key>.txt file each under
+              ~/.cache/agentvibes/translations/, so repeats across restarts skip the
+              network. Misses use deep-translator in-process when it is installed, else
+              the hooks' translator.py. Failures return None and are never cached.
+@dependencies deep-translator (optional, same backend as .claude/hooks/translator.py)
+@entrypoints AgentVibesServer.translator, AgentVibesServer._speak_learn_mode
+@patterns Content addressing, LRU eviction, atomic file replacement, fail-soft backends
+@related mcp-server/server.py, mcp-server/synthesis_cache.py, .claude/hooks/translator.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from synthesis_cache import default_cache_dir, normalize_text
+
+TRANSLATOR_SCRIPT = "translator.py"
+
+
+def translation_key(text: str, target: str) -> str:
+    """Cache key for a text translated into a target language"""
+    payload = {"text": normalize_text(text), "target": target.strip().lower()}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def deep_translator_available() -> bool:
+    """Check whether deep-translator can be imported"""
+    try:
+        import deep_translator  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _translate_in_process(text: str, target: str) -> Optional[str]:
+    from deep_translator import GoogleTranslator
+
+    return GoogleTranslator(source="auto", target=target.strip().lower()).translate(text)
+
+
+class TranslationCache:
+    """LRU cache of translations, optionally persisted one file per entry"""
+
+    def __init__(self, cache_dir: Optional[Path], max_entries: int = 2000):
+        """
+        Args:
+            cache_dir: Directory for <key>.txt files (None = memory only)
+            max_entries: Evict the least recently used translations above this count
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = cache_dir is None
+
+    def _ensure_loaded(self) -> None:
+        """Index files left by earlier runs (oldest first); their text is read on first hit"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            files = [(f.stat().st_mtime, f.stem) for f in self.cache_dir.glob("*.txt") if f.is_file()]
+        except OSError:
+            return
+        for _, key in sorted(files):
+            self._entries[key] = None
+        self._evict()
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            if self.cache_dir is not None:
+                (self.cache_dir / f"{key}.txt").unlink(missing_ok=True)
+
+    def get(self, text: str, target: str) -> Optional[str]:
+        """
+        Look up a translation.
+
+        Returns:
+            The cached translation, or None on a miss
+        """
+        key = translation_key(text, target)
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._entries:
+                value = self._entries[key]
+                if value is None:
+                    try:
+                        value = (self.cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+                    except OSError:
+                        value = None
+                if value:
+                    self._entries[key] = value
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, text: str, target: str, translation: str) -> None:
+        """Store a translation (written to a temp file, then renamed)"""
+        key = translation_key(text, target)
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            self._evict()
+        if self.cache_dir is None:
+            return
+        path = self.cache_dir / f"{key}.txt"
+        tmp = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(translation, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            tmp.unlink(missing_ok=True)
+            print(f"Warning: Could not cache translation: {e}", file=sys.stderr)
+
+    def stats(self) -> dict:
+        """Entries held and hits/misses since startup"""
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class Translator:
+    """Translate utterances through the cache, falling back to deep-translator or translator.py"""
+
+    def __init__(
+        self,
+        cache: TranslationCache,
+        backend: Optional[Callable[[str, str], Optional[str]]] = None,
+        script: Optional[Path] = None,
+        timeout: float = 10.0,
+    ):
+        """
+        Args:
+            cache: Translation cache consulted before the backend
+            backend: Function (text, target) -> translation; default deep-translator,
+                else the hooks' translator.py
+            script: Path to the hooks' translator.py
+            timeout: Seconds a translator.py call may take
+        """
+        self.cache = cache
+        self.script = script
+        self.timeout = timeout
+        self.failures = 0
+        if backend is None:
+            backend = _translate_in_process if deep_translator_available() else self._translate_with_script
+        self.backend = backend
+
+    @classmethod
+    def from_env(cls, hooks_dir: Path) -> "Translator":
+        """
+        Build a translator from AGENTVIBES_TRANSLATION_CACHE* environment variables.
+
+        AGENTVIBES_TRANSLATION_CACHE=0 keeps translations in memory only.
+        """
+        persist = os.environ.get("AGENTVIBES_TRANSLATION_CACHE", "1").strip().lower() not in (
+            "0", "false", "off", "no"
+        )
+        try:
+            max_entries = int(os.environ.get("AGENTVIBES_TRANSLATION_CACHE_MAX", "2000"))
+            timeout = float(os.environ.get("AGENTVIBES_TRANSLATE_TIMEOUT", "10"))
+        except ValueError:
+            max_entries, timeout = 2000, 10.0
+        cache_dir = default_cache_dir().parent / "translations" if persist else None
+        return cls(TranslationCache(cache_dir, max_entries), script=hooks_dir / TRANSLATOR_SCRIPT, timeout=timeout)
+
+    def _translate_with_script(self, text: str, target: str) -> Optional[str]:
+        """Run the hooks' translator.py (prints the translation, or the input on failure)"""
+        if self.script is None or not self.script.is_file():
+            return None
+        python = shutil.which("python3") or sys.executable
+        result = subprocess.run(
+            [python, str(self.script), text, target],
+            capture_output=True,
+            text=True,
+            timeout=self.timeout,
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout
+
+    def translate(self, text: str, target: str) -> Optional[str]:
+        """
+        Translate text into a target language (blocking; run it in a thread).
+
+        Args:
+            text: Text in the main language
+            target: Target language name or code ("spanish", "es")
+
+        Returns:
+            The translation, or None when no backend could translate it
+        """
+        cached = self.cache.get(text, target)
+        if cached is not None:
+            return cached
+        try:
+            translation = (self.backend(text, target) or "").strip()
+        except Exception as e:
+            print(f"Warning: translation to {target} failed: {e}", file=sys.stderr)
+            translation = ""
+        if not translation:
+            self.failures += 1
+            return None
+        # translator.py echoes the input when it cannot translate; do not cache that
+        if translation != text.strip():
+            self.cache.put(text, target, translation)
+        return translation
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/voice_catalog.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview Indexed catalog of installed Piper voices with prefix, fuzzy and language search
+@context list_voices ran voice-manager.sh on every call and set_voice passed any name through
+         unverified; with hundreds of voices installed both were slow and unhelpful
+@architecture One VoiceInfo per .onnx model, read from its .onnx.json (language, quality,
+              speakers, sample rate) or inferred from the "<lang>_<REGION>-<name>-<quality>"
+              file name. Names are kept sorted for bisect prefix search and indexed by
+              language code, family and English name. refresh() re-scans only when the
+              directory's mtime changes and re-reads only files whose size or mtime changed.
+              Fuzzy matching (difflib) runs over name tokens of the language-filtered set.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.voice_catalog, list_voices(query, language), set_voice
+@patterns Incremental refresh keyed on stat signatures, sorted-name bisect, ranked matches
+@related mcp-server/server.py, mcp-server/settings_store.py
+"""
+
+import bisect
+import difflib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# "en_US-lessac-medium" -> language "en_US", dataset "lessac", quality "medium"
+_STANDARD_NAME = re.compile(r"^(?P<language>[a-z]{2,3}_[A-Z]{2})-(?P<dataset>.+)-(?P<quality>x_low|low|medium|high)$")
+_TOKEN_SPLIT = re.compile(r"[-_\s]+")
+
+# Minimum difflib ratio for a fuzzy match
+FUZZY_CUTOFF = 0.6
+
+
+@dataclass(frozen=True)
+class VoiceInfo:
+    """Metadata of one installed voice model"""
+
+    name: str
+    language: Optional[str] = None  # e.g. "en_US"
+    language_name: Optional[str] = None  # e.g. "English"
+    quality: Optional[str] = None
+    speakers: int = 1
+    sample_rate: Optional[int] = None
+    dataset: Optional[str] = None
+    speaker_names: tuple = ()
+    signature: tuple = field(default=(), compare=False, repr=False)
+
+    @classmethod
+    def load(cls, model: Path, signature: tuple) -> "VoiceInfo":
+        """Read a model's .onnx.json; fields it lacks are inferred from the file name"""
+        name = model.name[:-len(".onnx")]
+        metadata = {}
+        try:
+            metadata = json.loads(model.with_name(f"{model.name}.json").read_text(encoding="utf-8"))
+            if not isinstance(metadata, dict):
+                metadata = {}
+        except (OSError, ValueError):
+            pass
+        standard = _STANDARD_NAME.match(name)
+        language = metadata.get("language") if isinstance(metadata.get("language"), dict) else {}
+        audio = metadata.get("audio") if isinstance(metadata.get("audio"), dict) else {}
+        speaker_map = metadata.get("speaker_id_map") if isinstance(metadata.get("speaker_id_map"), dict) else {}
+        try:
+            speakers = int(metadata.get("num_speakers") or len(speaker_map) or 1)
+        except (TypeError, ValueError):
+            speakers = 1
+        try:
+            sample_rate = int(audio["sample_rate"]) if audio.get("sample_rate") else None
+        except (TypeError, ValueError):
+            sample_rate = None
+        return cls(
+            name=name,
+            language=language.get("code") or (standard.group("language") if standard else None),
+            language_name=language.get("name_english"),
+            quality=audio.get("quality") or (standard.group("quality") if standard else None),
+            speakers=max(1, speakers),
+            sample_rate=sample_rate,
+            dataset=metadata.get("dataset") or (standard.group("dataset") if standard else None),
+            speaker_names=tuple(sorted(speaker_map, key=lambda s: speaker_map[s]))[:256],
+            signature=signature,
+        )
+
+    def languages(self) -> set[str]:
+        """Lower-case keys a language filter matches: "en_us", "en-us", "en", "english" """
+        keys = set()
+        if self.language:
+            code = self.language.lower()
+            keys.update({code, code.replace("_", "-"), code.split("_")[0]})
+        if self.language_name:
+            keys.add(self.language_name.lower())
+        return keys
+
+    def describe(self) -> str:
+        """Short metadata summary, e.g. "en_US, medium, 22050 Hz, 16 speakers" """
+        parts = [part for part in (self.language, self.quality) if part]
+        if self.sample_rate:
+            parts.append(f"{self.sample_rate} Hz")
+        if self.speakers > 1:
+            parts.append(f"{self.speakers} speakers")
+        return ", ".join(parts)
+
+
+class VoiceCatalog:
+    """Installed voices of one Piper voices directory, refreshed incrementally"""
+
+    def __init__(self, voices_dir: Path):
+        self.voices_dir = voices_dir
+        self.voices: dict[str, VoiceInfo] = {}
+        self.scans = 0
+        self.parses = 0
+        self._sorted: list[tuple[str, str]] = []  # (lower-case name, name)
+        self._by_language: dict[str, list[str]] = {}
+        self._speakers: dict[str, str] = {}  # lower-case speaker name -> model name
+        self._dir_signature = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> "VoiceCatalog":
+        """Pick up added, changed and removed models (a single stat when nothing changed)"""
+        try:
+            stat = self.voices_dir.stat()
+            dir_signature = (stat.st_mtime_ns, stat.st_ino)
+        except OSError:
+            dir_signature = None
+        with self._lock:
+            if self.scans and dir_signature == self._dir_signature:
+                return self
+        models = {}
+        if dir_signature is not None:
+            try:
+                with os.scandir(self.voices_dir) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(".onnx"):
+                            continue
+                        try:
+                            if not entry.is_file():
+                                continue
+                            model = entry.stat()
+                            try:
+                                config = os.stat(f"{entry.path}.json")
+                                config_signature = (config.st_mtime_ns, config.st_size)
+                            except OSError:
+                                config_signature = None
+                        except OSError:
+                            continue
+                        models[entry.name[:-len(".onnx")]] = (
+                            Path(entry.path), (model.st_mtime_ns, model.st_size, config_signature)
+                        )
+            except OSError:
+                models = {}
+
+        with self._lock:
+            current = dict(self.voices)
+        voices = {}
+        for name, (path, signature) in models.items():
+            known = current.get(name)
+            if known is not None and known.signature == signature:
+                voices[name] = known
+            else:
+                voices[name] = VoiceInfo.load(path, signature)
+                self.parses += 1
+        self._rebuild(voices, dir_signature)
+        return self
+
+    def _rebuild(self, voices: dict[str, VoiceInfo], dir_signature) -> None:
+        by_language: dict[str, list[str]] = {}
+        speakers = {}
+        for name, info in sorted(voices.items()):
+            for key in info.languages():
+                by_language.setdefault(key, []).append(name)
+            for speaker in info.speaker_names:
+                speakers.setdefault(speaker.lower(), name)
+        with self._lock:
+            self.voices = voices
+            self._sorted = sorted((name.lower(), name) for name in voices)
+            self._by_language = by_language
+            self._speakers = speakers
+            self._dir_signature = dir_signature
+            self.scans += 1
+
+    def names(self) -> list[str]:
+        """Installed voice names, sorted"""
+        with self._lock:
+            return [name for _, name in self._sorted]
+
+    def get(self, name: str) -> Optional[VoiceInfo]:
+        """Exact (then case-insensitive) lookup"""
+        with self._lock:
+            info = self.voices.get(name)
+            if info is not None:
+                return info
+            key = name.lower()
+            index = bisect.bisect_left(self._sorted, (key, ""))
+            if index < len(self._sorted) and self._sorted[index][0] == key:
+                return self.voices[self._sorted[index][1]]
+        return None
+
+    def speaker_model(self, speaker: str) -> Optional[str]:
+        """Model holding a named speaker of a multi-speaker voice"""
+        with self._lock:
+            return self._speakers.get(speaker.lower())
+
+    def search(self, query: str = "", language: Optional[str] = None, limit: int = 20) -> list[VoiceInfo]:
+        """
+        Find voices by name, best match first.
+
+        Exact and prefix matches come first, then voices with a name part starting
+        with the query ("lessac", "us"), then substrings, then fuzzy matches
+        ("lesac" -> en_US-lessac-medium).
+
+        Args:
+            query: Part of a voice name (empty = every voice)
+            language: Only voices in this language ("en_GB", "en", "english", ...)
+            limit: Maximum number of results
+        """
+        query = query.strip().lower()
+        with self._lock:
+            if language:
+                allowed = set(self._by_language.get(language.strip().lower().replace("-", "_"), ()))
+                allowed |= set(self._by_language.get(language.strip().lower(), ()))
+            else:
+                allowed = None
+            ordered = [name for _, name in self._sorted if allowed is None or name in allowed]
+            if not query:
+                return [self.voices[name] for name in ordered[:limit]]
+
+            scores: dict[str, float] = {}
+            # Prefix matches straight from the sorted names
+            index = bisect.bisect_left(self._sorted, (query, ""))
+            while index < len(self._sorted) and self._sorted[index][0].startswith(query):
+                name = self._sorted[index][1]
+                if allowed is None or name in allowed:
+                    scores[name] = 3.0 if self._sorted[index][0] == query else 2.0
+                index += 1
+            for name in ordered:
+                if name in scores:
+                    continue
+                lower = name.lower()
+                tokens = [token for token in _TOKEN_SPLIT.split(lower) if token]
+                if any(token.startswith(query) for token in tokens):
+                    scores[name] = 1.5
+                elif query in lower:
+                    scores[name] = 1.0
+                else:
+                    ratio = max(
+                        [difflib.SequenceMatcher(None, query, candidate).ratio() for candidate in tokens + [lower]]
+                    )
+                    if ratio >= FUZZY_CUTOFF:
+                        scores[name] = ratio
+            ranked = sorted(scores, key=lambda name: (-scores[name], name.lower()))
+            return [self.voices[name] for name in ranked[:limit]]
+
+    def resolve(self, query: str) -> tuple[Optional[str], list[str]]:
+        """
+        Match a set_voice argument to an installed voice.
+
+        Returns:
+            (voice name or None, suggestions when there is no single confident match)
+        """
+        info = self.get(query)
+        if info is not None:
+            return info.name, []
+        matches = self.search(query, limit=5)
+        if not matches:
+            return None, []
+        lower = query.strip().lower()
+        confident = [
+            info.name for info in matches
+            if info.name.lower().startswith(lower)
+            or any(token == lower for token in _TOKEN_SPLIT.split(info.name.lower()))
+        ]
+        if len(confident) == 1:
+            return confident[0], []
+        return None, [info.name for info in matches]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "voices": len(self.voices),
+                "languages": len({info.language for info in self.voices.values() if info.language}),
+                "scans": self.scans,
+                "parses": self.parses,
+            }
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/voice_downloads.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview Parallel, resumable downloads of Piper voice models, checksum-verified when a digest is known
+@context download_extra_voices ran download-extra-voices.sh synchronously: no progress, no
+         resume, and an interrupted 60-70 MB model started over from zero
+@architecture Each file (.onnx and .onnx.json) is one DownloadJob fetched with urllib in a
+              worker thread; a semaphore bounds how many run at once. Bytes land in
+              <target>.part and a Range request continues from its size after an interruption
+              or a restart. The SHA-256 is computed while streaming (seeded from the existing
+              part) and checked against a pinned digest, or the one HuggingFace publishes as
+              X-Linked-Etag on the redirect of a HEAD request (urllib's GET follows the redirect
+              and only sees the CDN's headers). A mismatch is never installed. Sources without
+              a sha256 (DigitalOcean's MD5 ETag, git sha1 ETags on .onnx.json) download
+              unverified and are reported as such. Jobs are grouped in batches that the status
+              tool reports on; a second semaphore bounds how many batches download at once,
+              since download_extra_voices returns before its batch finishes.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.downloads, download_extra_voices, get_download_status
+@patterns Bounded worker pool, resumable .part files, verify-then-rename
+@related mcp-server/server.py, mcp-server/settings_store.py
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+# Extra voices offered by download_extra_voices: name -> model URL (config is URL + ".json")
+EXTRA_VOICES = {
+    "kristin": "https://sfo3.digitaloceanspaces.com/bkmdls/kristin.onnx",
+    "jenny": "https://sfo3.digitaloceanspaces.com/bkmdls/jenny.onnx",
+    "16Speakers": (
+        "https://huggingface.co/rhasspy/piper-voices/resolve/main/en/en_US/16Speakers/medium/"
+        "en_US-16Speakers-medium.onnx"
+    ),
+}
+
+# Bytes read per chunk (progress is updated per chunk)
+CHUNK_SIZE = 256 * 1024
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class DownloadSpec:
+    """One file to fetch"""
+
+    url: str
+    target: Path
+    sha256: Optional[str] = None  # expected digest (None = trust the server's, if it sends one)
+
+
+def voice_specs(voices_dir: Path, names: Optional[list[str]] = None) -> list[DownloadSpec]:
+    """
+    Files for extra voices: each voice's .onnx model and .onnx.json config.
+
+    Raises:
+        ValueError: A name is not in EXTRA_VOICES
+    """
+    specs = []
+    for name in names or list(EXTRA_VOICES):
+        url = EXTRA_VOICES.get(name)
+        if url is None:
+            raise ValueError(f"Unknown voice '{name}' (available: {', '.join(EXTRA_VOICES)})")
+        specs.append(DownloadSpec(url, voices_dir / f"{name}.onnx"))
+        specs.append(DownloadSpec(f"{url}.json", voices_dir / f"{name}.onnx.json"))
+    return specs
+
+
+@dataclass
+class DownloadJob:
+    """Progress of one file"""
+
+    id: int
+    spec: DownloadSpec
+    status: str = "queued"  # queued, downloading, done, skipped, failed
+    received: int = 0  # bytes on disk, including a resumed part
+    total: Optional[int] = None
+    resumed_from: int = 0
+    digest: Optional[str] = None  # sha256 published on the HEAD redirect, if any
+    verified: bool = False
+    error: Optional[str] = None
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self.spec.target.name
+
+    @property
+    def progress(self) -> Optional[float]:
+        if self.status in ("done", "skipped"):
+            return 1.0
+        return self.received / self.total if self.total else None
+
+
+@dataclass
+class DownloadBatch:
+    """Files requested together (one download_extra_voices call)"""
+
+    id: int
+    jobs: list[DownloadJob]
+    created: float = field(default_factory=time.time)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return all(job.status in ("done", "skipped", "failed") for job in self.jobs)
+
+    @property
+    def failed(self) -> list[DownloadJob]:
+        return [job for job in self.jobs if job.status == "failed"]
+
+    def bytes(self) -> tuple[int, Optional[int]]:
+        """Bytes received and expected (None while any size is unknown)"""
+        received = sum(job.received for job in self.jobs)
+        totals = [job.total for job in self.jobs]
+        return received, None if None in totals else sum(totals)
+
+
+class DownloadError(Exception):
+    """A file could not be fetched or did not verify"""
+
+
+class DownloadManager:
+    """Fetches files concurrently with resume and checksum verification"""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        timeout: float = 60.0,
+        retries: int = 2,
+        max_batches: int = 20,
+        concurrent_batches: int = 1,
+    ):
+        """
+        Args:
+            workers: Files downloaded at once, shared by every batch
+            timeout: Socket timeout in seconds
+            retries: Extra attempts per file after a network error (each resumes)
+            max_batches: Finished batches kept for the status tool
+            concurrent_batches: Batches downloading at once; later ones stay queued (0 = unlimited)
+        """
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.max_batches = max(1, max_batches)
+        self.concurrent_batches = max(0, concurrent_batches)
+        self.batches: dict[int, DownloadBatch] = {}
+        self._job_ids = itertools.count(1)
+        self._batch_ids = itertools.count(1)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batch_semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    @classmethod
+    def from_env(cls) -> "DownloadManager":
+        """
+        Build a manager from AGENTVIBES_DOWNLOAD_WORKERS (default 4), AGENTVIBES_DOWNLOAD_TIMEOUT
+        (default 60) and AGENTVIBES_DOWNLOAD_CONCURRENCY (batches at once, default 1)
+        """
+        try:
+            workers = int(os.environ.get("AGENTVIBES_DOWNLOAD_WORKERS", "4"))
+        except ValueError:
+            workers = 4
+        try:
+            timeout = float(os.environ.get("AGENTVIBES_DOWNLOAD_TIMEOUT", "60"))
+        except ValueError:
+            timeout = 60.0
+        try:
+            concurrent_batches = int(os.environ.get("AGENTVIBES_DOWNLOAD_CONCURRENCY", "1"))
+        except ValueError:
+            concurrent_batches = 1
+        return cls(workers, timeout, concurrent_batches=concurrent_batches)
+
+    def start(self, specs: list[DownloadSpec]) -> DownloadBatch:
+        """Start downloading files in the background (call from the event loop)"""
+        batch = DownloadBatch(next(self._batch_ids), [DownloadJob(next(self._job_ids), spec) for spec in specs])
+        batch.task = asyncio.get_running_loop().create_task(self._run(batch))
+        self.batches[batch.id] = batch
+        finished = [b.id for b in self.batches.values() if b.done]
+        for batch_id in finished[:max(0, len(self.batches) - self.max_batches)]:
+            del self.batches[batch_id]
+        return batch
+
+    async def download(self, specs: list[DownloadSpec]) -> DownloadBatch:
+        """Download files and wait for all of them"""
+        batch = self.start(specs)
+        await batch.task
+        return batch
+
+    def latest(self) -> Optional[DownloadBatch]:
+        return self.batches[max(self.batches)] if self.batches else None
+
+    def active(self) -> list[DownloadBatch]:
+        return [batch for batch in self.batches.values() if not batch.done]
+
+    async def _run(self, batch: DownloadBatch) -> None:
+        # Held for the whole batch, so download_extra_voices calls queue here
+        async with self._batch_slot():
+            await asyncio.gather(*(self._run_job(job) for job in batch.jobs))
+
+    async def _run_job(self, job: DownloadJob) -> None:
+        async with self._pool():
+            job.status = "downloading"
+            job.started = time.time()
+            try:
+                await asyncio.to_thread(self.fetch, job)
+            except DownloadError as e:
+                job.status, job.error = "failed", str(e)
+            except Exception as e:
+                job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            job.finished = time.time()
+
+    def _pool(self) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; start fresh if the loop changed
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._batch_semaphore = (
+                asyncio.Semaphore(self.concurrent_batches) if self.concurrent_batches else None
+            )
+        return self._semaphore
+
+    def _batch_slot(self):
+        self._pool()
+        return self._batch_semaphore or contextlib.nullcontext()
+
+    def fetch(self, job: DownloadJob) -> None:
+        """
+        Download one file, resuming its .part file and retrying network errors.
+
+        Blocking; runs in a worker thread.
+
+        Raises:
+            DownloadError: The file could not be fetched or failed verification
+        """
+        target = job.spec.target
+        if target.is_file() and (job.spec.sha256 is None or _file_sha256(target) == job.spec.sha256.lower()):
+            job.received = job.total = target.stat().st_size
+            job.status = "skipped"
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if job.spec.sha256 is None and job.digest is None:
+            job.digest = _head_sha256(job.spec.url, self.timeout)
+        for attempt in range(self.retries + 1):
+            try:
+                self._fetch_once(job)
+                job.status = "done"
+                return
+            except (urllib.error.URLError, OSError, TimeoutError) as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise DownloadError(f"{job.name}: HTTP {e.code} from {job.spec.url}") from e
+                if attempt == self.retries:
+                    raise DownloadError(f"{job.name}: {e}") from e
+                time.sleep(min(2 ** attempt, 10))
+
+    def _fetch_once(self, job: DownloadJob) -> None:
+        target = job.spec.target
+        part = target.with_name(f"{target.name}.part")
+        offset = part.stat().st_size if part.is_file() else 0
+        request = urllib.request.Request(job.spec.url, headers={"User-Agent": "AgentVibes"})
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 416 and offset:
+                # The part is already complete: verify what we have
+                job.received = job.total = offset
+                self._finish(job, part, _file_sha256(part), _published_sha256(e.headers))
+                return
+            raise
+
+        with response:
+            if offset and response.status != 206:
+                offset = 0  # the server ignored the range: start over
+            hasher = hashlib.sha256()
+            if offset:
+                _hash_file(part, hasher)
+            job.resumed_from = offset
+            job.received = offset
+            length = response.headers.get("Content-Length")
+            job.total = offset + int(length) if length and length.isdigit() else None
+            with open(part, "ab" if offset else "wb") as out:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    hasher.update(chunk)
+                    job.received += len(chunk)
+            if job.total is not None and job.received < job.total:
+                raise OSError(f"connection closed at {job.received} of {job.total} bytes")
+            job.total = job.received
+            self._finish(job, part, hasher.hexdigest(), _published_sha256(response.headers))
+
+    @staticmethod
+    def _finish(job: DownloadJob, part: Path, digest: str, published: Optional[str]) -> None:
+        expected = (job.spec.sha256 or job.digest or published or "").lower() or None
+        if expected is not None and digest != expected:
+            part.unlink(missing_ok=True)  # corrupt: the next attempt starts from zero
+            raise DownloadError(f"{job.name}: checksum mismatch (expected {expected[:12]}…, got {digest[:12]}…)")
+        job.verified = expected is not None
+        os.replace(part, job.spec.target)
+
+
+def _published_sha256(headers) -> Optional[str]:
+    """SHA-256 a server publishes for the file (HuggingFace: X-Linked-Etag), if any"""
+    if headers is None:
+        return None
+    for name in ("X-Linked-Etag", "ETag"):
+        value = (headers.get(name) or "").strip()
+        if value.startswith("W/"):
+            continue
+        value = value.strip('"').lower()
+        if _SHA256.match(value):
+            return value
+    return None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Surface redirects as HTTPError so their headers can be read"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def _head_sha256(url: str, timeout: float) -> Optional[str]:
+    """
+    SHA-256 published for a URL without following its redirect.
+
+    HuggingFace answers resolve/ URLs with a 302 carrying X-Linked-Etag; the CDN it
+    redirects to does not repeat it.
+
+    Returns:
+        The digest, or None when the server publishes none or the request fails
+    """
+    request = urllib.request.Request(url, method="HEAD", headers={"User-Agent": "AgentVibes"})
+    opener = urllib.request.build_opener(_NoRedirect)
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            return _published_sha256(response.headers)
+    except urllib.error.HTTPError as e:
+        return _published_sha256(e.headers) if 300 <= e.code < 400 else None
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def _hash_file(path: Path, hasher) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+
+
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    _hash_file(path, hasher)
+    return hasher.hexdigest()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+File: mcp-server/voice_map.py
+
+AgentVibes - Finally, your AI Agents can Talk Back! Text-to-Speech WITH personality for AI Assistants!
+Website: https://agentvibes.org
+Repository: https://github.com/paulpreibisch/AgentVibes
+
+Co-created by Paul Preibisch with Claude AI
+Copyright (c) 2025 Paul Preibisch
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+DISCLAIMER: This software is provided "AS IS", WITHOUT WARRANTY OF ANY KIND,
+express or implied, including but not limited to the warranties of
+merchantability, fitness for a particular purpose and noninfringement.
+In no event shall the authors or copyright holders be liable for any claim,
+damages or other liability, whether in an action of contract, tort or
+otherwise, arising from, out of or in connection with the software or the
+use or other dealings in the software.
+
+---
+
+
+@fileoverview BMAD agent voice map (agent-voice-map.csv) compiled once into lookup indexes
+@context Party mode parsed the CSV voice map again for every spoken line, and malformed rows
+         only showed up when an agent tried to speak
+@architecture The CSV is parsed with the csv module (RFC 4180 quoting, CRLF, BOM) into one
+              VoiceEntry per agent, indexed by agent id and display name (case-insensitive).
+              Every problem - short rows, empty or duplicate agent ids, unsafe voice names,
+              agents without a voice - is collected as an issue while loading. VoiceMapCache
+              keeps the compiled map and rebuilds it only when the file's mtime or size changes.
+@dependencies None (stdlib only)
+@entrypoints AgentVibesServer.voice_map, text_to_speech(agent=...), text_to_speech_batch,
+             get_voice_map
+@patterns Compile once, stat-checked rebuild, issues collected at load time
+@related mcp-server/server.py, test/fixtures/voice-maps/, src/commands/bmad-voices.js
+"""
+
+import csv
+import io
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+# Where BMAD writes the map, relative to the project directory
+VOICE_MAP_PATHS = (".bmad/_cfg/agent-voice-map.csv", "bmad/_cfg/agent-voice-map.csv")
+
+# Header names -> field (anything else names a provider voice column)
+AGENT_COLUMNS = {"agent", "agent_id", "id"}
+NAME_COLUMNS = {"name", "display_name", "displayname", "agent_name"}
+INTRO_COLUMNS = {"intro"}
+PERSONALITY_COLUMNS = {"personality"}
+DEFAULT_VOICE_COLUMNS = {"voice", "voice_name"}
+
+# Provider column aliases -> the provider names settings use
+PROVIDER_ALIASES = {"mac": "macos", "windows-piper": "piper"}
+
+# Voice names are passed to hooks and players: letters, digits, space and . _ ' ( ) -
+_SAFE_VOICE = re.compile(r"^[\w .'()-]+$")
+
+
+def _provider(name: str) -> str:
+    name = name.strip().lower()
+    return PROVIDER_ALIASES.get(name, name)
+
+
+@dataclass(frozen=True)
+class VoiceEntry:
+    """One agent's voices, intro and personality"""
+
+    agent: str
+    name: Optional[str] = None
+    voices: dict = field(default_factory=dict)  # provider -> voice ("default" for a voice column)
+    intro: Optional[str] = None
+    personality: Optional[str] = None
+    line: int = 0
+
+    def voice_for(self, provider: str) -> Optional[str]:
+        """Voice for a provider, falling back to the provider-independent voice column"""
+        return self.voices.get(_provider(provider)) or self.voices.get("default")
+
+
+@dataclass
+class VoiceMap:
+    """Compiled voice map: entries indexed by agent id and display name"""
+
+    source: Optional[Path] = None
+    entries: dict = field(default_factory=dict)  # lower-case agent id -> VoiceEntry
+    names: dict = field(default_factory=dict)  # lower-case display name -> VoiceEntry
+    providers: tuple = ()
+    issues: list = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text: str, source: Optional[Path] = None) -> "VoiceMap":
+        """
+        Compile CSV text ("agent,piper,mac,intro", "agent,voice,intro", "agent_id,voice_name", ...).
+
+        Rows that cannot be used are skipped and reported in issues; the rest still load.
+        """
+        voice_map = cls(source=source)
+        rows = csv.reader(io.StringIO(text.lstrip("\ufeff")))
+        try:
+            header = next(rows)
+        except StopIteration:
+            voice_map.issues.append("empty file")
+            return voice_map
+        except csv.Error as e:
+            voice_map.issues.append(f"line 1: {e}")
+            return voice_map
+        columns = [column.strip().lower() for column in header]
+        if not any(column in AGENT_COLUMNS for column in columns):
+            voice_map.issues.append(f"line 1: no agent column in header {','.join(header)}")
+            return voice_map
+        voice_columns = {
+            index: "default" if column in DEFAULT_VOICE_COLUMNS else _provider(column)
+            for index, column in enumerate(columns)
+            if column and column not in AGENT_COLUMNS | NAME_COLUMNS | INTRO_COLUMNS | PERSONALITY_COLUMNS
+        }
+        voice_map.providers = tuple(dict.fromkeys(voice_columns.values()))
+
+        def column_of(names: set) -> Optional[int]:
+            return next((index for index, column in enumerate(columns) if column in names), None)
+
+        agent_column = column_of(AGENT_COLUMNS)
+        name_column = column_of(NAME_COLUMNS)
+        intro_column = column_of(INTRO_COLUMNS)
+        personality_column = column_of(PERSONALITY_COLUMNS)
+
+        try:
+            for row in rows:
+                line = rows.line_num
+                if not any(value.strip() for value in row):
+                    continue
+                if len(row) < len(columns):
+                    voice_map.issues.append(f"line {line}: expected {len(columns)} fields, got {len(row)}")
+                    continue
+                values = [value.strip() for value in row]
+                agent = values[agent_column]
+                if not agent:
+                    voice_map.issues.append(f"line {line}: empty agent id")
+                    continue
+                if agent.lower() in voice_map.entries:
+                    first = voice_map.entries[agent.lower()].line
+                    voice_map.issues.append(f"line {line}: duplicate agent '{agent}' (line {first} is used)")
+                    continue
+                voices = {}
+                for index, provider in voice_columns.items():
+                    voice = values[index]
+                    if not voice:
+                        continue
+                    if not _SAFE_VOICE.match(voice):
+                        voice_map.issues.append(f"line {line}: unsafe {provider} voice for '{agent}': {voice!r}")
+                        continue
+                    voices[provider] = voice
+                if not voices:
+                    voice_map.issues.append(f"line {line}: no voice for '{agent}' (the default voice is used)")
+
+                def optional(index: Optional[int]) -> Optional[str]:
+                    return (values[index] or None) if index is not None else None
+
+                personality = optional(personality_column)
+                entry = VoiceEntry(
+                    agent=agent,
+                    name=optional(name_column),
+                    voices=voices,
+                    intro=optional(intro_column),
+                    personality=None if personality in (None, "normal") else personality,
+                    line=line,
+                )
+                voice_map.entries[agent.lower()] = entry
+                if entry.name:
+                    voice_map.names.setdefault(entry.name.lower(), entry)
+                    # "John (Product Manager)" is also found as "John"
+                    voice_map.names.setdefault(entry.name.split(" (")[0].strip().lower(), entry)
+        except csv.Error as e:
+            voice_map.issues.append(f"line {rows.line_num}: {e}")
+        return voice_map
+
+    def lookup(self, agent: str) -> Optional[VoiceEntry]:
+        """Find an agent by id or display name (case-insensitive)"""
+        key = agent.strip().lower()
+        return self.entries.get(key) or self.names.get(key)
+
+
+class VoiceMapCache:
+    """Holds the compiled voice map, rebuilding it only when the file changes"""
+
+    def __init__(self, locate: Callable[[], Optional[Path]]):
+        """
+        Args:
+            locate: Returns the voice map file to use (None = no map)
+        """
+        self.locate = locate
+        self.loads = 0
+        self._map = VoiceMap()
+        self._signature = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_project(cls, project_root: Callable[[], Path]) -> "VoiceMapCache":
+        """Use AGENTVIBES_VOICE_MAP, or BMAD's agent-voice-map.csv under the project directory"""
+
+        def locate() -> Optional[Path]:
+            configured = os.environ.get("AGENTVIBES_VOICE_MAP", "").strip()
+            if configured:
+                return Path(configured).expanduser()
+            root = project_root()
+            for relative in VOICE_MAP_PATHS:
+                candidate = root / relative
+                if candidate.is_file():
+                    return candidate
+            return None
+
+        return cls(locate)
+
+    def get(self) -> VoiceMap:
+        """The compiled map for the current file (one stat per call, a parse only after a change)"""
+        path = self.locate()
+        try:
+            stat = path.stat() if path is not None else None
+        except OSError:
+            stat = None
+        signature = (str(path), stat.st_mtime_ns, stat.st_size) if stat is not None else None
+        with self._lock:
+            if signature == self._signature:
+                return self._map
+        voice_map = self._load(path) if signature is not None else VoiceMap(source=path)
+        with self._lock:
+            self._map, self._signature = voice_map, signature
+        return voice_map
+
+    def _load(self, path: Path) -> VoiceMap:
+        try:
+            voice_map = VoiceMap.parse(path.read_text(encoding="utf-8-sig", errors="replace"), path)
+        except OSError as e:
+            voice_map = VoiceMap(source=path, issues=[f"cannot read: {e}"])
+        self.loads += 1
+        for issue in voice_map.issues:
+            print(f"Warning: voice map {path}: {issue}", file=sys.stderr)
+        return voice_map
+
+    def lookup(self, agent: Optional[str]) -> Optional[VoiceEntry]:
+        """Find an agent in the current map"""
+        return self.get().lookup(agent) if agent else None